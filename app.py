@@ -10,10 +10,13 @@ from flask_cors import CORS
 from src.models.user import db
 from src.models.learner import Learner, LearningSession
 from src.models.content import Content, LearningPath, Exercise
+from src.models.job import GenerationJob
 from src.routes.user import user_bp
 from src.routes.learner import learner_bp
 from src.routes.content import content_bp
+from src.routes.jobs import jobs_bp
 from src.routes.analytics import analytics_bp
+from src.routes.batch import batch_bp
 
 def create_app():
     # --- THIS IS THE FIX ---
@@ -34,6 +37,8 @@ def create_app():
     app.register_blueprint(learner_bp, url_prefix='/api')
     app.register_blueprint(content_bp, url_prefix='/api')
     app.register_blueprint(analytics_bp, url_prefix='/api')
+    app.register_blueprint(jobs_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
     
     # Database configuration (still commented out for now)
     # ... (database config code remains here) ...
@@ -8,9 +8,12 @@ from flask_cors import CORS
 from src.models.user import db
 from src.models.learner import Learner, LearningSession
 from src.models.content import Content, LearningPath, Exercise
+from src.models.job import GenerationJob
 from src.routes.user import user_bp
 from src.routes.learner import learner_bp
 from src.routes.content import content_bp
+from src.routes.jobs import jobs_bp
+from src.routes.batch import batch_bp
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -22,6 +25,8 @@ CORS(app, origins="*")
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(learner_bp, url_prefix='/api')
 app.register_blueprint(content_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
+app.register_blueprint(batch_bp, url_prefix='/api')
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
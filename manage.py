@@ -0,0 +1,163 @@
+"""
+Management commands for the AI Learning Platform.
+
+    python manage.py worker [--concurrency N] [--poll-interval SECONDS]
+    python manage.py init-db
+    python manage.py migrate
+    python manage.py rebuild-analytics
+
+The worker runs queued generation jobs (see src/services/job_queue.py) in a
+separate process so web workers stay free for fast requests. It connects to
+DATABASE_URL, falling back to the SQLite database under src/database.
+"""
+import os
+import sys
+import signal
+import argparse
+import threading
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from src.models.user import db
+from src.models.learner import LearnerConceptMastery, LearnerAnalyticsSnapshot
+from src.models.content import ContentConcept, ContentSearchIndex
+from src.services.job_queue import run_worker_pool
+
+
+def database_uri() -> str:
+    uri = os.getenv('DATABASE_URL')
+    if not uri:
+        return f"sqlite:///{os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'database', 'app.db')}"
+    # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def setup_database():
+    """Bind the app to the database (unless already configured) and create missing tables"""
+    if 'sqlalchemy' not in app.extensions:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+    with app.app_context():
+        db.create_all()
+
+
+def init_db_command(args):
+    setup_database()
+    print(f"Database ready at {app.config['SQLALCHEMY_DATABASE_URI']}")
+
+
+def add_missing_columns():
+    """
+    ALTER TABLE ADD COLUMN for model columns missing from existing tables (create_all only
+    creates whole tables). Only nullable columns without server defaults can be added this way.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable or column.primary_key:
+                    print(f"Cannot add non-nullable column {table.name}.{column.name} automatically")
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def create_missing_indexes():
+    """CREATE INDEX for model indexes missing from existing tables"""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
+
+
+def migrate_command(args):
+    setup_database()
+    with app.app_context():
+        for column in add_missing_columns():
+            print(f"Added column {column}")
+        for index in create_missing_indexes():
+            print(f"Created index {index}")
+        written = LearnerConceptMastery.backfill_from_json(batch_size=args.batch_size)
+        db.session.commit()
+        print(f"Copied {written} knowledge_state entries into learner_concept_mastery (existing rows kept)")
+        indexed = ContentConcept.rebuild()
+        db.session.commit()
+        print(f"Rebuilt the content_concept index for {indexed} content rows")
+        searchable = ContentSearchIndex.rebuild()
+        db.session.commit()
+        print(f"Rebuilt the content_search index for {searchable} content rows")
+    rebuild_analytics_command(args)
+
+
+def rebuild_analytics_command(args):
+    setup_database()
+    with app.app_context():
+        sessions = LearnerAnalyticsSnapshot.rebuild()
+        db.session.commit()
+        print(f"Rebuilt learner analytics snapshots from {sessions} learning sessions")
+
+
+def worker_command(args):
+    setup_database()
+    stop_event = threading.Event()
+
+    def shutdown(signum, frame):
+        print("Worker shutting down after in-flight jobs finish")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"Job worker started (concurrency={args.concurrency or os.getenv('JOB_WORKER_CONCURRENCY', 4)})")
+    run_worker_pool(app, concurrency=args.concurrency, poll_interval=args.poll_interval, stop_event=stop_event)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AI Learning Platform management commands')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    worker_parser = subparsers.add_parser('worker', help='Run queued generation jobs')
+    worker_parser.add_argument('--concurrency', type=int, default=None, help='Worker threads (JOB_WORKER_CONCURRENCY)')
+    worker_parser.add_argument('--poll-interval', type=float, default=None, help='Seconds to wait when the queue is empty')
+    worker_parser.set_defaults(func=worker_command)
+
+    init_db_parser = subparsers.add_parser('init-db', help='Create missing database tables')
+    init_db_parser.set_defaults(func=init_db_command)
+
+    migrate_parser = subparsers.add_parser('migrate', help='Create tables, add missing columns and indexes, and backfill derived tables')
+    migrate_parser.add_argument('--batch-size', type=int, default=500, help='Mastery rows written per statement')
+    migrate_parser.set_defaults(func=migrate_command)
+
+    rebuild_analytics_parser = subparsers.add_parser(
+        'rebuild-analytics', help='Recompute learner analytics snapshots and daily activity from sessions'
+    )
+    rebuild_analytics_parser.set_defaults(func=rebuild_analytics_command)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stand-in server for load testing the AI service offline.
+
+Point the platform at it with:
+
+    OPENAI_API_KEY=local OPENAI_BASE_URL=http://127.0.0.1:8001/v1 gunicorn app:app
+
+and start it with, for example:
+
+    python mock_openai_server.py --latency-dist lognormal --latency-ms 800 \
+        --tokens-per-second 40 --error-rate 0.02 --rate-limit-rate 0.05
+
+Supports POST /v1/chat/completions (plain and streamed) and GET /v1/models.
+Responses are synthesized to match the platform's prompts (text or JSON mode),
+or replayed from a cassette recorded against the real API with --record.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LatencyModel:
+    """Samples response latency in seconds from a configurable distribution"""
+
+    def __init__(self, distribution: str, mean_ms: float, stddev_ms: float, max_ms: float):
+        self.distribution = distribution
+        self.mean = mean_ms / 1000
+        self.stddev = stddev_ms / 1000
+        self.max = max_ms / 1000 if max_ms else None
+
+    def sample(self) -> float:
+        if self.distribution == 'fixed':
+            value = self.mean
+        elif self.distribution == 'uniform':
+            value = random.uniform(max(0.0, self.mean - self.stddev), self.mean + self.stddev)
+        elif self.distribution == 'normal':
+            value = random.gauss(self.mean, self.stddev)
+        elif self.distribution == 'exponential':
+            value = random.expovariate(1 / self.mean) if self.mean > 0 else 0.0
+        elif self.distribution == 'lognormal':
+            if self.mean <= 0:
+                value = 0.0
+            else:
+                # Parameterize so the distribution has the requested mean and stddev
+                variance = self.stddev ** 2
+                sigma_sq = math.log(1 + variance / self.mean ** 2)
+                mu = math.log(self.mean) - sigma_sq / 2
+                value = random.lognormvariate(mu, sigma_sq ** 0.5)
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+
+        value = max(0.0, value)
+        if self.max is not None:
+            value = min(value, self.max)
+        return value
+
+
+class Cassette:
+    """Recorded responses keyed by a hash of the request that produced them"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry['content']
+
+    @staticmethod
+    def key_for(body: dict) -> str:
+        material = {
+            'model': body.get('model'),
+            'messages': body.get('messages'),
+            'response_format': body.get('response_format')
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, body: dict):
+        return self.entries.get(self.key_for(body))
+
+    def record(self, body: dict, content: str) -> None:
+        key = self.key_for(body)
+        with self._lock:
+            self.entries[key] = content
+            with open(self.path, 'a') as f:
+                f.write(json.dumps({'key': key, 'content': content}) + '\n')
+
+
+def synthesize_content(body: dict) -> str:
+    """Build a plausible response for the platform's lesson, exercise and feedback prompts"""
+    messages = body.get('messages', [])
+    prompt = messages[-1].get('content', '') if messages else ''
+    json_mode = (body.get('response_format') or {}).get('type') == 'json_object'
+    concept = prompt.split('"')[1] if prompt.count('"') >= 2 else 'the concept'
+
+    if 'For each learning style' in prompt:
+        match = re.search(r'each incorrect option \(([A-D, ]+)\)', prompt)
+        letters = re.findall(r'[A-D]', match.group(1)) if match else ['B', 'C', 'D']
+        return json.dumps({
+            style: {letter: f"Option {letter} is not right; revisit the explanation ({style})." for letter in letters}
+            for style in ['visual', 'auditory', 'kinesthetic', 'reading_writing']
+        })
+
+    if 'multiple choice question' in prompt:
+        exercise = {
+            'question': f"Which statement about {concept} is correct?",
+            'options': [
+                f"A) {concept} is a core building block",
+                f"B) {concept} is obsolete",
+                f"C) {concept} only applies to experts",
+                f"D) {concept} has no practical use"
+            ],
+            'correct_answer': 'A',
+            'explanation': f"{concept} underpins the more advanced material that follows."
+        }
+        if json_mode:
+            return json.dumps(exercise)
+        return '\n'.join([f"Question: {exercise['question']}"] + exercise['options'] + [
+            f"Correct Answer: {exercise['correct_answer']}",
+            f"Explanation: {exercise['explanation']}"
+        ])
+
+    if 'lesson' in prompt:
+        lesson = {
+            'title': f"Understanding {concept}",
+            'learning_objectives': [f"Explain {concept}", f"Apply {concept}", f"Spot common mistakes with {concept}"],
+            'content': ' '.join([f"{concept} is an important topic." for _ in range(60)]),
+            'examples': [f"Using {concept} in a small project", f"Debugging a {concept} issue"],
+            'key_takeaways': [f"{concept} matters", "Practice builds fluency", "Start small"],
+            'next_steps': f"Build something small with {concept}."
+        }
+        if json_mode:
+            return json.dumps(lesson)
+        return '\n'.join(
+            [f"Title: {lesson['title']}", '', 'Learning Objectives:'] +
+            [f"- {item}" for item in lesson['learning_objectives']] +
+            ['', lesson['content'], '', 'Examples:'] +
+            [f"- {item}" for item in lesson['examples']] +
+            ['', 'Key Takeaways:'] +
+            [f"- {item}" for item in lesson['key_takeaways']] +
+            ['', 'Next Steps:', lesson['next_steps']]
+        )
+
+    return f"Great effort! Here is some feedback about {concept}. Keep practicing."
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None
+    latency = None
+    cassette = None
+    stats = None
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        if self.config.verbose:
+            super().log_message(format, *args)
+
+    def _count(self, name: str) -> None:
+        with self.stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None) -> None:
+        encoded = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(encoded)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'gpt-3.5-turbo', 'object': 'model', 'owned_by': 'stand-in'}]})
+        elif self.path.rstrip('/').endswith('/stats'):
+            with self.stats_lock:
+                self._send_json(200, dict(self.stats))
+        else:
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self._count('requests')
+
+        time.sleep(self.latency.sample())
+
+        roll = random.random()
+        if roll < self.config.rate_limit_rate:
+            self._count('rate_limited')
+            self._send_json(429, {'error': {'message': 'Rate limit reached (stand-in)', 'type': 'rate_limit_error'}},
+                            headers={'Retry-After': str(self.config.retry_after)})
+            return
+        roll -= self.config.rate_limit_rate
+        if roll < self.config.error_rate:
+            self._count('errors')
+            self._send_json(500, {'error': {'message': 'Injected server error (stand-in)', 'type': 'server_error'}})
+            return
+        roll -= self.config.error_rate
+        if roll < self.config.hang_rate:
+            # Outlast the client's timeout
+            self._count('hangs')
+            time.sleep(self.config.hang_seconds)
+
+        content = self._content_for(body)
+        if content is None:
+            return
+
+        if body.get('stream'):
+            self._stream(body, content)
+        else:
+            self._complete(body, content)
+
+    def _content_for(self, body: dict):
+        if self.config.replay:
+            content = self.cassette.get(body)
+            if content is not None:
+                self._count('replayed')
+                return content
+            self._count('replay_misses')
+
+        if self.config.record:
+            try:
+                content = self._fetch_upstream(body)
+            except urllib.error.HTTPError as e:
+                self._count('upstream_errors')
+                self._send_json(e.code, json.loads(e.read() or b'{}'))
+                return None
+            self.cassette.record(body, content)
+            self._count('recorded')
+            return content
+
+        return synthesize_content(body)
+
+    def _fetch_upstream(self, body: dict) -> str:
+        upstream_body = dict(body)
+        upstream_body.pop('stream', None)
+        request = urllib.request.Request(
+            self.config.record.rstrip('/') + '/chat/completions',
+            data=json.dumps(upstream_body).encode('utf-8'),
+            headers={
+                'Content-Type': 'application/json',
+                'Authorization': f"Bearer {os.getenv('OPENAI_UPSTREAM_API_KEY', '')}"
+            }
+        )
+        with urllib.request.urlopen(request, timeout=120) as response:
+            payload = json.loads(response.read())
+        return payload['choices'][0]['message']['content']
+
+    def _tokens(self, content: str):
+        # Roughly four characters per token
+        return [content[i:i + 4] for i in range(0, len(content), 4)]
+
+    def _complete(self, body: dict, content: str) -> None:
+        tokens = self._tokens(content)
+        if self.config.tokens_per_second > 0:
+            time.sleep(len(tokens) / self.config.tokens_per_second)
+
+        prompt_tokens = sum(len(message.get('content', '')) for message in body.get('messages', [])) // 4
+        self._send_json(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-3.5-turbo'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(tokens),
+                'total_tokens': prompt_tokens + len(tokens)
+            }
+        })
+
+    def _stream(self, body: dict, content: str) -> None:
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get('model', 'gpt-3.5-turbo')
+        delay = 1 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_event(payload) -> None:
+            data = f"data: {payload}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta: dict, finish_reason=None) -> str:
+            return json.dumps({
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+            })
+
+        try:
+            write_event(chunk({'role': 'assistant', 'content': ''}))
+            for token in self._tokens(content):
+                if delay:
+                    time.sleep(delay)
+                write_event(chunk({'content': token}))
+            write_event(chunk({}, 'stop'))
+            write_event('[DONE]')
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self._count('client_disconnects')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='OpenAI-compatible stand-in server with latency and failure injection')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency-dist', default='fixed',
+                        choices=['fixed', 'uniform', 'normal', 'lognormal', 'exponential'],
+                        help='Distribution of time before the first byte')
+    parser.add_argument('--latency-ms', type=float, default=200, help='Mean latency before the first byte')
+    parser.add_argument('--latency-stddev-ms', type=float, default=100, help='Spread for uniform/normal/lognormal')
+    parser.add_argument('--latency-max-ms', type=float, default=0, help='Clamp sampled latency (0 = no clamp)')
+    parser.add_argument('--tokens-per-second', type=float, default=50,
+                        help='Generation speed; paces streamed tokens and delays plain responses (0 = instant)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='Fraction of requests that stall before responding')
+    parser.add_argument('--hang-seconds', type=float, default=60, help='How long stalled requests wait')
+    parser.add_argument('--record', metavar='UPSTREAM_BASE_URL',
+                        help='Proxy to a real API (key from OPENAI_UPSTREAM_API_KEY) and save responses to --cassette')
+    parser.add_argument('--replay', action='store_true', help='Serve responses from --cassette when the request matches')
+    parser.add_argument('--cassette', default='openai_cassette.jsonl', help='JSONL file for recorded responses')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible runs')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    if config.seed is not None:
+        random.seed(config.seed)
+
+    StandInHandler.config = config
+    StandInHandler.latency = LatencyModel(config.latency_dist, config.latency_ms, config.latency_stddev_ms, config.latency_max_ms)
+    StandInHandler.cassette = Cassette(config.cassette if (config.record or config.replay) else None)
+    StandInHandler.stats = {}
+
+    server = ThreadingHTTPServer((config.host, config.port), StandInHandler)
+    server.daemon_threads = True
+    print(f"OpenAI stand-in listening on http://{config.host}:{config.port}/v1", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
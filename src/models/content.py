@@ -1,8 +1,20 @@
+import os
+import re
+import html
 from datetime import datetime
-import json
+from sqlalchemy import event, inspect
 from src.models.user import db
+from src.models.learner import Concept
+from src.models.types import JSONDict, JSONList
 
 class Content(db.Model):
+    __table_args__ = (
+        # Keyset pagination of filtered catalog listings
+        db.Index('ix_content_niche_type_id', 'niche', 'content_type', 'id'),
+        # Watermark reads by the per-process concept index and knowledge graphs
+        db.Index('ix_content_updated_at', 'updated_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     
     # Content metadata
@@ -13,22 +25,25 @@ class Content(db.Model):
     
     # Content data
     content_body = db.Column(db.Text)  # Main content (text, HTML, etc.)
-    content_metadata = db.Column(db.Text)  # JSON string for additional metadata
+    content_metadata = db.Column(JSONDict())  # Additional metadata
     
     # Learning objectives and prerequisites
-    learning_objectives = db.Column(db.Text)  # JSON array of objectives
-    prerequisites = db.Column(db.Text)  # JSON array of prerequisite concepts
-    concepts_covered = db.Column(db.Text)  # JSON array of concepts this content covers
+    learning_objectives = db.Column(JSONList())  # Objectives
+    prerequisites = db.Column(JSONList())  # Prerequisite concepts
+    concepts_covered = db.Column(JSONList())  # Concepts this content covers
     
     # AI generation info
     is_ai_generated = db.Column(db.Boolean, default=False)
     generation_prompt = db.Column(db.Text)  # Prompt used to generate this content
-    personalization_params = db.Column(db.Text)  # JSON of params used for personalization
+    personalization_params = db.Column(JSONDict())  # Params used for personalization
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Loaded explicitly (selectinload) where a response needs them
+    exercises = db.relationship('Exercise', lazy='select', order_by='Exercise.id', viewonly=True)
+    
     def __repr__(self):
         return f'<Content {self.title}>'
     
@@ -40,21 +55,344 @@ class Content(db.Model):
             'niche': self.niche,
             'difficulty_level': self.difficulty_level,
             'content_body': self.content_body,
-            'metadata': json.loads(self.content_metadata) if self.content_metadata else {},
-            'learning_objectives': json.loads(self.learning_objectives) if self.learning_objectives else [],
-            'prerequisites': json.loads(self.prerequisites) if self.prerequisites else [],
-            'concepts_covered': json.loads(self.concepts_covered) if self.concepts_covered else [],
+            'metadata': self.content_metadata or {},
+            'learning_objectives': self.learning_objectives or [],
+            'prerequisites': self.prerequisites or [],
+            'concepts_covered': self.concepts_covered or [],
             'is_ai_generated': self.is_ai_generated,
             'generation_prompt': self.generation_prompt,
-            'personalization_params': json.loads(self.personalization_params) if self.personalization_params else {},
+            'personalization_params': self.personalization_params or {},
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 
+class ContentConcept(db.Model):
+    """
+    Inverted index from concepts to the content covering them. Niche and difficulty are copied
+    from the content row so path generation can filter on one covering index. Rows are written
+    in the same flush as the Content change (see the mapper events below).
+    """
+    __tablename__ = 'content_concept'
+    __table_args__ = (
+        db.Index('ix_content_concept_lookup', 'concept_id', 'niche', 'difficulty_level', 'content_id'),
+    )
+    
+    content_id = db.Column(db.Integer, db.ForeignKey('content.id', ondelete='CASCADE'), primary_key=True)
+    concept_id = db.Column(db.Integer, db.ForeignKey('concept.id', ondelete='CASCADE'), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)  # Index in concepts_covered
+    niche = db.Column(db.String(50), nullable=False)
+    difficulty_level = db.Column(db.String(20))
+    
+    def __repr__(self):
+        return f'<ContentConcept {self.content_id}:{self.concept_id}>'
+    
+    @classmethod
+    def sync(cls, connection, content_id, niche, difficulty_level, concepts_covered):
+        """Replace the index rows for one content row"""
+        connection.execute(cls.__table__.delete().where(cls.content_id == content_id))
+        concepts = list(dict.fromkeys(str(concept) for concept in concepts_covered or [] if concept))
+        if not concepts:
+            return
+        concept_ids = Concept.ids_for(concepts, connection=connection)
+        connection.execute(cls.__table__.insert(), [
+            {
+                'content_id': content_id,
+                'concept_id': concept_ids[concept],
+                'position': position,
+                'niche': niche,
+                'difficulty_level': difficulty_level
+            }
+            for position, concept in enumerate(concepts)
+        ])
+    
+    @classmethod
+    def ranked_content(cls, niche, difficulty_level, concept_groups):
+        """
+        Content covering any concept in `concept_groups` (lists in priority order), as
+        [(content_id, concepts_covered)] sorted by the highest-priority group each content
+        covers, then id. One query: the matching content ids are a semi-join on the lookup index.
+        """
+        wanted = {}
+        for rank, group in enumerate(concept_groups):
+            for concept in group:
+                wanted.setdefault(concept, rank)
+        if not wanted:
+            return []
+        
+        matching = db.select(cls.content_id).join(Concept, Concept.id == cls.concept_id).where(
+            Concept.name.in_(list(wanted)),
+            cls.niche == niche,
+            cls.difficulty_level == difficulty_level
+        )
+        rows = db.session.execute(
+            db.select(cls.content_id, Concept.name).join(Concept, Concept.id == cls.concept_id).where(
+                cls.content_id.in_(matching)
+            ).order_by(cls.content_id, cls.position)
+        ).all()
+        
+        concepts_by_content = {}
+        for content_id, name in rows:
+            concepts_by_content.setdefault(content_id, []).append(name)
+        ranked = sorted(
+            concepts_by_content.items(),
+            key=lambda item: (min(wanted.get(concept, len(concept_groups)) for concept in item[1]), item[0])
+        )
+        return ranked
+    
+    @classmethod
+    def rebuild(cls):
+        """Rebuild the whole index from Content; returns the number of content rows indexed"""
+        connection = db.session.connection()
+        connection.execute(cls.__table__.delete())
+        rows = db.session.execute(
+            db.select(Content.id, Content.niche, Content.difficulty_level, Content.concepts_covered)
+        ).all()
+        for content_id, niche, difficulty_level, concepts_covered in rows:
+            cls.sync(connection, content_id, niche, difficulty_level, concepts_covered)
+        return len(rows)
+
+
+
+class ContentSearchIndex:
+    """
+    Full-text index over content titles, bodies and concepts: an FTS5 table on SQLite and a
+    weighted tsvector table with a GIN index on PostgreSQL. Created alongside the other tables
+    by create_all and written in the same flush as the Content change (see the mapper events
+    below), so search never sees a half-committed catalog.
+    """
+    TABLE = 'content_search'
+    TEXT_CONFIG = os.getenv('SEARCH_TEXT_CONFIG', 'english')  # PostgreSQL text search configuration
+    HIGHLIGHT_OPEN = '<mark>'
+    HIGHLIGHT_CLOSE = '</mark>'
+    # The database marks matches with private-use sentinels; the text is HTML-escaped before they become <mark>
+    _MATCH_OPEN = '\ue000'
+    _MATCH_CLOSE = '\ue001'
+    SNIPPET_WORDS = 24
+    MIN_PREFIX_LENGTH = 3  # Shorter final words match whole words only; "c*" would match most of the catalog
+    
+    @classmethod
+    def _config(cls):
+        if not re.fullmatch(r'\w+', cls.TEXT_CONFIG):
+            raise ValueError(f'Invalid SEARCH_TEXT_CONFIG: {cls.TEXT_CONFIG}')
+        return f"'{cls.TEXT_CONFIG}'::regconfig"
+    
+    @staticmethod
+    def _is_postgres(connection):
+        return connection.dialect.name == 'postgresql'
+    
+    @staticmethod
+    def terms(query):
+        return re.findall(r'\w+', query or '')
+    
+    @classmethod
+    def create(cls, connection):
+        if cls._is_postgres(connection):
+            connection.execute(db.text(
+                'CREATE TABLE IF NOT EXISTS content_search ('
+                'content_id INTEGER PRIMARY KEY REFERENCES content (id) ON DELETE CASCADE, '
+                'document TSVECTOR NOT NULL)'
+            ))
+            connection.execute(db.text(
+                'CREATE INDEX IF NOT EXISTS ix_content_search_document ON content_search USING GIN (document)'
+            ))
+        elif connection.dialect.name == 'sqlite':
+            connection.execute(db.text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS content_search "
+                "USING fts5(title, body, concepts, tokenize='porter unicode61', prefix='2 3')"
+            ))
+    
+    @classmethod
+    def sync(cls, connection, rows):
+        """Index or re-index [(content_id, title, content_body, concepts_covered)]"""
+        documents = [
+            {
+                'content_id': content_id,
+                'title': title or '',
+                'body': content_body or '',
+                'concepts': ' '.join(str(concept) for concept in concepts_covered or [] if concept)
+            }
+            for content_id, title, content_body, concepts_covered in rows
+        ]
+        if not documents:
+            return
+        if cls._is_postgres(connection):
+            config = cls._config()
+            connection.execute(db.text(
+                'INSERT INTO content_search (content_id, document) VALUES (:content_id, '
+                f"setweight(to_tsvector({config}, :title), 'A') || "
+                f"setweight(to_tsvector({config}, :concepts), 'B') || "
+                f"setweight(to_tsvector({config}, :body), 'C')) "
+                'ON CONFLICT (content_id) DO UPDATE SET document = excluded.document'
+            ), documents)
+        else:
+            connection.execute(db.text('DELETE FROM content_search WHERE rowid = :content_id'), documents)
+            connection.execute(db.text(
+                'INSERT INTO content_search (rowid, title, body, concepts) VALUES (:content_id, :title, :body, :concepts)'
+            ), documents)
+    
+    @classmethod
+    def remove(cls, connection, content_id):
+        key = 'content_id' if cls._is_postgres(connection) else 'rowid'
+        connection.execute(db.text(f'DELETE FROM content_search WHERE {key} = :content_id'), {'content_id': content_id})
+    
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Re-index every content row; returns the number indexed"""
+        connection = db.session.connection()
+        connection.execute(db.text('DELETE FROM content_search'))
+        result = db.session.execute(
+            db.select(Content.id, Content.title, Content.content_body, Content.concepts_covered).order_by(Content.id)
+        )
+        indexed = 0
+        for batch in result.partitions(batch_size):
+            cls.sync(connection, batch)
+            indexed += len(batch)
+        return indexed
+    
+    @classmethod
+    def search(cls, query, limit, offset=0, niche=None, content_type=None, difficulty_level=None):
+        """
+        Content matching every word of `query` (the last one also as a prefix), best match first:
+        [{id, title, content_type, niche, difficulty_level, concepts_covered, score,
+        title_highlight, snippet}] for at most `limit` rows starting at `offset`.
+        Ranking runs on the index alone; highlights are built only for the returned page.
+        """
+        terms = cls.terms(query)
+        if not terms:
+            return []
+        connection = db.session.connection()
+        postgres = cls._is_postgres(connection)
+        prefix = len(terms[-1]) >= cls.MIN_PREFIX_LENGTH
+        
+        filters, params = [], {'limit': limit, 'offset': offset}
+        for column, value in (('niche', niche), ('content_type', content_type), ('difficulty_level', difficulty_level)):
+            if value is not None:
+                filters.append(f'content.{column} = :{column}')
+                params[column] = value
+        filter_sql = ''.join(f' AND {condition}' for condition in filters)
+        join_sql = ' JOIN content ON content.id = content_search.{key}' if filters else ''
+        
+        if postgres:
+            config = cls._config()
+            params['query'] = ' & '.join(terms[:-1] + [terms[-1] + (':*' if prefix else '')])
+            tsquery = f'to_tsquery({config}, :query)'
+            page = connection.execute(db.text(
+                f'SELECT content_search.content_id, ts_rank_cd(content_search.document, {tsquery}, 32) AS score '
+                f'FROM content_search{join_sql.format(key="content_id")} '
+                f'WHERE content_search.document @@ {tsquery}{filter_sql} '
+                'ORDER BY score DESC, content_search.content_id LIMIT :limit OFFSET :offset'
+            ), params).all()
+        else:
+            params['query'] = ' '.join(f'"{term}"' for term in terms) + ('*' if prefix else '')
+            # bm25 weights: title, body, concepts; lower scores are better matches
+            page = connection.execute(db.text(
+                'SELECT content_search.rowid, -bm25(content_search, 10.0, 1.0, 5.0) AS score '
+                f'FROM content_search{join_sql.format(key="rowid")} '
+                f'WHERE content_search MATCH :query{filter_sql} '
+                'ORDER BY score DESC, content_search.rowid LIMIT :limit OFFSET :offset'
+            ), params).all()
+        if not page:
+            return []
+        
+        ids = [row[0] for row in page]
+        highlight_params = {
+            'ids': ids, 'query': params['query'], 'open': cls._MATCH_OPEN, 'close': cls._MATCH_CLOSE,
+            'words': cls.SNIPPET_WORDS
+        }
+        if postgres:
+            options = f"StartSel={cls._MATCH_OPEN}, StopSel={cls._MATCH_CLOSE}"
+            statement = db.text(
+                f"SELECT content.id, ts_headline({config}, content.title, {tsquery}, "
+                f"'HighlightAll=true, {options}'), "
+                f"ts_headline({config}, coalesce(content.content_body, ''), {tsquery}, "
+                f"'MaxFragments=1, MaxWords={cls.SNIPPET_WORDS}, MinWords={cls.SNIPPET_WORDS // 3}, {options}') "
+                'FROM content WHERE content.id IN :ids'
+            )
+        else:
+            statement = db.text(
+                'SELECT rowid, highlight(content_search, 0, :open, :close), '
+                "snippet(content_search, 1, :open, :close, '…', :words) "
+                'FROM content_search WHERE content_search MATCH :query AND rowid IN :ids'
+            )
+        statement = statement.bindparams(db.bindparam('ids', expanding=True))
+        highlights = {row[0]: (row[1], row[2]) for row in connection.execute(statement, highlight_params)}
+        
+        details = {
+            row.id: row for row in db.session.execute(
+                db.select(
+                    Content.id, Content.title, Content.content_type, Content.niche,
+                    Content.difficulty_level, Content.concepts_covered
+                ).where(Content.id.in_(ids))
+            )
+        }
+        
+        results = []
+        for content_id, score in page:
+            row = details.get(content_id)
+            if row is None:
+                continue
+            title_highlight, snippet = highlights.get(content_id, (row.title, ''))
+            results.append({
+                'id': row.id,
+                'title': row.title,
+                'content_type': row.content_type,
+                'niche': row.niche,
+                'difficulty_level': row.difficulty_level,
+                'concepts_covered': row.concepts_covered or [],
+                'score': score,
+                'title_highlight': cls._highlight_html(title_highlight),
+                'snippet': cls._highlight_html(snippet)
+            })
+        return results
+    
+    @classmethod
+    def _highlight_html(cls, marked):
+        """Escape stored text for HTML, then turn the match sentinels into <mark> tags"""
+        return html.escape(marked or '').replace(cls._MATCH_OPEN, cls.HIGHLIGHT_OPEN).replace(
+            cls._MATCH_CLOSE, cls.HIGHLIGHT_CLOSE
+        )
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    ContentSearchIndex.create(connection)
+
+
+_INDEXED_FIELDS = ('niche', 'difficulty_level', 'concepts_covered')
+
+
+_SEARCHED_FIELDS = ('title', 'content_body', 'concepts_covered')
+
+
+def _search_row(target):
+    return [(target.id, target.title, target.content_body, target.concepts_covered)]
+
+
+@event.listens_for(Content, 'after_insert')
+def _index_inserted_content(mapper, connection, target):
+    ContentConcept.sync(connection, target.id, target.niche, target.difficulty_level, target.concepts_covered)
+    ContentSearchIndex.sync(connection, _search_row(target))
+
+
+@event.listens_for(Content, 'after_update')
+def _index_updated_content(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in _INDEXED_FIELDS):
+        ContentConcept.sync(connection, target.id, target.niche, target.difficulty_level, target.concepts_covered)
+    if any(state.attrs[field].history.has_changes() for field in _SEARCHED_FIELDS):
+        ContentSearchIndex.sync(connection, _search_row(target))
+
+
+@event.listens_for(Content, 'before_delete')
+def _unindex_deleted_content(mapper, connection, target):
+    connection.execute(ContentConcept.__table__.delete().where(ContentConcept.content_id == target.id))
+    ContentSearchIndex.remove(connection, target.id)
+
+
 class LearningPath(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    learner_id = db.Column(db.Integer, db.ForeignKey('learner.id'), nullable=False)
+    learner_id = db.Column(db.Integer, db.ForeignKey('learner.id'), nullable=False, index=True)
     
     # Path metadata
     path_name = db.Column(db.String(200))
@@ -62,13 +400,13 @@ class LearningPath(db.Model):
     estimated_duration_hours = db.Column(db.Integer)
     
     # Path structure
-    content_sequence = db.Column(db.Text)  # JSON array of content IDs in order
+    content_sequence = db.Column(JSONList())  # Content IDs in order
     current_position = db.Column(db.Integer, default=0)
     completion_status = db.Column(db.String(20), default='in_progress')  # not_started, in_progress, completed
     
     # Adaptive data
-    adaptation_history = db.Column(db.Text)  # JSON log of path modifications
-    performance_data = db.Column(db.Text)  # JSON of performance on each content item
+    adaptation_history = db.Column(JSONList())  # Log of path modifications
+    performance_data = db.Column(JSONDict())  # Performance on each content item
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -84,25 +422,25 @@ class LearningPath(db.Model):
             'path_name': self.path_name,
             'target_goal': self.target_goal,
             'estimated_duration_hours': self.estimated_duration_hours,
-            'content_sequence': json.loads(self.content_sequence) if self.content_sequence else [],
+            'content_sequence': self.content_sequence or [],
             'current_position': self.current_position,
             'completion_status': self.completion_status,
-            'adaptation_history': json.loads(self.adaptation_history) if self.adaptation_history else [],
-            'performance_data': json.loads(self.performance_data) if self.performance_data else {},
+            'adaptation_history': self.adaptation_history or [],
+            'performance_data': self.performance_data or {},
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
     def get_next_content(self):
         """Get the next content item in the learning path"""
-        sequence = json.loads(self.content_sequence) if self.content_sequence else []
+        sequence = self.content_sequence or []
         if self.current_position < len(sequence):
             return sequence[self.current_position]
         return None
     
     def advance_position(self):
         """Move to the next content item"""
-        sequence = json.loads(self.content_sequence) if self.content_sequence else []
+        sequence = self.content_sequence or []
         if self.current_position < len(sequence) - 1:
             self.current_position += 1
             self.updated_at = datetime.utcnow()
@@ -114,18 +452,18 @@ class LearningPath(db.Model):
     
     def add_content_to_path(self, content_id, position=None):
         """Add content to the learning path at specified position"""
-        sequence = json.loads(self.content_sequence) if self.content_sequence else []
+        if self.content_sequence is None:
+            self.content_sequence = []
         if position is None:
-            sequence.append(content_id)
+            self.content_sequence.append(content_id)
         else:
-            sequence.insert(position, content_id)
-        self.content_sequence = json.dumps(sequence)
+            self.content_sequence.insert(position, content_id)
         self.updated_at = datetime.utcnow()
 
 
 class Exercise(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    content_id = db.Column(db.Integer, db.ForeignKey('content.id'), nullable=False)
+    content_id = db.Column(db.Integer, db.ForeignKey('content.id'), nullable=False, index=True)
     
     # Exercise data
     question = db.Column(db.Text, nullable=False)
@@ -134,19 +472,27 @@ class Exercise(db.Model):
     explanation = db.Column(db.Text)
     
     # Multiple choice specific
-    options = db.Column(db.Text)  # JSON array of options
+    options = db.Column(JSONList())  # Answer options
     
     # Coding specific
     starter_code = db.Column(db.Text)
-    test_cases = db.Column(db.Text)  # JSON array of test cases
+    test_cases = db.Column(JSONList())  # Test cases
     
     # Difficulty and metadata
     difficulty_score = db.Column(db.Float)
     estimated_time_minutes = db.Column(db.Integer)
     
+    # Precomputed feedback for incorrect options: {learning_style: {option_letter: feedback}}
+    option_feedback = db.Column(JSONDict())
+    
     def __repr__(self):
         return f'<Exercise {self.id}>'
     
+    def get_option_feedback(self, learning_style, option_letter):
+        """Look up precomputed feedback for an incorrect option, or None if there is none"""
+        feedback = self.option_feedback or {}
+        return feedback.get(learning_style, {}).get(option_letter)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -155,9 +501,9 @@ class Exercise(db.Model):
             'exercise_type': self.exercise_type,
             'correct_answer': self.correct_answer,
             'explanation': self.explanation,
-            'options': json.loads(self.options) if self.options else [],
+            'options': self.options or [],
             'starter_code': self.starter_code,
-            'test_cases': json.loads(self.test_cases) if self.test_cases else [],
+            'test_cases': self.test_cases or [],
             'difficulty_score': self.difficulty_score,
             'estimated_time_minutes': self.estimated_time_minutes
         }
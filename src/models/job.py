@@ -0,0 +1,56 @@
+from datetime import datetime
+from src.models.user import db
+from src.models.types import JSONDict, JSONText
+
+class GenerationJob(db.Model):
+    __table_args__ = (
+        db.Index('ix_generation_job_status_run_after', 'status', 'run_after'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)  # generate_content, generate_content_batch
+    learner_id = db.Column(db.Integer, db.ForeignKey('learner.id'), index=True)
+    payload = db.Column(JSONDict())  # Arguments for the job handler
+
+    # Queue state
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, succeeded, dead
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+
+    # Outcome
+    result = db.Column(JSONText)  # Result of the handler
+    last_error = db.Column(db.Text)
+
+    # Completion webhook
+    callback_url = db.Column(db.String(500))
+    callback_status = db.Column(db.String(200))
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<GenerationJob {self.id} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'learner_id': self.learner_id,
+            'payload': self.payload or {},
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'result': self.result,
+            'last_error': self.last_error,
+            'callback_url': self.callback_url,
+            'callback_status': self.callback_status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
@@ -1,27 +1,33 @@
-from datetime import datetime
+from datetime import datetime, date
 import json
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
 from src.models.user import db
+from src.models.types import JSONDict, JSONList
 
 class Learner(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
     # Basic profile information
-    learning_goals = db.Column(db.Text)  # JSON string of goals
+    learning_goals = db.Column(JSONList())  # Goals
     preferred_learning_style = db.Column(db.String(50))  # visual, auditory, kinesthetic, reading_writing
     time_availability = db.Column(db.Integer)  # minutes per week
     experience_level = db.Column(db.String(20))  # beginner, intermediate, advanced
     target_niche = db.Column(db.String(50))  # tech_career, creator_business, certification_prep
     
     # Dynamic profile data
-    knowledge_state = db.Column(db.Text)  # JSON string of concept mastery levels
-    engagement_metrics = db.Column(db.Text)  # JSON string of engagement data
-    learning_preferences = db.Column(db.Text)  # JSON string of inferred preferences
+    knowledge_state = db.Column(JSONDict())  # Legacy mastery blob; superseded by LearnerConceptMastery
+    engagement_metrics = db.Column(JSONDict())  # Engagement data
+    learning_preferences = db.Column(JSONDict())  # Inferred preferences
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Per-concept mastery rows (list endpoints batch-load them with LearnerConceptMastery.knowledge_states)
+    concept_mastery = db.relationship('LearnerConceptMastery', lazy='select', passive_deletes=True)
+    
     def __repr__(self):
         return f'<Learner {self.id}>'
     
@@ -29,39 +35,292 @@ class Learner(db.Model):
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'learning_goals': json.loads(self.learning_goals) if self.learning_goals else [],
+            'learning_goals': self.learning_goals or [],
             'preferred_learning_style': self.preferred_learning_style,
             'time_availability': self.time_availability,
             'experience_level': self.experience_level,
             'target_niche': self.target_niche,
-            'knowledge_state': json.loads(self.knowledge_state) if self.knowledge_state else {},
-            'engagement_metrics': json.loads(self.engagement_metrics) if self.engagement_metrics else {},
-            'learning_preferences': json.loads(self.learning_preferences) if self.learning_preferences else {},
+            'knowledge_state': self.get_knowledge_state(),
+            'engagement_metrics': self.engagement_metrics or {},
+            'learning_preferences': self.learning_preferences or {},
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
+    def get_knowledge_state(self):
+        """Concept -> mastery level for this learner"""
+        return {record.concept.name: record.mastery for record in self.concept_mastery}
+    
     def update_knowledge_state(self, concept, mastery_level):
         """Update mastery level for a specific concept"""
-        knowledge = json.loads(self.knowledge_state) if self.knowledge_state else {}
-        knowledge[concept] = mastery_level
-        self.knowledge_state = json.dumps(knowledge)
+        LearnerConceptMastery.upsert(self.id, concept, mastery_level)
+        db.session.expire(self, ['concept_mastery'])
         self.updated_at = datetime.utcnow()
     
     def get_knowledge_gaps(self, threshold=0.7):
         """Get concepts where mastery is below threshold"""
-        knowledge = json.loads(self.knowledge_state) if self.knowledge_state else {}
-        return [concept for concept, mastery in knowledge.items() if mastery < threshold]
+        return LearnerConceptMastery.concepts_for_learner(self.id, below=threshold)
+    
+    def get_mastered_concepts(self, threshold=0.7):
+        """Get concepts where mastery is at or above threshold"""
+        return LearnerConceptMastery.concepts_for_learner(self.id, at_least=threshold)
     
     def update_engagement_metrics(self, metric_name, value):
         """Update engagement metrics"""
-        metrics = json.loads(self.engagement_metrics) if self.engagement_metrics else {}
-        metrics[metric_name] = value
-        self.engagement_metrics = json.dumps(metrics)
+        if self.engagement_metrics is None:
+            self.engagement_metrics = {}
+        self.engagement_metrics[metric_name] = value
         self.updated_at = datetime.utcnow()
 
 
+def _insert_for_dialect(model, connection=None):
+    """Dialect-specific INSERT supporting ON CONFLICT, or None if the database has no UPSERT we use"""
+    bind = connection if connection is not None else db.session.get_bind()
+    dialect = bind.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    return None
+
+
+class Concept(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Concept {self.name}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    @classmethod
+    def ids_for(cls, names, connection=None):
+        """
+        Map concept names to ids, creating missing concepts. Pass `connection` to run inside a
+        flush (mapper event handlers cannot use the session).
+        """
+        names = list(dict.fromkeys(str(name) for name in names))
+        if not names:
+            return {}
+        
+        executor = connection if connection is not None else db.session
+        now = datetime.utcnow()
+        insert = _insert_for_dialect(cls, connection)
+        if insert is not None:
+            executor.execute(
+                insert.values([{'name': name, 'created_at': now} for name in names]).on_conflict_do_nothing(
+                    index_elements=['name']
+                )
+            )
+        else:
+            existing = set(executor.execute(db.select(cls.name).where(cls.name.in_(names))).scalars())
+            missing = [{'name': name, 'created_at': now} for name in names if name not in existing]
+            if missing:
+                executor.execute(cls.__table__.insert(), missing)
+        
+        return dict(executor.execute(db.select(cls.name, cls.id).where(cls.name.in_(names))).all())
+
+
+class LearnerConceptMastery(db.Model):
+    """One learner's mastery of one concept (replaces the Learner.knowledge_state JSON blob)"""
+    __tablename__ = 'learner_concept_mastery'
+    __table_args__ = (
+        # "Which learners are below X on this concept" without touching other concepts
+        db.Index('ix_learner_concept_mastery_concept_mastery', 'concept_id', 'mastery'),
+        # Per-learner gap and mastered-concept lookups
+        db.Index('ix_learner_concept_mastery_learner_mastery', 'learner_id', 'mastery'),
+    )
+    
+    learner_id = db.Column(db.Integer, db.ForeignKey('learner.id', ondelete='CASCADE'), primary_key=True)
+    concept_id = db.Column(db.Integer, db.ForeignKey('concept.id', ondelete='CASCADE'), primary_key=True)
+    mastery = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    concept = db.relationship('Concept', lazy='joined')
+    
+    def __repr__(self):
+        return f'<LearnerConceptMastery {self.learner_id}:{self.concept_id} {self.mastery}>'
+    
+    def to_dict(self):
+        return {
+            'learner_id': self.learner_id,
+            'concept': self.concept.name if self.concept else None,
+            'mastery': self.mastery,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    @classmethod
+    def upsert(cls, learner_id, concept, mastery_level):
+        """Insert or update a single learner/concept row without reading the learner's other concepts"""
+        concept_id = Concept.ids_for([concept])[str(concept)]
+        cls.upsert_many([(learner_id, concept_id, mastery_level)])
+    
+    @classmethod
+    def upsert_many(cls, rows, overwrite=True):
+        """
+        Write (learner_id, concept_id, mastery) rows in one statement. With overwrite=False
+        existing rows are left alone (used by the backfill so newer values are not clobbered).
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        now = datetime.utcnow()
+        values = [
+            {'learner_id': learner_id, 'concept_id': concept_id, 'mastery': float(mastery), 'updated_at': now}
+            for learner_id, concept_id, mastery in rows
+        ]
+        
+        insert = _insert_for_dialect(cls)
+        if insert is None:
+            for value in values:
+                existing = db.session.get(cls, (value['learner_id'], value['concept_id']))
+                if existing is None:
+                    db.session.add(cls(**value))
+                elif overwrite:
+                    existing.mastery = value['mastery']
+                    existing.updated_at = now
+            db.session.flush()
+            return
+        
+        statement = insert.values(values)
+        if overwrite:
+            statement = statement.on_conflict_do_update(
+                index_elements=['learner_id', 'concept_id'],
+                set_={'mastery': statement.excluded.mastery, 'updated_at': statement.excluded.updated_at}
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=['learner_id', 'concept_id'])
+        db.session.execute(statement)
+    
+    @classmethod
+    def concepts_for_learner(cls, learner_id, below=None, at_least=None):
+        """Concept names for a learner filtered by mastery, lowest mastery first"""
+        query = db.session.query(Concept.name).join(cls, cls.concept_id == Concept.id).filter(
+            cls.learner_id == learner_id
+        )
+        if below is not None:
+            query = query.filter(cls.mastery < below)
+        if at_least is not None:
+            query = query.filter(cls.mastery >= at_least)
+        return [name for (name,) in query.order_by(cls.mastery, Concept.name)]
+    
+    @classmethod
+    def knowledge_states(cls, learner_ids):
+        """Concept -> mastery dicts for many learners in one query"""
+        states = {learner_id: {} for learner_id in learner_ids}
+        if not states:
+            return states
+        rows = db.session.query(cls.learner_id, Concept.name, cls.mastery).join(
+            Concept, cls.concept_id == Concept.id
+        ).filter(cls.learner_id.in_(list(states)))
+        for learner_id, name, mastery in rows:
+            states[learner_id][name] = mastery
+        return states
+    
+    @classmethod
+    def mastery_of(cls, learner_id, concept):
+        """One concept's mastery for a learner, or None"""
+        return db.session.query(cls.mastery).join(Concept, cls.concept_id == Concept.id).filter(
+            cls.learner_id == learner_id, Concept.name == concept
+        ).scalar()
+    
+    @classmethod
+    def mastery_summary(cls, learner_id, mastered=0.8, struggling=0.3):
+        """Concept count, mean mastery and counts per mastery band for a learner, in one aggregate row"""
+        total, mean, mastered_count, in_progress, struggling_count = db.session.query(
+            db.func.count(cls.concept_id),
+            db.func.avg(cls.mastery),
+            db.func.sum(db.case((cls.mastery >= mastered, 1), else_=0)),
+            db.func.sum(db.case(((cls.mastery >= struggling) & (cls.mastery < mastered), 1), else_=0)),
+            db.func.sum(db.case((cls.mastery < struggling, 1), else_=0))
+        ).filter(cls.learner_id == learner_id).one()
+        return {
+            'total': total,
+            'mean': float(mean or 0.0),
+            'mastered': int(mastered_count or 0),
+            'in_progress': int(in_progress or 0),
+            'struggling': int(struggling_count or 0)
+        }
+    
+    @classmethod
+    def learners_below(cls, concept, threshold=0.7, limit=100, niche=None):
+        """Learners whose mastery of a concept is below threshold, weakest first"""
+        query = db.session.query(cls.learner_id, cls.mastery, cls.updated_at).join(
+            Concept, cls.concept_id == Concept.id
+        ).filter(Concept.name == concept, cls.mastery < threshold)
+        if niche:
+            query = query.join(Learner, Learner.id == cls.learner_id).filter(Learner.target_niche == niche)
+        return [
+            {'learner_id': learner_id, 'mastery': mastery, 'updated_at': updated_at.isoformat() if updated_at else None}
+            for learner_id, mastery, updated_at in query.order_by(cls.mastery, cls.learner_id).limit(limit)
+        ]
+    
+    @classmethod
+    def gap_summary(cls, threshold=0.7, limit=20, niche=None):
+        """Concepts with the most learners below threshold across the whole learner base"""
+        learners_below = db.func.count(cls.learner_id)
+        query = db.session.query(
+            Concept.name, learners_below, db.func.avg(cls.mastery)
+        ).join(cls, cls.concept_id == Concept.id).filter(cls.mastery < threshold)
+        if niche:
+            query = query.join(Learner, Learner.id == cls.learner_id).filter(Learner.target_niche == niche)
+        rows = query.group_by(Concept.id, Concept.name).order_by(learners_below.desc(), Concept.name).limit(limit)
+        return [
+            {'concept': name, 'learners_below_threshold': count, 'average_mastery': round(float(average), 3)}
+            for name, count, average in rows
+        ]
+    
+    @classmethod
+    def backfill_from_json(cls, batch_size=500):
+        """Copy every learner's legacy knowledge_state JSON into mastery rows; returns entries processed"""
+        written = 0
+        # Read the raw text so one malformed row is skipped instead of failing the whole load
+        learners = db.session.query(Learner.id, db.type_coerce(Learner.knowledge_state, db.Text)).filter(
+            Learner.knowledge_state.isnot(None)
+        ).order_by(Learner.id).execution_options(yield_per=batch_size)
+        
+        pending = []
+        for learner_id, knowledge_state in learners:
+            try:
+                knowledge = json.loads(knowledge_state) if knowledge_state else {}
+            except ValueError:
+                print(f"Skipping learner {learner_id}: knowledge_state is not valid JSON")
+                continue
+            if isinstance(knowledge, dict):
+                pending.extend(
+                    (learner_id, concept, mastery) for concept, mastery in knowledge.items()
+                    if isinstance(mastery, (int, float))
+                )
+            if len(pending) >= batch_size:
+                written += cls._write_backfill(pending)
+                pending = []
+        written += cls._write_backfill(pending)
+        return written
+    
+    @classmethod
+    def _write_backfill(cls, pending):
+        if not pending:
+            return 0
+        concept_ids = Concept.ids_for(concept for _, concept, _ in pending)
+        cls.upsert_many(
+            [(learner_id, concept_ids[str(concept)], mastery) for learner_id, concept, mastery in pending],
+            overwrite=False
+        )
+        return len(pending)
+
+
 class LearningSession(db.Model):
+    __table_args__ = (
+        # Keyset pagination of a learner's sessions, newest first
+        db.Index('ix_learning_session_learner_start', 'learner_id', 'session_start', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     learner_id = db.Column(db.Integer, db.ForeignKey('learner.id'), nullable=False)
     
@@ -71,9 +330,9 @@ class LearningSession(db.Model):
     duration_minutes = db.Column(db.Integer)
     
     # Content interaction
-    content_accessed = db.Column(db.Text)  # JSON array of content IDs
-    exercises_completed = db.Column(db.Text)  # JSON array of exercise data
-    performance_scores = db.Column(db.Text)  # JSON object of scores
+    content_accessed = db.Column(JSONList())  # Content IDs
+    exercises_completed = db.Column(JSONList())  # Exercise data
+    performance_scores = db.Column(JSONDict())  # Scores
     
     # Engagement data
     clicks = db.Column(db.Integer, default=0)
@@ -90,11 +349,293 @@ class LearningSession(db.Model):
             'session_start': self.session_start.isoformat() if self.session_start else None,
             'session_end': self.session_end.isoformat() if self.session_end else None,
             'duration_minutes': self.duration_minutes,
-            'content_accessed': json.loads(self.content_accessed) if self.content_accessed else [],
-            'exercises_completed': json.loads(self.exercises_completed) if self.exercises_completed else [],
-            'performance_scores': json.loads(self.performance_scores) if self.performance_scores else {},
+            'content_accessed': self.content_accessed or [],
+            'exercises_completed': self.exercises_completed or [],
+            'performance_scores': self.performance_scores or {},
             'clicks': self.clicks,
             'time_on_content': self.time_on_content,
             'completion_rate': self.completion_rate
         }
 
+
+
+# Per-session values summed into the analytics aggregates
+_SESSION_TOTALS = (
+    'session_count', 'duration_total', 'completion_total', 'content_accessed_total', 'exercises_completed_total'
+)
+_SNAPSHOT_TOTALS = _SESSION_TOTALS + ('timed_session_count',)
+_ANALYTICS_FIELDS = (
+    'learner_id', 'session_start', 'duration_minutes', 'completion_rate', 'content_accessed', 'exercises_completed'
+)
+
+
+def _session_contribution(session_start, duration_minutes, completion_rate, content_accessed, exercises_completed):
+    """What one session adds to its learner's analytics aggregates"""
+    # Same rules as the SQL in LearnerAnalyticsSnapshot.rebuild: only JSON arrays count
+    content_accessed = content_accessed if isinstance(content_accessed, list) else []
+    exercises_completed = exercises_completed if isinstance(exercises_completed, list) else []
+    content_types = {}
+    for item in content_accessed:
+        content_type = item.get('type') if isinstance(item, dict) else None
+        content_type = 'unknown' if content_type is None else content_type
+        content_types[content_type] = content_types.get(content_type, 0) + 1
+    return {
+        'day': session_start.date() if session_start else None,
+        'session_count': 1,
+        'timed_session_count': 1 if duration_minutes else 0,
+        'duration_total': duration_minutes or 0,
+        'completion_total': completion_rate or 0.0,
+        'content_accessed_total': len(content_accessed),
+        'exercises_completed_total': len(exercises_completed),
+        'content_types': content_types
+    }
+
+
+def _accumulate(totals, contribution, fields, sign=1):
+    for field in fields:
+        totals[field] = (totals.get(field) or 0) + sign * contribution[field]
+
+
+class LearnerDailyActivity(db.Model):
+    """Session totals per learner per UTC day of session_start, for windowed metrics such as velocity"""
+    __tablename__ = 'learner_daily_activity'
+    
+    learner_id = db.Column(db.Integer, db.ForeignKey('learner.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    duration_total = db.Column(db.Integer, nullable=False, default=0)  # minutes
+    completion_total = db.Column(db.Float, nullable=False, default=0.0)
+    content_accessed_total = db.Column(db.Integer, nullable=False, default=0)
+    exercises_completed_total = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<LearnerDailyActivity {self.learner_id}:{self.day}>'
+    
+    @classmethod
+    def totals_since(cls, learner_id, first_day):
+        """Summed totals for a learner's days from first_day on (one aggregate row)"""
+        row = db.session.query(*(db.func.coalesce(db.func.sum(getattr(cls, field)), 0) for field in _SESSION_TOTALS)).filter(
+            cls.learner_id == learner_id, cls.day >= first_day
+        ).one()
+        return dict(zip(_SESSION_TOTALS, row))
+
+
+class LearnerAnalyticsSnapshot(db.Model):
+    """
+    Running session aggregates for one learner, so analytics reads a row instead of every
+    session. Updated in the same flush as each LearningSession insert, update or delete
+    (see the mapper events below) at constant cost; rebuild() recomputes them from scratch.
+    """
+    __tablename__ = 'learner_analytics_snapshot'
+    
+    learner_id = db.Column(db.Integer, db.ForeignKey('learner.id', ondelete='CASCADE'), primary_key=True)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    timed_session_count = db.Column(db.Integer, nullable=False, default=0)  # Sessions with a non-zero duration
+    duration_total = db.Column(db.Integer, nullable=False, default=0)  # minutes
+    completion_total = db.Column(db.Float, nullable=False, default=0.0)
+    content_accessed_total = db.Column(db.Integer, nullable=False, default=0)
+    exercises_completed_total = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Sessions per active day, for consistency: number of days, total sessions and sum of squares
+    active_days = db.Column(db.Integer, nullable=False, default=0)
+    dated_session_count = db.Column(db.Integer, nullable=False, default=0)
+    daily_count_squares = db.Column(db.Integer, nullable=False, default=0)
+    
+    content_type_counts = db.Column(JSONDict(), default=dict)  # content_accessed type -> count
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<LearnerAnalyticsSnapshot {self.learner_id}>'
+    
+    def daily_count_variance(self):
+        """Population variance of sessions per active day"""
+        if not self.active_days:
+            return 0.0
+        mean = self.dated_session_count / self.active_days
+        return max(0.0, self.daily_count_squares / self.active_days - mean * mean)
+    
+    @classmethod
+    def apply_change(cls, connection, learner_id, old=None, new=None):
+        """
+        Replace one session's contribution `old` with `new` (None for an inserted or deleted
+        session) in a learner's snapshot and daily rows. Runs inside a flush, so it uses the
+        flush connection; the snapshot row is locked first so concurrent writers serialize.
+        """
+        if old == new:
+            return
+        table = cls.__table__
+        daily_table = LearnerDailyActivity.__table__
+        now = datetime.utcnow()
+        
+        insert = _insert_for_dialect(cls, connection)
+        if insert is not None:
+            connection.execute(insert.values(learner_id=learner_id).on_conflict_do_nothing(index_elements=['learner_id']))
+        select = db.select(table).where(table.c.learner_id == learner_id).with_for_update()
+        row = connection.execute(select).mappings().first()
+        if row is None:
+            connection.execute(table.insert().values(learner_id=learner_id))
+            row = connection.execute(select).mappings().one()
+        
+        totals = {field: row[field] for field in _SNAPSHOT_TOTALS + ('active_days', 'dated_session_count', 'daily_count_squares')}
+        content_type_counts = dict(row['content_type_counts'] or {})
+        day_changes = {}
+        for sign, contribution in ((-1, old), (1, new)):
+            if contribution is None:
+                continue
+            _accumulate(totals, contribution, _SNAPSHOT_TOTALS, sign)
+            for content_type, count in contribution['content_types'].items():
+                content_type_counts[content_type] = content_type_counts.get(content_type, 0) + sign * count
+            if contribution['day'] is not None:
+                _accumulate(day_changes.setdefault(contribution['day'], {}), contribution, _SESSION_TOTALS, sign)
+        
+        for day, change in day_changes.items():
+            key = (daily_table.c.learner_id == learner_id) & (daily_table.c.day == day)
+            current = connection.execute(db.select(daily_table).where(key)).mappings().first()
+            day_totals = {field: current[field] for field in _SESSION_TOTALS} if current else {}
+            before = day_totals.get('session_count') or 0
+            _accumulate(day_totals, change, _SESSION_TOTALS)
+            after = day_totals['session_count']
+            
+            totals['dated_session_count'] += after - before
+            totals['daily_count_squares'] += after * after - before * before
+            totals['active_days'] += (after > 0) - (before > 0)
+            if current is None:
+                connection.execute(daily_table.insert().values(learner_id=learner_id, day=day, **day_totals))
+            elif after > 0:
+                connection.execute(daily_table.update().where(key).values(**day_totals))
+            else:
+                connection.execute(daily_table.delete().where(key))
+        
+        connection.execute(table.update().where(table.c.learner_id == learner_id).values(
+            content_type_counts={key: value for key, value in content_type_counts.items() if value > 0},
+            updated_at=now,
+            **totals
+        ))
+    
+    @classmethod
+    def rebuild(cls):
+        """
+        Recompute every learner's snapshot and daily rows from their sessions; returns sessions
+        counted. The sessions are aggregated in the database (GROUP BY learner and day, and
+        learner and content type), so only the per-day and per-type totals are transferred.
+        """
+        db.session.execute(LearnerDailyActivity.__table__.delete())
+        db.session.execute(cls.__table__.delete())
+        
+        postgres = db.session.get_bind().dialect.name == 'postgresql'
+        sessions = LearningSession.__table__.c
+        if postgres:
+            day = db.cast(sessions.session_start, db.Date)
+            def array_length(column):
+                value = db.cast(column, postgresql.JSON)
+                return db.case((db.func.json_typeof(value) == 'array', db.func.json_array_length(value)))
+        else:
+            day = db.func.date(sessions.session_start)
+            def array_length(column):
+                return db.case((db.func.json_type(column) == 'array', db.func.json_array_length(column)))
+        
+        day = day.label('day')
+        groups = db.session.execute(db.select(
+            sessions.learner_id, day,
+            db.func.count(sessions.id),
+            db.func.coalesce(db.func.sum(db.case((sessions.duration_minutes != 0, 1), else_=0)), 0),
+            db.func.coalesce(db.func.sum(sessions.duration_minutes), 0),
+            db.func.coalesce(db.func.sum(sessions.completion_rate), 0.0),
+            db.func.coalesce(db.func.sum(array_length(sessions.content_accessed)), 0),
+            db.func.coalesce(db.func.sum(array_length(sessions.exercises_completed)), 0)
+        ).group_by(sessions.learner_id, day)).all()
+        
+        snapshots, days = {}, []
+        for learner_id, session_day, count, timed, duration, completion, content, exercises in groups:
+            totals = {
+                'session_count': count, 'duration_total': int(duration), 'completion_total': float(completion),
+                'content_accessed_total': int(content), 'exercises_completed_total': int(exercises)
+            }
+            snapshot = snapshots.setdefault(learner_id, {
+                'learner_id': learner_id, 'timed_session_count': 0, 'active_days': 0,
+                'dated_session_count': 0, 'daily_count_squares': 0, 'content_type_counts': {}
+            })
+            _accumulate(snapshot, totals, _SESSION_TOTALS)
+            snapshot['timed_session_count'] += int(timed)
+            if session_day is not None:
+                if isinstance(session_day, str):
+                    session_day = date.fromisoformat(session_day)
+                days.append(dict(totals, learner_id=learner_id, day=session_day))
+                snapshot['active_days'] += 1
+                snapshot['dated_session_count'] += count
+                snapshot['daily_count_squares'] += count * count
+        
+        for learner_id, content_type, count in db.session.execute(
+            db.text(_CONTENT_TYPE_COUNTS_SQL['postgresql' if postgres else 'sqlite'])
+        ):
+            snapshots[learner_id]['content_type_counts'][content_type] = count
+        
+        if days:
+            db.session.execute(db.insert(LearnerDailyActivity), days)
+        if snapshots:
+            db.session.execute(db.insert(cls), list(snapshots.values()))
+        return sum(snapshot['session_count'] for snapshot in snapshots.values())
+
+
+# content_accessed item type -> count per learner, for LearnerAnalyticsSnapshot.rebuild
+_CONTENT_TYPE_COUNTS_SQL = {
+    'sqlite': (
+        "SELECT learning_session.learner_id, "
+        "coalesce(CASE WHEN item.type = 'object' THEN json_extract(item.value, '$.type') END, 'unknown') AS content_type, "
+        "count(*) FROM learning_session, json_each(learning_session.content_accessed) AS item "
+        "WHERE json_type(learning_session.content_accessed) = 'array' "
+        "GROUP BY learning_session.learner_id, content_type"
+    ),
+    'postgresql': (
+        "SELECT learning_session.learner_id, "
+        "coalesce(CASE WHEN json_typeof(item) = 'object' THEN item ->> 'type' END, 'unknown') AS content_type, "
+        "count(*) FROM learning_session CROSS JOIN LATERAL json_array_elements("
+        "CASE WHEN json_typeof(learning_session.content_accessed::json) = 'array' "
+        "THEN learning_session.content_accessed::json END) AS item "
+        "GROUP BY learning_session.learner_id, content_type"
+    )
+}
+
+
+def _stored_contribution(connection, session_id):
+    """(learner_id, contribution) of a session as currently stored in the database"""
+    row = connection.execute(db.select(
+        LearningSession.learner_id, LearningSession.session_start, LearningSession.duration_minutes,
+        LearningSession.completion_rate, LearningSession.content_accessed, LearningSession.exercises_completed
+    ).where(LearningSession.id == session_id)).first()
+    if row is None:
+        return None, None
+    return row[0], _session_contribution(*row[1:])
+
+
+def _current_contribution(target):
+    return _session_contribution(
+        target.session_start, target.duration_minutes, target.completion_rate,
+        target.content_accessed, target.exercises_completed
+    )
+
+
+@event.listens_for(LearningSession, 'after_insert')
+def _count_inserted_session(mapper, connection, target):
+    LearnerAnalyticsSnapshot.apply_change(connection, target.learner_id, new=_current_contribution(target))
+
+
+@event.listens_for(LearningSession, 'before_update')
+def _count_updated_session(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in _ANALYTICS_FIELDS):
+        return
+    # Old values come from the row itself: in-place JSON edits leave no history to diff against
+    old_learner_id, old = _stored_contribution(connection, target.id)
+    new = _current_contribution(target)
+    if old_learner_id is not None and old_learner_id != target.learner_id:
+        LearnerAnalyticsSnapshot.apply_change(connection, old_learner_id, old=old)
+        old = None
+    LearnerAnalyticsSnapshot.apply_change(connection, target.learner_id, old=old, new=new)
+
+
+@event.listens_for(LearningSession, 'before_delete')
+def _count_deleted_session(mapper, connection, target):
+    learner_id, old = _stored_contribution(connection, target.id)
+    if learner_id is not None:
+        LearnerAnalyticsSnapshot.apply_change(connection, learner_id, old=old)
@@ -0,0 +1,245 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+from flask import Response, jsonify, request, stream_with_context
+from src.models.user import db
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def dumps(value: Any) -> bytes:
+    """Encode a value as compact JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _encode_datetime(value: Optional[datetime]) -> bytes:
+    return b'null' if value is None else b'"' + value.isoformat().encode('ascii') + b'"'
+
+
+class InvalidListQuery(ValueError):
+    """Bad fields, limit or cursor parameter on a collection route"""
+
+
+class Field:
+    """
+    One key of a serialized row. kind is 'value' (any JSON-encodable scalar),
+    'datetime' (ISO 8601 string) or 'json' (a JSONText column, copied into the
+    output as stored, with `default` when the column is empty).
+    """
+
+    def __init__(self, name: str, column, kind: str = 'value', default: str = 'null'):
+        self.name = name
+        self.column = column
+        self.kind = kind
+        self.default = default.encode('utf-8')
+
+    def select_expression(self):
+        # JSON columns are read as raw text: no decode here, no re-encode on output
+        return db.type_coerce(self.column, db.Text) if self.kind == 'json' else self.column
+
+    def encoder(self) -> Callable[[Any], bytes]:
+        if self.kind == 'datetime':
+            return _encode_datetime
+        if self.kind == 'json':
+            default = self.default
+            return lambda raw: raw.encode('utf-8') if raw else default
+        return dumps
+
+
+class SortKey:
+    """A column of a collection's keyset ordering; the last key must be unique (the primary key)"""
+
+    def __init__(self, column, descending: bool = False, kind: str = 'value'):
+        self.column = column
+        self.descending = descending
+        self.kind = kind
+
+    def order_by(self):
+        return self.column.desc() if self.descending else self.column.asc()
+
+    def after(self, value):
+        return self.column < value if self.descending else self.column > value
+
+    def encode(self, value):
+        return value.isoformat() if self.kind == 'datetime' and value is not None else value
+
+    def decode(self, value):
+        return datetime.fromisoformat(value) if self.kind == 'datetime' and value is not None else value
+
+
+class RowSerializer:
+    """
+    Serializes query rows straight from result tuples, without building model
+    instances or to_dict() dicts. Only the columns of the requested fields are
+    selected (so a titles-only listing never reads lesson bodies), and the key
+    prefixes and encoders for each field set are prepared once and cached.
+    stream() writes the JSON array batch by batch using yield_per, so memory
+    stays flat regardless of the number of rows.
+
+    Pages use keyset pagination over `order` (default: id ascending): the
+    cursor holds the sort key values of the last row returned, so every page
+    is an index range scan no matter how deep it is.
+
+    `computed` maps extra keys to functions that receive a batch of rows and
+    return {row id: value}, for values that live in other tables. The first
+    field must be the row id; it is always included.
+    """
+
+    def __init__(self, model, fields: Sequence[Field],
+                 computed: Dict[str, Callable[[List[Any]], Dict[Any, Any]]] = None,
+                 order: Sequence[SortKey] = None, batch_size: int = 500):
+        self.model = model
+        self.fields = list(fields)
+        self.computed = dict(computed or {})
+        self.order = list(order or [SortKey(model.id)])
+        self.batch_size = batch_size
+        self.field_names = [field.name for field in self.fields] + list(self.computed)
+        self._plans = {}
+
+    def _plan(self, names: Optional[Tuple[str, ...]]):
+        """Columns, encoders and computed fetchers for a field set (all fields when names is None)"""
+        plan = self._plans.get(names)
+        if plan is not None:
+            return plan
+
+        if names is None:
+            fields, computed = self.fields, list(self.computed.items())
+        else:
+            unknown = sorted(set(names) - set(self.field_names))
+            if unknown:
+                raise InvalidListQuery(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.field_names)}")
+            fields = [field for index, field in enumerate(self.fields) if index == 0 or field.name in names]
+            computed = [(name, fetch) for name, fetch in self.computed.items() if name in names]
+
+        # Sort key columns ride along after the serialized ones to build the next cursor
+        columns = [field.select_expression() for field in fields] + [key.column for key in self.order]
+        encoders = [(dumps(field.name) + b':', field.encoder()) for field in fields]
+        computed_prefixes = [(dumps(name) + b':', fetch) for name, fetch in computed]
+        plan = (columns, encoders, computed_prefixes)
+        self._plans[names] = plan
+        return plan
+
+    def parse_fields(self, fields_param: Optional[str]) -> Optional[Tuple[str, ...]]:
+        if not fields_param:
+            return None
+        return tuple(sorted({name.strip() for name in fields_param.split(',') if name.strip()}))
+
+    def encode_cursor(self, row) -> str:
+        values = [key.encode(value) for key, value in zip(self.order, row[-len(self.order):])]
+        return base64.urlsafe_b64encode(dumps(values)).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if not isinstance(values, list) or len(values) != len(self.order):
+                raise ValueError
+            return [key.decode(value) for key, value in zip(self.order, values)]
+        except (ValueError, TypeError, binascii.Error):
+            raise InvalidListQuery('Invalid cursor')
+
+    def _after_cursor(self, values: List[Any]):
+        """Rows strictly after the cursor in sort order: (k1 > v1) OR (k1 = v1 AND k2 > v2) ..."""
+        clauses = []
+        for index, key in enumerate(self.order):
+            equal_prefix = [self.order[j].column == values[j] for j in range(index)]
+            clauses.append(db.and_(*equal_prefix, key.after(values[index])))
+        return db.or_(*clauses)
+
+    def encode_batch(self, rows: List[Any], encoders, computed_prefixes) -> List[bytes]:
+        computed = [(prefix, fetch(rows)) for prefix, fetch in computed_prefixes]
+        encoded = []
+        for row in rows:
+            parts = [prefix + encode(value) for (prefix, encode), value in zip(encoders, row)]
+            for prefix, values in computed:
+                parts.append(prefix + dumps(values.get(row[0])))
+            encoded.append(b'{' + b','.join(parts) + b'}')
+        return encoded
+
+    def stream(self, statement, fields: Optional[Tuple[str, ...]] = None) -> Iterator[bytes]:
+        """Yield a JSON array of the statement's rows (selected with this field set's columns) in chunks"""
+        _, encoders, computed_prefixes = self._plan(fields)
+        result = db.session.execute(statement.execution_options(yield_per=self.batch_size))
+        yield b'['
+        first = True
+        for batch in result.partitions():
+            chunk = b','.join(self.encode_batch(batch, encoders, computed_prefixes))
+            yield chunk if first else b',' + chunk
+            first = False
+        yield b']'
+
+    def select(self, criteria: Sequence = (), fields: Optional[Tuple[str, ...]] = None):
+        """The ordered statement for every matching row, for stream()"""
+        columns, _, _ = self._plan(fields)
+        return db.select(*columns).where(*criteria).order_by(*(key.order_by() for key in self.order))
+
+    def page(self, criteria: Sequence = (), fields: Optional[Tuple[str, ...]] = None,
+             limit: int = DEFAULT_PAGE_SIZE, cursor: str = None) -> Tuple[Any, Optional[str]]:
+        """
+        The statement for one page, for stream(), plus the cursor for the next page (None on the
+        last page). The page's key range is read first from the sort key columns alone, so the
+        cursor is known before the body starts streaming.
+        """
+        criteria = list(criteria)
+        if cursor:
+            criteria.append(self._after_cursor(self.decode_cursor(cursor)))
+
+        keys = db.session.execute(
+            db.select(*(key.column for key in self.order)).where(*criteria)
+            .order_by(*(key.order_by() for key in self.order)).limit(limit + 1)
+        ).all()
+        statement = self.select(criteria, fields)
+        if not keys:
+            return statement.limit(0), None
+        last = list(keys[:limit][-1])
+        next_cursor = self.encode_cursor(last) if len(keys) > limit else None
+
+        # Up to and including the last key, so this page and the next never overlap or skip rows
+        return statement.where(db.not_(self._after_cursor(last))), next_cursor
+
+
+def streamed_json_response(serializer: RowSerializer, statement, fields: Optional[Tuple[str, ...]] = None) -> Response:
+    """Response that streams the statement's rows as a JSON array"""
+    return Response(stream_with_context(serializer.stream(statement, fields)), mimetype='application/json')
+
+
+def paginated_json_response(serializer: RowSerializer, *criteria,
+                            default_limit: Optional[int] = DEFAULT_PAGE_SIZE) -> Response:
+    """
+    Collection response for the current request: ?fields=a,b selects fields, ?limit= sets the
+    page size (default 100, max 1000) and ?cursor= continues from X-Next-Cursor / the Link header.
+    With default_limit=None a request without limit or cursor gets every row, for routes whose
+    clients predate pagination.
+    """
+    try:
+        fields = serializer.parse_fields(request.args.get('fields'))
+        if default_limit is None and 'limit' not in request.args and 'cursor' not in request.args:
+            return streamed_json_response(serializer, serializer.select(criteria, fields), fields)
+
+        limit = request.args.get('limit', default_limit or DEFAULT_PAGE_SIZE, type=int)
+        if limit < 1:
+            raise InvalidListQuery('limit must be a positive integer')
+        statement, next_cursor = serializer.page(
+            criteria, fields=fields, limit=min(limit, MAX_PAGE_SIZE), cursor=request.args.get('cursor')
+        )
+    except InvalidListQuery as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = streamed_json_response(serializer, statement, fields)
+    if next_cursor:
+        args = [(key, value) for key, value in request.args.items(multi=True) if key != 'cursor']
+        args.append(('cursor', next_cursor))
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
@@ -0,0 +1,34 @@
+import json
+from sqlalchemy.ext.mutable import MutableDict, MutableList
+from sqlalchemy.types import Text, TypeDecorator
+
+
+class JSONText(TypeDecorator):
+    """
+    JSON stored in a TEXT column (same on-disk format as the json.dumps strings the
+    models used to hold). Values are decoded once when a row is loaded and encoded
+    only when it is flushed.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if not value:
+            return None
+        return json.loads(value)
+
+
+def JSONDict():
+    """JSON object column; in-place changes to top-level keys mark the row dirty"""
+    return MutableDict.as_mutable(JSONText)
+
+
+def JSONList():
+    """JSON array column; append/remove/item assignment mark the row dirty"""
+    return MutableList.as_mutable(JSONText)
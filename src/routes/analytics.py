@@ -1,8 +1,6 @@
 from flask import Blueprint, jsonify, request
-from src.models.learner import Learner
 from src.services.analytics_service import LearningAnalyticsService
 from src.services.ai_service import AIContentGenerator
-import json
 
 analytics_bp = Blueprint('analytics', __name__)
 analytics_service = LearningAnalyticsService()
@@ -43,34 +41,55 @@ def analyze_knowledge_gaps(learner_id):
         data = request.json
         learner_responses = data.get('responses', [])
         
-        learner = Learner.query.get_or_404(learner_id)
-        learner_profile = learner.to_dict()
+        context = analytics_service.context(learner_id)
+        if context.learner is None:
+            return jsonify({'error': 'Learner not found'}), 404
         
-        gaps = ai_generator.analyze_knowledge_gaps(learner_responses, learner_profile)
+        gaps = ai_generator.analyze_knowledge_gaps(learner_responses, context.profile)
         
         return jsonify({
             'learner_id': learner_id,
             'knowledge_gaps': gaps,
-            'analysis_date': analytics_service.generate_progress_report(learner_id).get('generated_at')
+            'analysis_date': context.generated_at.isoformat()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@analytics_bp.route('/analytics/cohort/knowledge-gaps', methods=['POST'])
+def analyze_cohort_knowledge_gaps():
+    """Analyze knowledge gaps for many learners at once"""
+    try:
+        data = request.json or {}
+        responses = data.get('responses', {})
+        top_n = int(data.get('top_n', 5))
+        
+        if not isinstance(responses, (dict, list)):
+            return jsonify({'error': 'responses must be an object keyed by learner id or a list of responses'}), 400
+        
+        analysis = ai_generator.analyze_cohort_knowledge_gaps(responses, top_n=top_n)
+        
+        return jsonify(analysis)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @analytics_bp.route('/learners/<int:learner_id>/analytics/learning-path', methods=['POST'])
 def get_learning_path_recommendations(learner_id):
     """Get personalized learning path recommendations"""
     try:
         data = request.json or {}
         
-        learner = Learner.query.get_or_404(learner_id)
-        learner_profile = learner.to_dict()
+        context = analytics_service.context(learner_id)
+        learner = context.learner
+        if learner is None:
+            return jsonify({'error': 'Learner not found'}), 404
+        learner_profile = context.profile
         
         # Get knowledge gaps
         learner_responses = data.get('responses', [])
         knowledge_gaps = ai_generator.analyze_knowledge_gaps(learner_responses, learner_profile)
         
         # Get current performance
-        current_performance = analytics_service.generate_progress_report(learner_id).get('overall_progress', {})
+        current_performance = analytics_service.generate_progress_report(learner_id, context=context).get('overall_progress', {})
         
         # Generate recommendations
         recommendations = ai_generator.recommend_learning_path(
@@ -121,17 +140,18 @@ def adjust_content_difficulty(learner_id):
         new_difficulty = ai_generator.adjust_difficulty(current_difficulty, performance_score)
         
         # Update learner's experience level if significantly different
-        learner = Learner.query.get_or_404(learner_id)
+        context = analytics_service.context(learner_id)
+        learner = context.learner
+        if learner is None:
+            return jsonify({'error': 'Learner not found'}), 404
         if new_difficulty != current_difficulty:
             # Update engagement metrics to track difficulty adjustments
-            engagement_metrics = json.loads(learner.engagement_metrics or '{}')
-            engagement_metrics['last_difficulty_adjustment'] = {
+            learner.update_engagement_metrics('last_difficulty_adjustment', {
                 'from': current_difficulty,
                 'to': new_difficulty,
                 'performance_score': performance_score,
-                'timestamp': analytics_service.generate_progress_report(learner_id).get('generated_at')
-            }
-            learner.engagement_metrics = json.dumps(engagement_metrics)
+                'timestamp': context.generated_at.isoformat()
+            })
             
             from src.models.learner import db
             db.session.commit()
@@ -150,13 +170,13 @@ def adjust_content_difficulty(learner_id):
 def get_analytics_dashboard(learner_id):
     """Get comprehensive analytics dashboard data"""
     try:
-        # Gather all analytics data
-        velocity = analytics_service.calculate_learning_velocity(learner_id)
-        patterns = analytics_service.analyze_learning_patterns(learner_id)
-        progress_report = analytics_service.generate_progress_report(learner_id)
-        
-        # Get recent performance for knowledge gaps analysis
-        learner = Learner.query.get_or_404(learner_id)
+        # Gather all analytics data; the report reuses the velocity and patterns computed here
+        context = analytics_service.context(learner_id)
+        if context.learner is None:
+            return jsonify({'error': 'Learner not found'}), 404
+        velocity = analytics_service.calculate_learning_velocity(learner_id, context=context)
+        patterns = analytics_service.analyze_learning_patterns(learner_id, context=context)
+        progress_report = analytics_service.generate_progress_report(learner_id, context=context)
         
         # Mock recent responses for demonstration
         mock_responses = [
@@ -165,7 +185,7 @@ def get_analytics_dashboard(learner_id):
             {'concept': 'Algorithm Optimization', 'is_correct': False, 'difficulty_level': 'intermediate'}
         ]
         
-        knowledge_gaps = ai_generator.analyze_knowledge_gaps(mock_responses, learner.to_dict())
+        knowledge_gaps = ai_generator.analyze_knowledge_gaps(mock_responses, context.profile)
         
         dashboard_data = {
             'learner_id': learner_id,
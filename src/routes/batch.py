@@ -0,0 +1,120 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+from flask import Blueprint, jsonify, request, current_app
+from werkzeug.test import EnvironBuilder
+from src.models.user import db
+
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 4))
+ALLOWED_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+# Parent request headers passed on to every sub-request (per-item headers win)
+FORWARDED_HEADERS = ('Authorization', 'Accept', 'Accept-Language', 'Prefer')
+# Sub-response headers that describe the HTTP body rather than the resource
+DROPPED_RESPONSE_HEADERS = ('Content-Length', 'Content-Type')
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='api-batch')
+
+
+def _validate_item(item: Any, index: int) -> str:
+    """Error message for a malformed sub-request, or None"""
+    if not isinstance(item, dict):
+        return f'requests[{index}] must be an object'
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if method not in ALLOWED_METHODS:
+        return f'requests[{index}].method must be one of {", ".join(ALLOWED_METHODS)}'
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        return f'requests[{index}].path must start with /api/'
+    if path.split('?', 1)[0].rstrip('/') == request.path.rstrip('/'):
+        return f'requests[{index}] cannot be a nested batch'
+    if 'headers' in item and not isinstance(item['headers'], dict):
+        return f'requests[{index}].headers must be an object'
+    return None
+
+
+def _environ_for(item: Dict[str, Any]) -> Dict[str, Any]:
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    headers.update({str(name): str(value) for name, value in (item.get('headers') or {}).items()})
+
+    path, _, query_string = item['path'].partition('?')
+    builder = EnvironBuilder(
+        path=path,
+        query_string=query_string or None,
+        method=str(item.get('method', 'GET')).upper(),
+        base_url=request.host_url,
+        headers=headers,
+        json=item['body'] if 'body' in item else None
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def _dispatch(app, environ: Dict[str, Any], item_id: Any) -> Dict[str, Any]:
+    """Run one sub-request through the app's normal routing, error handling and hooks"""
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+            data = response.get_data()
+        except Exception as e:
+            db.session.rollback()
+            return {'id': item_id, 'status': 500, 'headers': {}, 'body': {'error': str(e)}}
+
+    body = None
+    if data:
+        try:
+            body = json.loads(data) if response.is_json else data.decode('utf-8')
+        except ValueError:
+            body = data.decode('utf-8', errors='replace')
+    return {
+        'id': item_id,
+        'status': response.status_code,
+        'headers': {name: value for name, value in response.headers.items() if name not in DROPPED_RESPONSE_HEADERS},
+        'body': body
+    }
+
+
+def _dispatch_in_new_context(app, environ: Dict[str, Any], item_id: Any) -> Dict[str, Any]:
+    # Worker threads get their own app context and therefore their own database session
+    with app.app_context():
+        return _dispatch(app, environ, item_id)
+
+
+@batch_bp.route('/batch', methods=['POST'])
+def run_batch():
+    """
+    Run several API calls in one round trip. Body: {"requests": [{"id", "method", "path",
+    "headers", "body"}, ...], "parallel": false}. Sub-requests run in order and share this
+    request's database session; with "parallel": true they run concurrently and must not depend
+    on each other. Each result carries its own status, headers and body.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'requests must be a non-empty list'}), 400
+    if len(items) > BATCH_MAX_REQUESTS:
+        return jsonify({'error': f'At most {BATCH_MAX_REQUESTS} requests per batch'}), 400
+    for index, item in enumerate(items):
+        error = _validate_item(item, index)
+        if error:
+            return jsonify({'error': error}), 400
+
+    app = current_app._get_current_object()
+    environs = [_environ_for(item) for item in items]
+    item_ids = [item.get('id', index) for index, item in enumerate(items)]
+
+    if data.get('parallel') and len(items) > 1:
+        futures = [
+            _executor.submit(_dispatch_in_new_context, app, environ, item_id)
+            for environ, item_id in zip(environs, item_ids)
+        ]
+        responses: List[Dict[str, Any]] = [future.result() for future in futures]
+    else:
+        responses = [_dispatch(app, environ, item_id) for environ, item_id in zip(environs, item_ids)]
+
+    return jsonify({'responses': responses})
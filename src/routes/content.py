@@ -1,12 +1,30 @@
-from flask import Blueprint, jsonify, request
-from src.models.content import Content, LearningPath, Exercise, db
+from flask import Blueprint, jsonify, request, Response, stream_with_context, url_for, abort
+from src.models.content import Content, ContentConcept, ContentSearchIndex, LearningPath, Exercise, db
 from src.models.learner import Learner
+from src.models.serialization import Field, RowSerializer, paginated_json_response
 from src.services.ai_service import AIContentGenerator
+from src.services.prefetch_service import ContentPrefetcher
+from src.services.knowledge_graph import knowledge_graphs, PrerequisiteCycleError
+from src.services.job_queue import job_queue, JobPartiallyFailed
+from src.services.http_cache import (
+    resource_validators, collection_validators, conditional_response, PUBLIC_CACHE_CONTROL
+)
+from sqlalchemy.orm import selectinload
+from urllib.parse import urlencode
+import base64
+import binascii
 import json
+import os
 from datetime import datetime
 
 content_bp = Blueprint("content", __name__)
 ai_generator = AIContentGenerator()
+prefetcher = ContentPrefetcher(ai_generator)
+
+PATH_CURSOR_DEFAULT_ITEMS = int(os.getenv("PATH_CURSOR_DEFAULT_ITEMS", 3))
+PATH_CURSOR_MAX_ITEMS = int(os.getenv("PATH_CURSOR_MAX_ITEMS", 20))
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
 
 @content_bp.route("/content", methods=["POST"])
 def create_content():
@@ -20,19 +38,24 @@ def create_content():
             if field not in data:
                 return jsonify({"error": f"Missing required field: {field}"}), 400
         
+        try:
+            knowledge_graphs.check_content(data["niche"], data.get("concepts_covered", []), data.get("prerequisites", []))
+        except PrerequisiteCycleError as e:
+            return jsonify({"error": str(e)}), 400
+        
         content = Content(
             title=data["title"],
             content_type=data["content_type"],
             niche=data["niche"],
             difficulty_level=data.get("difficulty_level", "intermediate"),
             content_body=data.get("content_body", ""),
-            content_metadata=json.dumps(data.get("metadata", {})),
-            learning_objectives=json.dumps(data.get("learning_objectives", [])),
-            prerequisites=json.dumps(data.get("prerequisites", [])),
-            concepts_covered=json.dumps(data.get("concepts_covered", [])),
+            content_metadata=data.get("metadata", {}),
+            learning_objectives=data.get("learning_objectives", []),
+            prerequisites=data.get("prerequisites", []),
+            concepts_covered=data.get("concepts_covered", []),
             is_ai_generated=data.get("is_ai_generated", False),
             generation_prompt=data.get("generation_prompt", ""),
-            personalization_params=json.dumps(data.get("personalization_params", {}))
+            personalization_params=data.get("personalization_params", {})
         )
         
         db.session.add(content)
@@ -44,6 +67,41 @@ def create_content():
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+# Mirrors Content.to_dict for list responses
+content_list_serializer = RowSerializer(Content, [
+    Field("id", Content.id),
+    Field("title", Content.title),
+    Field("content_type", Content.content_type),
+    Field("niche", Content.niche),
+    Field("difficulty_level", Content.difficulty_level),
+    Field("content_body", Content.content_body),
+    Field("metadata", Content.content_metadata, "json", "{}"),
+    Field("learning_objectives", Content.learning_objectives, "json", "[]"),
+    Field("prerequisites", Content.prerequisites, "json", "[]"),
+    Field("concepts_covered", Content.concepts_covered, "json", "[]"),
+    Field("is_ai_generated", Content.is_ai_generated),
+    Field("generation_prompt", Content.generation_prompt),
+    Field("personalization_params", Content.personalization_params, "json", "{}"),
+    Field("created_at", Content.created_at, "datetime"),
+    Field("updated_at", Content.updated_at, "datetime")
+])
+
+# Mirrors LearningPath.to_dict for list responses
+learning_path_list_serializer = RowSerializer(LearningPath, [
+    Field("id", LearningPath.id),
+    Field("learner_id", LearningPath.learner_id),
+    Field("path_name", LearningPath.path_name),
+    Field("target_goal", LearningPath.target_goal),
+    Field("estimated_duration_hours", LearningPath.estimated_duration_hours),
+    Field("content_sequence", LearningPath.content_sequence, "json", "[]"),
+    Field("current_position", LearningPath.current_position),
+    Field("completion_status", LearningPath.completion_status),
+    Field("adaptation_history", LearningPath.adaptation_history, "json", "[]"),
+    Field("performance_data", LearningPath.performance_data, "json", "{}"),
+    Field("created_at", LearningPath.created_at, "datetime"),
+    Field("updated_at", LearningPath.updated_at, "datetime")
+])
+
 @content_bp.route("/content", methods=["GET"])
 def get_content():
     """Get content with optional filtering"""
@@ -51,23 +109,84 @@ def get_content():
     content_type = request.args.get("content_type")
     difficulty_level = request.args.get("difficulty_level")
     
-    query = Content.query
+    filters = []
     
     if niche:
-        query = query.filter(Content.niche == niche)
+        filters.append(Content.niche == niche)
     if content_type:
-        query = query.filter(Content.content_type == content_type)
+        filters.append(Content.content_type == content_type)
     if difficulty_level:
-        query = query.filter(Content.difficulty_level == difficulty_level)
+        filters.append(Content.difficulty_level == difficulty_level)
     
-    content_items = query.all()
-    return jsonify([item.to_dict() for item in content_items])
+    return conditional_response(
+        collection_validators(Content, *filters),
+        lambda: paginated_json_response(content_list_serializer, *filters),
+        PUBLIC_CACHE_CONTROL
+    )
+
+def _encode_search_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_search_cursor(cursor):
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["offset"]
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError
+        return offset
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+
+@content_bp.route("/content/search", methods=["GET"])
+def search_content():
+    """
+    Ranked full-text search over titles, bodies and concepts: ?q= (all words must match),
+    optional niche / content_type / difficulty_level filters, ?limit= and ?cursor= paging.
+    Each result carries a highlighted title and body snippet.
+    """
+    query = request.args.get("q", "").strip()
+    if not ContentSearchIndex.terms(query):
+        return jsonify({"error": "q must contain at least one word"}), 400
+    limit = request.args.get("limit", SEARCH_DEFAULT_LIMIT, type=int)
+    if limit < 1:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    limit = min(limit, SEARCH_MAX_LIMIT)
+    offset = 0
+    if request.args.get("cursor"):
+        offset = _decode_search_cursor(request.args["cursor"])
+        if offset is None:
+            return jsonify({"error": "Invalid cursor"}), 400
+    
+    niche = request.args.get("niche") or None
+    content_type = request.args.get("content_type") or None
+    difficulty_level = request.args.get("difficulty_level") or None
+    
+    try:
+        results = ContentSearchIndex.search(
+            query, limit + 1, offset,
+            niche=niche, content_type=content_type, difficulty_level=difficulty_level
+        )
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+    
+    next_cursor = _encode_search_cursor(offset + limit) if len(results) > limit else None
+    response = jsonify({"query": query, "results": results[:limit], "next_cursor": next_cursor})
+    if next_cursor:
+        args = [(key, value) for key, value in request.args.items(multi=True) if key != "cursor"]
+        args.append(("cursor", next_cursor))
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
 
 @content_bp.route("/content/<int:content_id>", methods=["GET"])
 def get_content_by_id(content_id):
     """Get specific content by ID"""
-    content = Content.query.get_or_404(content_id)
-    return jsonify(content.to_dict())
+    validators = resource_validators(Content, content_id)
+    if validators is None:
+        abort(404)
+    return conditional_response(
+        validators, lambda: jsonify(Content.query.get(content_id).to_dict()), PUBLIC_CACHE_CONTROL
+    )
 
 @content_bp.route("/content/<int:content_id>", methods=["PUT"])
 def update_content(content_id):
@@ -76,6 +195,14 @@ def update_content(content_id):
         content = Content.query.get_or_404(content_id)
         data = request.json
         
+        if "prerequisites" in data or "concepts_covered" in data:
+            concepts_covered = data.get("concepts_covered", content.concepts_covered or [])
+            prerequisites = data.get("prerequisites", content.prerequisites or [])
+            try:
+                knowledge_graphs.check_content(content.niche, concepts_covered, prerequisites)
+            except PrerequisiteCycleError as e:
+                return jsonify({"error": str(e)}), 400
+        
         # Update fields if provided
         if "title" in data:
             content.title = data["title"]
@@ -84,13 +211,13 @@ def update_content(content_id):
         if "difficulty_level" in data:
             content.difficulty_level = data["difficulty_level"]
         if "metadata" in data:
-            content.content_metadata = json.dumps(data["metadata"])
+            content.content_metadata = data["metadata"]
         if "learning_objectives" in data:
-            content.learning_objectives = json.dumps(data["learning_objectives"])
+            content.learning_objectives = data["learning_objectives"]
         if "prerequisites" in data:
-            content.prerequisites = json.dumps(data["prerequisites"])
+            content.prerequisites = data["prerequisites"]
         if "concepts_covered" in data:
-            content.concepts_covered = json.dumps(data["concepts_covered"])
+            content.concepts_covered = data["concepts_covered"]
         
         content.updated_at = datetime.utcnow()
         db.session.commit()
@@ -133,9 +260,9 @@ def create_learning_path():
             path_name=data.get("path_name", f"Learning Path for {learner.target_niche}"),
             target_goal=data.get("target_goal", ""),
             estimated_duration_hours=data.get("estimated_duration_hours", 40),
-            content_sequence=json.dumps(data.get("content_sequence", [])),
-            adaptation_history=json.dumps([]),
-            performance_data=json.dumps({})
+            content_sequence=data.get("content_sequence", []),
+            adaptation_history=[],
+            performance_data={}
         )
         
         db.session.add(learning_path)
@@ -150,15 +277,25 @@ def create_learning_path():
 @content_bp.route("/learning-paths/<int:path_id>", methods=["GET"])
 def get_learning_path(path_id):
     """Get learning path by ID"""
-    path = LearningPath.query.get_or_404(path_id)
-    return jsonify(path.to_dict())
+    validators = resource_validators(LearningPath, path_id)
+    if validators is None:
+        abort(404)
+    return conditional_response(validators, lambda: jsonify(LearningPath.query.get(path_id).to_dict()))
 
 @content_bp.route("/learning-paths/learner/<int:learner_id>", methods=["GET"])
 def get_learner_paths(learner_id):
     """Get all learning paths for a learner"""
     learner = Learner.query.get_or_404(learner_id)
-    paths = LearningPath.query.filter_by(learner_id=learner_id).all()
-    return jsonify([path.to_dict() for path in paths])
+    filters = [LearningPath.learner_id == learner_id]
+    
+    completion_status = request.args.get("completion_status")
+    if completion_status:
+        filters.append(LearningPath.completion_status == completion_status)
+    
+    return conditional_response(
+        collection_validators(LearningPath, *filters),
+        lambda: paginated_json_response(learning_path_list_serializer, *filters)
+    )
 
 @content_bp.route("/learning-paths/<int:path_id>/next-content", methods=["GET"])
 def get_next_content(path_id):
@@ -167,6 +304,7 @@ def get_next_content(path_id):
     next_content_id = path.get_next_content()
     
     if next_content_id:
+        prefetcher.schedule_for_path(path)
         content = Content.query.get(next_content_id)
         if content:
             return jsonify({
@@ -192,14 +330,17 @@ def advance_learning_path(path_id):
         # Record performance data if provided
         data = request.json or {}
         if "performance_score" in data:
-            performance_data = json.loads(path.performance_data) if path.performance_data else {}
-            performance_data[str(path.current_position)] = data["performance_score"]
-            path.performance_data = json.dumps(performance_data)
+            if path.performance_data is None:
+                path.performance_data = {}
+            path.performance_data[str(path.current_position)] = data["performance_score"]
         
         # Advance position
         has_more = path.advance_position()
         db.session.commit()
         
+        if has_more:
+            prefetcher.schedule_for_path(path)
+        
         return jsonify({
             "path_id": path_id,
             "new_position": path.current_position,
@@ -211,6 +352,98 @@ def advance_learning_path(path_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+@content_bp.route("/learning-paths/<int:path_id>/cursor", methods=["GET", "POST"])
+def learning_path_cursor(path_id):
+    """
+    The next `count` items of a learning path with their exercises, in one round trip.
+    POST with {"advance": true} (and optionally "performance_score") first advances the
+    path, in the same transaction as the read.
+    """
+    try:
+        data = (request.get_json(silent=True) or {}) if request.method == "POST" else {}
+        count = request.args.get("count", data.get("count", PATH_CURSOR_DEFAULT_ITEMS), type=int)
+        if not isinstance(count, int) or count < 1:
+            return jsonify({"error": "count must be a positive integer"}), 400
+        count = min(count, PATH_CURSOR_MAX_ITEMS)
+        advance = bool(data.get("advance"))
+        
+        query = LearningPath.query.filter_by(id=path_id)
+        if advance:
+            # Serialize concurrent advances of the same path (no-op on SQLite)
+            query = query.with_for_update()
+        path = query.first()
+        if path is None:
+            return jsonify({"error": "Learning path not found"}), 404
+        
+        has_more = True
+        if advance:
+            if "performance_score" in data:
+                if path.performance_data is None:
+                    path.performance_data = {}
+                path.performance_data[str(path.current_position)] = data["performance_score"]
+            has_more = path.advance_position()
+        
+        sequence = path.content_sequence or []
+        upcoming_ids = list(sequence[path.current_position:path.current_position + count]) if has_more else []
+        
+        # One IN query for the content and one for all of their exercises
+        contents = Content.query.options(selectinload(Content.exercises)).filter(
+            Content.id.in_(upcoming_ids)
+        ).all() if upcoming_ids else []
+        contents_by_id = {content.id: content for content in contents}
+        
+        items = []
+        for offset, content_id in enumerate(upcoming_ids):
+            content = contents_by_id.get(content_id)
+            if content is None:
+                continue
+            items.append({
+                "position": path.current_position + offset,
+                "content": content.to_dict(),
+                "exercises": [exercise.to_dict() for exercise in content.exercises]
+            })
+        
+        response = {
+            "path_id": path_id,
+            "current_position": path.current_position,
+            "completion_status": path.completion_status,
+            "has_more_content": has_more and path.current_position + len(upcoming_ids) < len(sequence),
+            "items": items,
+            "missing_content_ids": [content_id for content_id in upcoming_ids if content_id not in contents_by_id]
+        }
+        
+        if advance:
+            db.session.commit()
+        if items:
+            prefetcher.schedule_for_path(path)
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@content_bp.route("/learning-paths/<int:path_id>/prefetch", methods=["POST"])
+def prefetch_learning_path(path_id):
+    """Queue background generation of the upcoming items in a learning path"""
+    path = LearningPath.query.get_or_404(path_id)
+    data = request.json or {}
+    depth = data.get("depth")
+    if depth is not None and (not isinstance(depth, int) or depth < 1):
+        return jsonify({"error": "depth must be a positive integer"}), 400
+    
+    scheduled = prefetcher.schedule_for_path(path, depth)
+    return jsonify({
+        "path_id": path_id,
+        "scheduled": scheduled,
+        "depth": depth or prefetcher.lookahead
+    }), 202
+
+@content_bp.route("/prefetch/stats", methods=["GET"])
+def get_prefetch_stats():
+    """Get background prefetch counters"""
+    return jsonify(prefetcher.stats())
+
 @content_bp.route("/learning-paths/<int:path_id>/add-content", methods=["POST"])
 def add_content_to_path(path_id):
     """Add content to a learning path"""
@@ -248,43 +481,38 @@ def generate_adaptive_path(path_id):
         
         # Get learner\"s knowledge gaps
         knowledge_gaps = learner.get_knowledge_gaps()
+        mastered = learner.get_mastered_concepts()
         
-        # Find relevant content for the learner\"s niche and knowledge gaps
-        relevant_content = Content.query.filter(
-            Content.niche == learner.target_niche,
-            Content.difficulty_level == learner.experience_level
-        ).all()
+        # Everything the gaps and targets transitively depend on that the learner has not mastered
+        graph = knowledge_graphs.for_niche(learner.target_niche)
+        unmet_prerequisites = graph.unmet_prerequisites(knowledge_gaps + target_concepts, mastered)
         
-        # Simple adaptive algorithm: prioritize content that covers knowledge gaps
-        adaptive_sequence = []
-        
-        # Add content for knowledge gaps first
-        for content in relevant_content:
-            concepts_covered = json.loads(content.concepts_covered) if content.concepts_covered else []
-            if any(gap in concepts_covered for gap in knowledge_gaps):
-                adaptive_sequence.append(content.id)
+        # Content covering knowledge gaps first, then missing prerequisites, then targets
+        ranked_content = ContentConcept.ranked_content(
+            learner.target_niche, learner.experience_level,
+            (knowledge_gaps, unmet_prerequisites, target_concepts)
+        )
+        concepts_by_content = dict(ranked_content)
+        adaptive_sequence = [content_id for content_id, _ in ranked_content]
         
-        # Add content for target concepts
-        for content in relevant_content:
-            concepts_covered = json.loads(content.concepts_covered) if content.concepts_covered else []
-            if any(concept in concepts_covered for concept in target_concepts):
-                if content.id not in adaptive_sequence:
-                    adaptive_sequence.append(content.id)
+        # Reorder so content always follows the content covering its prerequisites
+        adaptive_sequence = graph.order_items(adaptive_sequence, concepts_by_content.__getitem__)
         
         # Update the learning path
-        path.content_sequence = json.dumps(adaptive_sequence)
+        path.content_sequence = adaptive_sequence
         path.current_position = 0
         
         # Log the adaptation
-        adaptation_log = json.loads(path.adaptation_history) if path.adaptation_history else []
-        adaptation_log.append({
+        if path.adaptation_history is None:
+            path.adaptation_history = []
+        path.adaptation_history.append({
             "timestamp": datetime.utcnow().isoformat(),
             "reason": "adaptive_generation",
             "knowledge_gaps": knowledge_gaps,
             "target_concepts": target_concepts,
+            "prerequisites_added": unmet_prerequisites,
             "new_sequence_length": len(adaptive_sequence)
         })
-        path.adaptation_history = json.dumps(adaptation_log)
         
         db.session.commit()
         
@@ -293,6 +521,7 @@ def generate_adaptive_path(path_id):
             "adaptive_sequence": adaptive_sequence,
             "knowledge_gaps_addressed": knowledge_gaps,
             "target_concepts": target_concepts,
+            "prerequisites_added": unmet_prerequisites,
             "sequence_length": len(adaptive_sequence)
         })
         
@@ -314,17 +543,22 @@ def create_exercise():
         if not content:
             return jsonify({"error": "Content not found"}), 404
         
+        exercise_type = data.get("exercise_type", "multiple_choice")
+        concepts_covered = content.concepts_covered or []
+        concept = concepts_covered[0] if concepts_covered else content.title
+        
         exercise = Exercise(
             content_id=data["content_id"],
             question=data["question"],
-            exercise_type=data.get("exercise_type", "multiple_choice"),
+            exercise_type=exercise_type,
             correct_answer=data.get("correct_answer", ""),
             explanation=data.get("explanation", ""),
-            options=json.dumps(data.get("options", [])),
+            options=data.get("options", []),
             starter_code=data.get("starter_code", ""),
-            test_cases=json.dumps(data.get("test_cases", [])),
+            test_cases=data.get("test_cases", []),
             difficulty_score=data.get("difficulty_score", 0.5),
-            estimated_time_minutes=data.get("estimated_time_minutes", 5)
+            estimated_time_minutes=data.get("estimated_time_minutes", 5),
+            option_feedback=_option_feedback_for(concept, data, exercise_type, content.difficulty_level)
         )
         
         db.session.add(exercise)
@@ -339,8 +573,9 @@ def create_exercise():
 @content_bp.route("/exercises/content/<int:content_id>", methods=["GET"])
 def get_exercises_for_content(content_id):
     """Get all exercises for a specific content item"""
-    content = Content.query.get_or_404(content_id)
-    exercises = Exercise.query.filter_by(content_id=content_id).all()
+    exercises = Exercise.query.filter_by(content_id=content_id).order_by(Exercise.id).all()
+    if not exercises and db.session.get(Content, content_id) is None:
+        abort(404)
     return jsonify([exercise.to_dict() for exercise in exercises])
 
 @content_bp.route("/exercises/<int:exercise_id>", methods=["GET"])
@@ -349,89 +584,401 @@ def get_exercise(exercise_id):
     exercise = Exercise.query.get_or_404(exercise_id)
     return jsonify(exercise.to_dict())
 
+@content_bp.route("/generation-cache/stats", methods=["GET"])
+def get_generation_cache_stats():
+    """Get hit/miss counters for the AI generation cache and request coalescing"""
+    stats = ai_generator.cache.stats()
+    stats["single_flight"] = ai_generator.single_flight.stats()
+    return jsonify(stats)
+
+def _personalization_params_for(learner):
+    """Personalization parameters used to generate content for a learner"""
+    return {
+        "learning_style": learner.preferred_learning_style,
+        "experience_level": learner.experience_level,
+        "niche": learner.target_niche
+    }
+
+def _option_feedback_for(concept, exercise_data, exercise_type, experience_level):
+    """Per-option feedback for a multiple choice exercise, reusing any that was generated with it"""
+    if exercise_type != "multiple_choice" or not exercise_data.get("options"):
+        return {}
+    if exercise_data.get("option_feedback"):
+        return exercise_data["option_feedback"]
+    return ai_generator.generate_option_feedback(
+        concept=concept,
+        question=exercise_data.get("question", ""),
+        options=exercise_data.get("options", []),
+        correct_answer=exercise_data.get("correct_answer", ""),
+        explanation=exercise_data.get("explanation", ""),
+        experience_level=experience_level
+    )
+
+def _save_generated_content(learner, concept, content_type, generated_data, personalization_params, exercise_type=None):
+    """Add the Content (and Exercise) rows for a generated item to the current session"""
+    if generated_data.get("reused_content_id"):
+        # An existing lesson for a near-identical concept and the same profile; nothing new to store
+        content = db.session.get(Content, generated_data["reused_content_id"])
+        if content is not None:
+            return content
+
+    if content_type == "lesson":
+        content = Content(
+            title=generated_data.get("title", f"{concept} - Personalized Lesson"),
+            content_type="lesson",
+            niche=learner.target_niche,
+            difficulty_level=learner.experience_level,
+            content_body=generated_data.get("content", ""),
+            learning_objectives=generated_data.get("learning_objectives", []),
+            concepts_covered=[concept],
+            is_ai_generated=True,
+            generation_prompt=f"Generate lesson for {concept}",
+            personalization_params=personalization_params
+        )
+        db.session.add(content)
+        return content
+
+    if content_type == "exercise":
+        # Create content record for the exercise
+        content = Content(
+            title=generated_data.get("title", f"{concept} - Practice Exercise"),
+            content_type="exercise",
+            niche=learner.target_niche,
+            difficulty_level=learner.experience_level,
+            content_body=generated_data.get("question", ""),
+            concepts_covered=[concept],
+            is_ai_generated=True,
+            generation_prompt=f"Generate {exercise_type} exercise for {concept}",
+            personalization_params=personalization_params
+        )
+        db.session.add(content)
+        db.session.flush()  # Get the content ID
+
+        # Create exercise record
+        exercise = Exercise(
+            content_id=content.id,
+            question=generated_data.get("question", ""),
+            exercise_type=exercise_type,
+            correct_answer=generated_data.get("correct_answer", ""),
+            explanation=generated_data.get("explanation", ""),
+            options=generated_data.get("options", []),
+            starter_code=generated_data.get("starter_code", ""),
+            test_cases=generated_data.get("test_cases", []),
+            difficulty_score=generated_data.get("difficulty_score", 0.5),
+            estimated_time_minutes=generated_data.get("estimated_time_minutes", 5),
+            option_feedback=_option_feedback_for(concept, generated_data, exercise_type, learner.experience_level)
+        )
+        db.session.add(exercise)
+        return content
+
+    raise ValueError(f"Invalid content_type: {content_type}")
+
+@content_bp.route("/concept-index/stats", methods=["GET"])
+def get_concept_index_stats():
+    """Get size and hit counters for the concept index used to reuse near-duplicate lessons"""
+    return jsonify(ai_generator.concepts.stats())
+
+@content_bp.route("/knowledge-graph/stats", methods=["GET"])
+def get_knowledge_graph_stats():
+    """Get size and compile counters for the prerequisite knowledge graphs"""
+    return jsonify(knowledge_graphs.stats())
+
+@content_bp.route("/knowledge-graph/<niche>/prerequisites", methods=["GET"])
+def get_unmet_prerequisites(niche):
+    """Get prerequisites of the given concepts (comma separated) in dependency order"""
+    concepts = [concept.strip() for concept in request.args.get("concepts", "").split(",") if concept.strip()]
+    mastered = [concept.strip() for concept in request.args.get("mastered", "").split(",") if concept.strip()]
+    graph = knowledge_graphs.for_niche(niche)
+    return jsonify({
+        "niche": niche,
+        "concepts": concepts,
+        "prerequisites": graph.unmet_prerequisites(concepts, mastered)
+    })
+
+@content_bp.route("/llm/status", methods=["GET"])
+def get_llm_status():
+    """Get LLM client pool configuration and circuit breaker state"""
+    return jsonify(ai_generator.llm.status())
+
 @content_bp.route("/learners/<int:learner_id>/generate-content", methods=["POST"])
 def generate_content_for_learner(learner_id):
     """Generate and save personalized content for a learner"""
     try:
-        learner = Learner.query.get_or_404(learner_id)
-        data = request.json
+        learner = db.session.get(Learner, learner_id)
+        if learner is None:
+            return jsonify({"error": "Learner not found"}), 404
+        data = request.json or {}
         
         if "concept" not in data:
             return jsonify({"error": "Missing concept"}), 400
         
         concept = data["concept"]
         content_type = data.get("content_type", "lesson")
-        
-        personalization_params = {
-            "learning_style": learner.preferred_learning_style,
-            "experience_level": learner.experience_level,
-            "niche": learner.target_niche
+        if content_type not in ("lesson", "exercise"):
+            return jsonify({"error": "Invalid content_type"}), 400
+        exercise_type = data.get("exercise_type", "multiple_choice") if content_type == "exercise" else None
+        
+        payload = {
+            "learner_id": learner.id,
+            "concept": concept,
+            "content_type": content_type,
+            "exercise_type": exercise_type
         }
+        if _wants_async(data):
+            if data.get("callback_url") and not job_queue.valid_callback_url(data["callback_url"]):
+                return jsonify({"error": "callback_url must be an http(s) URL on a public or allow-listed host"}), 400
+            return _accepted(job_queue.enqueue(
+                "generate_content", payload, learner_id=learner.id, callback_url=data.get("callback_url")
+            ))
 
-        # Generate content using AI service
-        if content_type == "lesson":
-            generated_data = ai_generator.generate_personalized_content(
-                concept=concept,
-                content_type="lesson",
-                personalization_params=personalization_params
-            )
-            
-            # Create content record
-            content = Content(
-                title=generated_data.get("title", f"{concept} - Personalized Lesson"),
-                content_type="lesson",
-                niche=learner.target_niche,
-                difficulty_level=learner.experience_level,
-                content_body=generated_data.get("content", ""),
-                learning_objectives=json.dumps(generated_data.get("learning_objectives", [])),
-                concepts_covered=json.dumps([concept]),
-                is_ai_generated=True,
-                generation_prompt=f"Generate lesson for {concept}",
-                personalization_params=json.dumps(personalization_params)
-            )
-            
-        elif content_type == "exercise":
-            exercise_type = data.get("exercise_type", "multiple_choice")
-            generated_data = ai_generator.generate_personalized_content(
+        result = _run_generation(payload)
+        # generated_content keeps the shape the frontend reads (title, content, options, correct_answer, ...)
+        return jsonify({
+            **result["content"],
+            "reused": result["reused"],
+            "concept": concept,
+            "learner_id": learner.id,
+            "generated_content": result["generated_content"]
+        }), 200 if result["reused"] else 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+def _run_generation(payload, fallback=True):
+    """Generate and save one item; also the handler for queued generate_content jobs"""
+    learner = db.session.get(Learner, payload["learner_id"])
+    if learner is None:
+        raise ValueError(f"Learner {payload['learner_id']} not found")
+    
+    personalization_params = _personalization_params_for(learner)
+    generated_data = ai_generator.generate_personalized_content(
+        concept=payload["concept"],
+        content_type=payload["content_type"],
+        personalization_params=personalization_params,
+        exercise_type=payload.get("exercise_type"),
+        fallback=fallback
+    )
+    content = _save_generated_content(
+        learner, payload["concept"], payload["content_type"], generated_data, personalization_params,
+        payload.get("exercise_type")
+    )
+    db.session.commit()
+    
+    generated_content = dict(generated_data)
+    if payload["content_type"] == "exercise" and content.exercises:
+        exercise = content.exercises[0]
+        generated_content.update({
+            "exercise_id": exercise.id,
+            "options": exercise.options,
+            "correct_answer": exercise.correct_answer
+        })
+    return {
+        "content_id": content.id,
+        "reused": bool(generated_data.get("reused_content_id")),
+        "content": content.to_dict(),
+        "generated_content": generated_content
+    }
+
+def _wants_async(data):
+    """True if the client asked for a queued job (?async=true, "async": true or Prefer: respond-async)"""
+    if request.args.get("async", "").lower() in ("1", "true", "yes"):
+        return True
+    if "respond-async" in request.headers.get("Prefer", "").lower():
+        return True
+    return bool(data.get("async"))
+
+def _accepted(job):
+    """202 response pointing at the job status endpoint"""
+    status_url = url_for("jobs.get_job", job_id=job.id)
+    response = jsonify({"job_id": job.id, "status": job.status, "status_url": status_url})
+    response.status_code = 202
+    response.headers["Location"] = status_url
+    return response
+
+def _sse(event, data):
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@content_bp.route("/learners/<int:learner_id>/generate-content/stream", methods=["POST"])
+def stream_content_for_learner(learner_id):
+    """Stream personalized content generation as Server-Sent Events, then save it"""
+    learner = Learner.query.get_or_404(learner_id)
+    data = request.json or {}
+    
+    if "concept" not in data:
+        return jsonify({"error": "Missing concept"}), 400
+    
+    concept = data["concept"]
+    content_type = data.get("content_type", "lesson")
+    if content_type not in ("lesson", "exercise"):
+        return jsonify({"error": "Invalid content_type"}), 400
+    exercise_type = data.get("exercise_type", "multiple_choice") if content_type == "exercise" else None
+    save = data.get("save", True)
+    
+    personalization_params = _personalization_params_for(learner)
+    
+    def generate():
+        try:
+            events = ai_generator.generate_personalized_content(
                 concept=concept,
-                content_type="exercise",
+                content_type=content_type,
                 personalization_params=personalization_params,
-                exercise_type=exercise_type
-            )
-            # Create content record for the exercise
-            content = Content(
-                title=generated_data.get("title", f"{concept} - Practice Exercise"),
-                content_type="exercise",
-                niche=learner.target_niche,
-                difficulty_level=learner.experience_level,
-                content_body=generated_data.get("question", ""),
-                concepts_covered=json.dumps([concept]),
-                is_ai_generated=True,
-                generation_prompt=f"Generate {exercise_type} exercise for {concept}",
-                personalization_params=json.dumps(personalization_params)
-            )
-            db.session.add(content)
-            db.session.flush()  # Get the content ID
-
-            # Create exercise record
-            exercise = Exercise(
-                content_id=content.id,
-                question=generated_data.get("question", ""),
                 exercise_type=exercise_type,
-                correct_answer=generated_data.get("correct_answer", ""),
-                explanation=generated_data.get("explanation", ""),
-                options=json.dumps(generated_data.get("options", [])),
-                starter_code=generated_data.get("starter_code", ""),
-                test_cases=json.dumps(generated_data.get("test_cases", [])),
-                difficulty_score=generated_data.get("difficulty_score", 0.5),
-                estimated_time_minutes=generated_data.get("estimated_time_minutes", 5)
+                stream=True
             )
-            db.session.add(exercise)
+            for event in events:
+                if event["event"] != "complete":
+                    yield _sse(event["event"], event["data"])
+                    continue
+                
+                generated_data = event["data"]
+                payload = {
+                    "concept": concept,
+                    "content_type": content_type,
+                    "learner_id": learner_id,
+                    "generated_content": generated_data
+                }
+                if save:
+                    content = _save_generated_content(
+                        learner, concept, content_type, generated_data, personalization_params, exercise_type
+                    )
+                    db.session.commit()
+                    payload["content"] = content.to_dict()
+                    payload["reused"] = bool(generated_data.get("reused_content_id"))
+                yield _sse("complete", payload)
+        except Exception as e:
+            db.session.rollback()
+            yield _sse("error", {"error": str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        db.session.commit()
-        return jsonify(content.to_dict()), 201
+@content_bp.route("/learners/<int:learner_id>/generate-content/batch", methods=["POST"])
+def generate_content_batch_for_learner(learner_id):
+    """Generate and save personalized content for many concepts concurrently"""
+    try:
+        learner = db.session.get(Learner, learner_id)
+        if learner is None:
+            return jsonify({"error": "Learner not found"}), 404
+        data = request.json or {}
+        
+        # Accept explicit items, or the cross product of concepts and content types
+        items = data.get("items")
+        if items is None:
+            concepts = data.get("concepts", [])
+            content_types = data.get("content_types", ["lesson"])
+            items = [
+                {"concept": concept, "content_type": content_type}
+                for concept in concepts
+                for content_type in content_types
+            ]
+        
+        if not items:
+            return jsonify({"error": "Missing items or concepts"}), 400
+        
+        max_items = int(os.getenv("AI_GENERATION_MAX_BATCH_ITEMS", 50))
+        if len(items) > max_items:
+            return jsonify({"error": f"Too many items (maximum {max_items})"}), 400
+        
+        payload = {"learner_id": learner.id, "items": items}
+        if _wants_async(data):
+            if data.get("callback_url") and not job_queue.valid_callback_url(data["callback_url"]):
+                return jsonify({"error": "callback_url must be an http(s) URL on a public or allow-listed host"}), 400
+            return _accepted(job_queue.enqueue(
+                "generate_content_batch", payload, learner_id=learner.id, callback_url=data.get("callback_url")
+            ))
+        
+        result = _run_generation_batch(payload)
+        return jsonify(result), 201 if result["created"] else 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+def _run_generation_batch(payload, fallback=True):
+    """
+    Generate and save a batch of items; also the handler for queued generate_content_batch jobs.
+    Queued batches run with fallback=False: items that hit LLM errors are not saved as mock content,
+    and the job is retried with just those items, carrying the finished results forward.
+    """
+    learner = db.session.get(Learner, payload["learner_id"])
+    if learner is None:
+        raise ValueError(f"Learner {payload['learner_id']} not found")
+    items = payload["items"]
+    
+    # Results from earlier attempts of a queued batch, keyed by their index in the original request
+    results = list(payload.get("results", []))
+    pending = []
+    for position, item in enumerate(items):
+        index = item.get("index", position) if isinstance(item, dict) else position
+        if not isinstance(item, dict) or not item.get("concept"):
+            results.append({"index": index, "status": "failed", "error": "Missing concept"})
+            continue
+        content_type = item.get("content_type", "lesson")
+        if content_type not in ("lesson", "exercise"):
+            results.append({"index": index, "concept": item["concept"], "status": "failed", "error": "Invalid content_type"})
+            continue
+        pending.append((index, {
+            "concept": item["concept"],
+            "content_type": content_type,
+            "exercise_type": item.get("exercise_type", "multiple_choice") if content_type == "exercise" else None
+        }))
+    
+    personalization_params = _personalization_params_for(learner)
+    generated = ai_generator.generate_personalized_content_batch(
+        [item for _, item in pending],
+        personalization_params,
+        fallback=fallback
+    )
+    
+    # Save every successful item in a single transaction
+    created = []
+    retry = []
+    for (index, item), outcome in zip(pending, generated):
+        result = {"index": index, "concept": item["concept"], "content_type": item["content_type"]}
+        if outcome["status"] != "ok":
+            result.update({"status": "failed", "error": outcome["error"]})
+            if not fallback:
+                retry.append(({**item, "index": index}, outcome["error"]))
+        else:
+            content = _save_generated_content(
+                learner, item["concept"], item["content_type"], outcome["content"],
+                personalization_params, item["exercise_type"]
+            )
+            created.append((result, content, bool(outcome["content"].get("reused_content_id"))))
+        results.append(result)
+    
+    db.session.commit()
+    
+    for result, content, reused in created:
+        result.update({"status": "reused" if reused else "created", "content": content.to_dict()})
+    results.sort(key=lambda result: result["index"])
+    
+    summary = {
+        "learner_id": learner.id,
+        "requested": len(results),
+        "created": sum(1 for result in results if result["status"] == "created"),
+        "reused": sum(1 for result in results if result["status"] == "reused"),
+        "failed": sum(1 for result in results if result["status"] == "failed"),
+        "results": results
+    }
+    if retry:
+        retry_indexes = {item["index"] for item, _ in retry}
+        raise JobPartiallyFailed(
+            f"{len(retry)} of {len(pending)} items failed; first error: {retry[0][1]}",
+            {
+                "learner_id": learner.id,
+                "items": [item for item, _ in retry],
+                "results": [result for result in results if result["index"] not in retry_indexes]
+            },
+            summary
+        )
+    return summary
+
+# Queued generations run the same code paths in the worker process; LLM errors are retried, never saved as mock content
+job_queue.register("generate_content", lambda payload: _run_generation(payload, fallback=False))
+job_queue.register("generate_content_batch", lambda payload: _run_generation_batch(payload, fallback=False))
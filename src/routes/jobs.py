@@ -0,0 +1,45 @@
+from flask import Blueprint, jsonify, request
+from src.models.job import GenerationJob
+from src.services.job_queue import job_queue
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status (and result, once finished) of a queued generation job"""
+    job = GenerationJob.query.get_or_404(job_id)
+    response = jsonify(job.to_dict())
+    if job.status in ('queued', 'running'):
+        # Hint for polling clients
+        response.headers['Retry-After'] = '2'
+    return response
+
+@jobs_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """List jobs, newest first; filter by status (e.g. dead for the dead-letter queue) or learner_id"""
+    query = GenerationJob.query
+
+    status = request.args.get('status')
+    learner_id = request.args.get('learner_id', type=int)
+    limit = min(request.args.get('limit', 50, type=int), 200)
+
+    if status:
+        query = query.filter(GenerationJob.status == status)
+    if learner_id:
+        query = query.filter(GenerationJob.learner_id == learner_id)
+
+    jobs = query.order_by(GenerationJob.id.desc()).limit(limit).all()
+    return jsonify([job.to_dict() for job in jobs])
+
+@jobs_bp.route('/jobs/<int:job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """Requeue a dead-lettered job"""
+    job = GenerationJob.query.get_or_404(job_id)
+    if job.status != 'dead':
+        return jsonify({'error': f'Only dead jobs can be retried (job is {job.status})'}), 409
+    return jsonify(job_queue.retry(job).to_dict()), 202
+
+@jobs_bp.route('/jobs/stats', methods=['GET'])
+def get_job_stats():
+    """Get job counts by status and queue configuration"""
+    return jsonify(job_queue.stats())
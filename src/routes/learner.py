@@ -1,8 +1,11 @@
-from flask import Blueprint, request, jsonify
-from src.models.learner import Learner, LearningSession, db
+from flask import Blueprint, request, jsonify, abort
+from src.models.learner import Learner, LearningSession, LearnerConceptMastery, db
 from src.models.user import User
+from src.services.http_cache import resource_validators, collection_validators, conditional_response
+from src.models.serialization import Field, RowSerializer, SortKey, paginated_json_response
+from src.models.content import Content, Exercise
 from src.services.ai_service import AIContentGenerator
-import json
+from src.services.structured_output import answer_letter
 from datetime import datetime
 import traceback # Add this import at the top of the file if not already there
 import sys
@@ -10,6 +13,40 @@ import sys
 learner_bp = Blueprint('learner', __name__)
 ai_generator = AIContentGenerator()
 
+# Mirror Learner.to_dict and LearningSession.to_dict for list responses
+learner_list_serializer = RowSerializer(Learner, [
+    Field('id', Learner.id),
+    Field('user_id', Learner.user_id),
+    Field('learning_goals', Learner.learning_goals, 'json', '[]'),
+    Field('preferred_learning_style', Learner.preferred_learning_style),
+    Field('time_availability', Learner.time_availability),
+    Field('experience_level', Learner.experience_level),
+    Field('target_niche', Learner.target_niche),
+    Field('engagement_metrics', Learner.engagement_metrics, 'json', '{}'),
+    Field('learning_preferences', Learner.learning_preferences, 'json', '{}'),
+    Field('created_at', Learner.created_at, 'datetime'),
+    Field('updated_at', Learner.updated_at, 'datetime')
+], computed={
+    'knowledge_state': lambda rows: LearnerConceptMastery.knowledge_states([row[0] for row in rows])
+})
+
+session_list_serializer = RowSerializer(LearningSession, [
+    Field('id', LearningSession.id),
+    Field('learner_id', LearningSession.learner_id),
+    Field('session_start', LearningSession.session_start, 'datetime'),
+    Field('session_end', LearningSession.session_end, 'datetime'),
+    Field('duration_minutes', LearningSession.duration_minutes),
+    Field('content_accessed', LearningSession.content_accessed, 'json', '[]'),
+    Field('exercises_completed', LearningSession.exercises_completed, 'json', '[]'),
+    Field('performance_scores', LearningSession.performance_scores, 'json', '{}'),
+    Field('clicks', LearningSession.clicks),
+    Field('time_on_content', LearningSession.time_on_content),
+    Field('completion_rate', LearningSession.completion_rate)
+], order=[
+    SortKey(LearningSession.session_start, descending=True, kind='datetime'),
+    SortKey(LearningSession.id, descending=True)
+])
+
 @learner_bp.route('/learners', methods=['POST'])
 def create_learner_profile():
     """Create a new learner profile"""
@@ -35,14 +72,14 @@ def create_learner_profile():
         # Create new learner profile
         learner = Learner(
             user_id=data['user_id'],
-            learning_goals=json.dumps(data.get('learning_goals', [])),
+            learning_goals=data.get('learning_goals', []),
             preferred_learning_style=data.get('preferred_learning_style', 'visual'),
             time_availability=data.get('time_availability', 300),  # Default 5 hours per week
             experience_level=data.get('experience_level', 'beginner'),
             target_niche=data['target_niche'],
-            knowledge_state=json.dumps({}),
-            engagement_metrics=json.dumps({}),
-            learning_preferences=json.dumps({})
+            knowledge_state={},
+            engagement_metrics={},
+            learning_preferences={}
         )
         
         db.session.add(learner)
@@ -56,15 +93,28 @@ def create_learner_profile():
 
 @learner_bp.route('/learners', methods=['GET'])
 def get_all_learners():
-    """Get all learner profiles"""
-    learners = Learner.query.all()
-    return jsonify([learner.to_dict() for learner in learners])
+    """Get learner profiles, optionally filtered by niche or experience level"""
+    filters = []
+    
+    target_niche = request.args.get('target_niche')
+    experience_level = request.args.get('experience_level')
+    if target_niche:
+        filters.append(Learner.target_niche == target_niche)
+    if experience_level:
+        filters.append(Learner.experience_level == experience_level)
+    
+    return conditional_response(
+        collection_validators(Learner, *filters),
+        lambda: paginated_json_response(learner_list_serializer, *filters)
+    )
 
 @learner_bp.route('/learners/<int:learner_id>', methods=['GET'])
 def get_learner_profile(learner_id):
     """Get learner profile by ID"""
-    learner = Learner.query.get_or_404(learner_id)
-    return jsonify(learner.to_dict())
+    validators = resource_validators(Learner, learner_id)
+    if validators is None:
+        abort(404)
+    return conditional_response(validators, lambda: jsonify(Learner.query.get(learner_id).to_dict()))
 
 @learner_bp.route('/learners/<int:learner_id>', methods=['PUT'])
 def update_learner_profile(learner_id):
@@ -75,7 +125,7 @@ def update_learner_profile(learner_id):
         
         # Update fields if provided
         if 'learning_goals' in data:
-            learner.learning_goals = json.dumps(data['learning_goals'])
+            learner.learning_goals = data['learning_goals']
         if 'preferred_learning_style' in data:
             learner.preferred_learning_style = data['preferred_learning_style']
         if 'time_availability' in data:
@@ -103,6 +153,8 @@ def update_knowledge_state(learner_id):
         
         if 'concept' not in data or 'mastery_level' not in data:
             return jsonify({'error': 'Missing concept or mastery_level'}), 400
+        if isinstance(data['mastery_level'], bool) or not isinstance(data['mastery_level'], (int, float)):
+            return jsonify({'error': 'mastery_level must be a number'}), 400
         
         learner.update_knowledge_state(data['concept'], data['mastery_level'])
         db.session.commit()
@@ -131,6 +183,33 @@ def get_knowledge_gaps(learner_id):
         'threshold': threshold
     })
 
+@learner_bp.route('/concepts/<path:concept>/knowledge-gaps', methods=['GET'])
+def get_concept_knowledge_gaps(concept):
+    """Get learners whose mastery of a concept is below threshold"""
+    threshold = request.args.get('threshold', 0.7, type=float)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    niche = request.args.get('niche')
+    
+    learners = LearnerConceptMastery.learners_below(concept, threshold, limit=limit, niche=niche)
+    
+    return jsonify({
+        'concept': concept,
+        'threshold': threshold,
+        'learners': learners
+    })
+
+@learner_bp.route('/concepts/knowledge-gaps', methods=['GET'])
+def get_knowledge_gap_summary():
+    """Get the concepts with the most learners below threshold"""
+    threshold = request.args.get('threshold', 0.7, type=float)
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    niche = request.args.get('niche')
+    
+    return jsonify({
+        'threshold': threshold,
+        'concepts': LearnerConceptMastery.gap_summary(threshold, limit=limit, niche=niche)
+    })
+
 # --- SESSION ROUTES (Reverted to separate GET and POST handlers) ---
 
 @learner_bp.route('/learners/<int:learner_id>/sessions', methods=['POST'])
@@ -149,10 +228,10 @@ def get_learning_sessions(learner_id):
     """Get all learning sessions for a learner"""
     # Simplified for testing
     learner = Learner.query.get_or_404(learner_id)
-    sessions = LearningSession.query.filter_by(learner_id=learner_id).order_by(
-        LearningSession.session_start.desc()
-    ).all()
-    return jsonify([session.to_dict() for session in sessions])
+    # Unpaginated unless the client asks: the dashboard totals and session lookup read the whole list
+    return paginated_json_response(
+        session_list_serializer, LearningSession.learner_id == learner_id, default_limit=None
+    )
 
 
 @learner_bp.route('/learners/<int:learner_id>/sessions/<int:session_id>', methods=['PUT'])
@@ -168,11 +247,11 @@ def update_learning_session(learner_id, session_id):
         
         # Update session data
         if 'content_accessed' in data:
-            session.content_accessed = json.dumps(data['content_accessed'])
+            session.content_accessed = data['content_accessed']
         if 'exercises_completed' in data:
-            session.exercises_completed = json.dumps(data['exercises_completed'])
+            session.exercises_completed = data['exercises_completed']
         if 'performance_scores' in data:
-            session.performance_scores = json.dumps(data['performance_scores'])
+            session.performance_scores = data['performance_scores']
         if 'clicks' in data:
             session.clicks = data['clicks']
         if 'time_on_content' in data:
@@ -218,62 +297,6 @@ def end_learning_session(learner_id, session_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@learner_bp.route('/learners/<int:learner_id>/generate-content', methods=['POST'])
-def generate_personalized_content(learner_id):
-    """Generate personalized content for a learner"""
-    try:
-        learner = Learner.query.get_or_404(learner_id)
-        data = request.json
-        
-        if 'concept' not in data:
-            return jsonify({'error': 'Missing concept'}), 400
-        
-        concept = data['concept']
-        content_type = data.get('content_type', 'lesson')
-        difficulty_level = data.get('difficulty_level', learner.experience_level)
-        
-        learner_profile = learner.to_dict()
-        
-        # Prepare personalization parameters
-        personalization_params = {
-            'learning_style': learner.preferred_learning_style,
-            'experience_level': learner.experience_level,
-            'niche': learner.target_niche
-        }
-        
-        if content_type == 'lesson':
-            generated_content = ai_generator.generate_personalized_content(
-                concept=concept,
-                content_type='lesson',
-                personalization_params=personalization_params
-            )
-        elif content_type == 'exercise':
-            exercise_type = data.get('exercise_type', 'multiple_choice')
-            generated_content = ai_generator.generate_personalized_content(
-                concept=concept,
-                content_type='exercise',
-                personalization_params=personalization_params,
-                exercise_type=exercise_type
-            )
-        else:
-            return jsonify({'error': 'Invalid content_type'}), 400
-        
-        return jsonify({
-            'concept': concept,
-            'content_type': content_type,
-            'learner_id': learner_id,
-            'generated_content': generated_content,
-            'personalization_params': {
-                'learning_style': learner.preferred_learning_style,
-                'experience_level': learner.experience_level,
-                'niche': learner.target_niche,
-                'difficulty_level': difficulty_level
-            }
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
 @learner_bp.route('/learners/<int:learner_id>/feedback', methods=['POST'])
 def generate_personalized_feedback(learner_id):
     """Generate personalized feedback for a learner's response"""
@@ -281,24 +304,59 @@ def generate_personalized_feedback(learner_id):
         learner = Learner.query.get_or_404(learner_id)
         data = request.json
         
-        required_fields = ['learner_answer', 'correct_answer', 'concept']
+        learning_style = learner.preferred_learning_style or 'visual'
+        exercise = None
+        if 'exercise_id' in data:
+            exercise = Exercise.query.get(data['exercise_id'])
+            if not exercise:
+                return jsonify({'error': 'Exercise not found'}), 404
+            required_fields = ['learner_answer']
+        else:
+            required_fields = ['learner_answer', 'correct_answer', 'concept']
+        
         for field in required_fields:
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
-        learner_profile = learner.to_dict()
-        
-        feedback = ai_generator.generate_personalized_feedback(
-            learner_answer=data['learner_answer'],
-            correct_answer=data['correct_answer'],
-            concept=data['concept'],
-            learner_profile=learner_profile
-        )
+        learner_answer = data['learner_answer']
+        feedback = None
+        
+        if exercise:
+            options = exercise.options or []
+            correct_answer = exercise.correct_answer
+            concept = data.get('concept') or _exercise_concept(exercise)
+            chosen_letter = answer_letter(learner_answer, options)
+            is_correct = chosen_letter is not None and chosen_letter == answer_letter(correct_answer, options)
+            if not is_correct and chosen_letter:
+                # Feedback for wrong options is precomputed when the exercise is created
+                feedback = exercise.get_option_feedback(learning_style, chosen_letter)
+                source = 'precomputed'
+        else:
+            correct_answer = data['correct_answer']
+            concept = data['concept']
+            is_correct = learner_answer == correct_answer
+        
+        if is_correct:
+            feedback = ai_generator.correct_answer_feedback(concept, learning_style)
+            source = 'template'
+        elif feedback is None:
+            feedback = ai_generator.generate_personalized_feedback(
+                learner_answer=learner_answer,
+                correct_answer=correct_answer,
+                concept=concept,
+                personalization_params={
+                    'learning_style': learning_style,
+                    'experience_level': learner.experience_level
+                }
+            )
+            source = 'generated'
         
         return jsonify({
             'learner_id': learner_id,
-            'concept': data['concept'],
+            'concept': concept,
             'feedback': feedback,
+            'is_correct': is_correct,
+            'feedback_source': source,
             'personalized_for': {
                 'learning_style': learner.preferred_learning_style,
                 'experience_level': learner.experience_level
@@ -307,3 +365,11 @@ def generate_personalized_feedback(learner_id):
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+def _exercise_concept(exercise):
+    """Concept an exercise tests, taken from its parent content"""
+    content = Content.query.get(exercise.content_id)
+    concepts_covered = content.concepts_covered if content and content.concepts_covered else []
+    if concepts_covered:
+        return concepts_covered[0]
+    return content.title if content else 'this concept'
@@ -1,12 +1,19 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import User, db
+from src.models.serialization import Field, RowSerializer, paginated_json_response
 
 user_bp = Blueprint('user', __name__)
 
+# Mirrors User.to_dict for list responses
+user_list_serializer = RowSerializer(User, [
+    Field('id', User.id),
+    Field('username', User.username),
+    Field('email', User.email)
+])
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    return paginated_json_response(user_list_serializer)
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -1,84 +1,347 @@
 import os
+import re
 import json
-from typing import Dict, Any, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Iterator
 from dotenv import load_dotenv
+from flask import current_app, has_app_context
 
 # Load environment variables
 load_dotenv()
 
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+from src.services.generation_cache import generation_cache
+from src.services.cohort_analysis import analyze_cohort_gaps
+from src.services.knowledge_graph import knowledge_graphs
+from src.services.concept_index import concept_index
+from src.services.single_flight import generation_single_flight
+from src.services.llm_client import llm_registry, OPENAI_AVAILABLE
+from src.services.structured_output import (
+    LESSON_SCHEMA, EXERCISE_SCHEMA, OPTION_LETTERS, schema_prompt, parse_structured_content,
+    answer_letter, parse_option_feedback
+)
+
+if not OPENAI_AVAILABLE:
     print("OpenAI library not installed. Using mock responses.")
 
+LEARNING_STYLES = ['visual', 'auditory', 'kinesthetic', 'reading_writing']
+
 class AIContentGenerator:
     def __init__(self):
-        self.openai_available = OPENAI_AVAILABLE and os.getenv('OPENAI_API_KEY')
-        if self.openai_available:
-            self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        else:
-            self.client = None
+        # All generators share one client, connection pool and circuit breaker
+        self.llm = llm_registry
+        self.openai_available = self.llm.available
+        self.client = self.llm.get_client()
+        self.cache = generation_cache
+        self.structured_output = os.getenv('AI_STRUCTURED_OUTPUT', 'true').lower() not in ('0', 'false', 'no')
+        self.single_flight = generation_single_flight
+        self.concepts = concept_index
         
     def generate_personalized_content(self, concept: str, content_type: str, 
                                     personalization_params: Dict[str, Any], 
-                                    exercise_type: str = None) -> Dict[str, Any]:
+                                    exercise_type: str = None, stream: bool = False, fallback: bool = True):
         """
-        Generate personalized educational content using OpenAI API or fallback to mock
+        Generate personalized educational content using OpenAI API or fallback to mock.
+        Successful OpenAI generations are cached by (canonical concept, content type, exercise type, profile),
+        and a lesson for a near-identical concept and the same profile is reused instead of generated
+        (the result then carries reused_content_id).
+        
+        If an OpenAI call fails, mock content is returned unless fallback=False, in which case the error is
+        raised so callers such as the job queue can retry.
+        
+        With stream=True an iterator of events is returned instead: {"event": "token", "data": text}
+        as text arrives, then {"event": "complete", "data": parsed_content}.
         """
-        if self.openai_available:
-            return self._generate_with_openai(concept, content_type, personalization_params, exercise_type)
-        else:
+        if stream:
+            return self._stream_personalized_content(concept, content_type, personalization_params, exercise_type)
+        
+        if content_type == 'lesson':
+            reused_content = self.concepts.reusable_lesson(concept, personalization_params)
+            if reused_content is not None:
+                return reused_content
+        
+        if not self.openai_available:
             return self._generate_mock_content(concept, content_type, personalization_params, exercise_type)
+        
+        cache_key = self._cache_key(concept, content_type, personalization_params, exercise_type)
+        cached_content = self.cache.get(cache_key)
+        if cached_content is not None:
+            return cached_content
+        
+        # Identical concurrent requests share a single OpenAI call
+        try:
+            return self.single_flight.do(
+                cache_key,
+                lambda: self._generate_and_cache(cache_key, concept, content_type, personalization_params, exercise_type)
+            )
+        except Exception as e:
+            if not fallback:
+                raise
+            print(f"Error generating content with OpenAI: {e}")
+            # Fallback to mock content if API fails; mock content is never cached
+            return self._generate_mock_content(concept, content_type, personalization_params, exercise_type)
+    
+    def _cache_key(self, concept: str, content_type: str, personalization_params: Dict[str, Any],
+                   exercise_type: str = None) -> str:
+        """Cache key on the canonical concept so spelling variants share generations"""
+        return self.cache.make_key(self.concepts.canonicalizer.key(concept) or concept, content_type,
+                                   personalization_params, exercise_type)
+    
+    def _generate_and_cache(self, cache_key: str, concept: str, content_type: str,
+                            personalization_params: Dict[str, Any],
+                            exercise_type: str = None) -> Dict[str, Any]:
+        """
+        Generate with OpenAI and cache the result; errors propagate to every coalesced caller
+        """
+        # Another worker may have filled the cache while we waited for the generation lock
+        cached_content = self.cache.get(cache_key)
+        if cached_content is not None:
+            return cached_content
+        
+        generated_content = self._generate_with_openai(concept, content_type, personalization_params, exercise_type)
+        self.cache.set(cache_key, generated_content)
+        return generated_content
+    
+    def generate_personalized_content_batch(self, items: List[Dict[str, Any]],
+                                            personalization_params: Dict[str, Any],
+                                            max_workers: int = None, fallback: bool = True) -> List[Dict[str, Any]]:
+        """
+        Generate content for many concepts concurrently through a bounded thread pool.
+        Each item is a dict with concept, content_type and optional exercise_type.
+        With fallback=False, LLM errors come back as item errors instead of mock content.
+        Results come back in input order as {"status": "ok", "content": ...} or {"status": "error", "error": ...}.
+        """
+        if not items:
+            return []
+        
+        if max_workers is None:
+            max_workers = int(os.getenv('AI_GENERATION_MAX_WORKERS', 8))
+        max_workers = max(1, min(max_workers, len(items)))
+        # Workers run in the caller's app context so lessons can be reused from the database
+        app = current_app._get_current_object() if has_app_context() else None
+        
+        def generate(item):
+            try:
+                if app is None:
+                    content = self._generate_item(item, personalization_params, fallback)
+                else:
+                    with app.app_context():
+                        content = self._generate_item(item, personalization_params, fallback)
+                return {"status": "ok", "content": content}
+            except Exception as e:
+                return {"status": "error", "error": str(e)}
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(generate, items))
+    
+    def _generate_item(self, item: Dict[str, Any], personalization_params: Dict[str, Any],
+                       fallback: bool = True) -> Dict[str, Any]:
+        """Generate one batch item"""
+        return self.generate_personalized_content(
+            concept=item["concept"],
+            content_type=item.get("content_type", "lesson"),
+            personalization_params=personalization_params,
+            exercise_type=item.get("exercise_type"),
+            fallback=fallback
+        )
     
     def _generate_with_openai(self, concept: str, content_type: str, 
                              personalization_params: Dict[str, Any], 
                              exercise_type: str = None) -> Dict[str, Any]:
         """
-        Generate content using OpenAI API
+        Generate content using OpenAI API. Errors propagate to the caller.
         """
-        try:
-            # Build personalized prompt based on learner profile
-            prompt = self._build_prompt(concept, content_type, personalization_params, exercise_type)
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # Using 3.5-turbo for cost efficiency
-                messages=[
-                    {"role": "system", "content": "You are an expert educational content creator and personalized tutor."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1500,
-                temperature=0.7
-            )
-            
-            content_text = response.choices[0].message.content.strip()
+        structured = self.structured_output and self._supports_structured_output(content_type, exercise_type)
+        
+        # Build personalized prompt based on learner profile
+        prompt = self._build_prompt(concept, content_type, personalization_params, exercise_type, structured=structured)
+        
+        request_options = {}
+        system_prompt = "You are an expert educational content creator and personalized tutor."
+        if structured:
+            request_options["response_format"] = {"type": "json_object"}
+            system_prompt += " Always respond with a single JSON object."
+        
+        response = self.llm.chat_completion(
+            content_type,
+            model="gpt-3.5-turbo",  # Using 3.5-turbo for cost efficiency
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1500,
+            temperature=0.7,
+            **request_options
+        )
+        
+        content_text = response.choices[0].message.content.strip()
+        
+        if structured:
+            parsed_content = parse_structured_content(content_text, content_type)
+            if parsed_content is not None:
+                if content_type == "lesson" and not parsed_content["next_steps"]:
+                    parsed_content["next_steps"] = "Continue practicing and apply these concepts in real projects."
+                return self._attach_option_feedback(parsed_content, concept, exercise_type, personalization_params)
+            # Fall back to the free-text parser for responses that could not be repaired
+        
+        parsed_content = self._parse_generated_text(content_text, concept, content_type, exercise_type)
+        return self._attach_option_feedback(parsed_content, concept, exercise_type, personalization_params)
+    
+    def _attach_option_feedback(self, generated_content: Dict[str, Any], concept: str, exercise_type: str,
+                                personalization_params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Precompute per-option feedback for multiple choice exercises so grading never calls the LLM
+        """
+        if exercise_type != "multiple_choice" or "question" not in generated_content:
+            return generated_content
+        generated_content["option_feedback"] = self.generate_option_feedback(
+            concept=concept,
+            question=generated_content.get("question", ""),
+            options=generated_content.get("options", []),
+            correct_answer=generated_content.get("correct_answer", ""),
+            explanation=generated_content.get("explanation", ""),
+            experience_level=personalization_params.get('experience_level', 'beginner')
+        )
+        return generated_content
+    
+    def _supports_structured_output(self, content_type: str, exercise_type: str = None) -> bool:
+        """
+        Lessons and multiple choice exercises have a JSON schema
+        """
+        return content_type == "lesson" or (content_type == "exercise" and exercise_type == "multiple_choice")
+    
+    def _stream_personalized_content(self, concept: str, content_type: str,
+                                     personalization_params: Dict[str, Any],
+                                     exercise_type: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream generation events, falling back to streamed mock content if OpenAI is unavailable or fails
+        """
+        if content_type == 'lesson':
+            reused_content = self.concepts.reusable_lesson(concept, personalization_params)
+            if reused_content is not None:
+                yield {"event": "token", "data": self._content_as_text(reused_content)}
+                yield {"event": "complete", "data": reused_content}
+                return
+        
+        if self.openai_available:
+            cache_key = self._cache_key(concept, content_type, personalization_params, exercise_type)
+            cached_content = self.cache.get(cache_key)
+            if cached_content is not None:
+                yield {"event": "token", "data": self._content_as_text(cached_content)}
+                yield {"event": "complete", "data": cached_content}
+                return
             
-            # Parse the response based on content type
-            if content_type == "lesson":
-                return self._parse_lesson_content(content_text, concept)
-            elif content_type == "exercise":
-                return self._parse_exercise_content(content_text, concept, exercise_type)
+            try:
+                chunks = []
+                for token in self._stream_with_openai(concept, content_type, personalization_params, exercise_type):
+                    chunks.append(token)
+                    yield {"event": "token", "data": token}
+                generated_content = self._parse_generated_text(''.join(chunks).strip(), concept, content_type, exercise_type)
+                generated_content = self._attach_option_feedback(generated_content, concept, exercise_type, personalization_params)
+            except Exception as e:
+                print(f"Error streaming content with OpenAI: {e}")
+                # Tokens already sent are superseded by the mock content that follows
+                yield {"event": "fallback", "data": {"reason": str(e)}}
             else:
-                return {"content": content_text}
-                
-        except Exception as e:
-            print(f"Error generating content with OpenAI: {e}")
-            # Fallback to mock content if API fails
-            return self._generate_mock_content(concept, content_type, personalization_params, exercise_type)
+                self.cache.set(cache_key, generated_content)
+                yield {"event": "complete", "data": generated_content}
+                return
+        
+        mock_content = self._generate_mock_content(concept, content_type, personalization_params, exercise_type)
+        delay = float(os.getenv('AI_MOCK_STREAM_DELAY_MS', 0)) / 1000
+        for token in re.findall(r'\S+\s*', self._content_as_text(mock_content)):
+            if delay:
+                time.sleep(delay)
+            yield {"event": "token", "data": token}
+        yield {"event": "complete", "data": mock_content}
+    
+    def _stream_with_openai(self, concept: str, content_type: str,
+                            personalization_params: Dict[str, Any],
+                            exercise_type: str = None) -> Iterator[str]:
+        """
+        Yield completion tokens from the OpenAI streaming API as they arrive
+        """
+        prompt = self._build_prompt(concept, content_type, personalization_params, exercise_type)
+        
+        response = self.llm.stream_chat_completion(
+            content_type,
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are an expert educational content creator and personalized tutor."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1500,
+            temperature=0.7
+        )
+        
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+    
+    def _parse_generated_text(self, content_text: str, concept: str, content_type: str,
+                              exercise_type: str = None) -> Dict[str, Any]:
+        """
+        Parse the response based on content type
+        """
+        if content_type == "lesson":
+            return self._parse_lesson_content(content_text, concept)
+        elif content_type == "exercise":
+            return self._parse_exercise_content(content_text, concept, exercise_type)
+        else:
+            return {"content": content_text}
+    
+    def _content_as_text(self, generated_content: Dict[str, Any]) -> str:
+        """
+        Render generated content as the plain text a streaming client displays
+        """
+        if "question" in generated_content:
+            lines = [generated_content.get("question", "")] + list(generated_content.get("options", []))
+            return '\n'.join(lines)
+        return generated_content.get("content", "")
     
     def _build_prompt(self, concept: str, content_type: str, 
                      personalization_params: Dict[str, Any], 
-                     exercise_type: str = None) -> str:
+                     exercise_type: str = None, structured: bool = False) -> str:
         """
-        Build a personalized prompt based on learner characteristics
+        Build a personalized prompt based on learner characteristics.
+        Structured prompts ask for a JSON object matching the lesson or exercise schema.
         """
         learning_style = personalization_params.get('learning_style', 'visual')
         experience_level = personalization_params.get('experience_level', 'beginner')
         niche = personalization_params.get('niche', 'tech_career')
         
         # Base prompt structure
-        if content_type == "lesson":
+        if structured and content_type == "lesson":
+            prompt = f"""Create a comprehensive lesson about "{concept}" for a {experience_level} learner in {niche.replace('_', ' ')} who learns best through {learning_style} methods.
+
+Respond with a JSON object of exactly this shape:
+{schema_prompt(LESSON_SCHEMA)}
+
+- title: a clear, engaging title
+- learning_objectives: 3-4 specific learning objectives
+- content: main lesson content (500-800 words) optimized for {learning_style} learners
+- examples: 2-3 practical examples relevant to {niche.replace('_', ' ')}
+- key_takeaways: 3-5 key points to remember
+- next_steps: what the learner should do next
+
+Make the content engaging, practical, and appropriate for {experience_level} level."""
+
+        elif structured and content_type == "exercise" and exercise_type == "multiple_choice":
+            prompt = f"""Create a multiple choice question about "{concept}" for a {experience_level} learner in {niche.replace('_', ' ')}.
+
+Respond with a JSON object of exactly this shape:
+{schema_prompt(EXERCISE_SCHEMA)}
+
+- options: exactly four answer options, in order A, B, C, D
+- correct_answer: the letter of the correct option (A, B, C, or D)
+- explanation: brief explanation of why the answer is correct
+
+Make the question challenging but appropriate for {experience_level} level, and ensure it's relevant to {niche.replace('_', ' ')}."""
+
+        elif content_type == "lesson":
             prompt = f"""Create a comprehensive lesson about "{concept}" for a {experience_level} learner in {niche.replace('_', ' ')} who learns best through {learning_style} methods.
 
 Structure the lesson as follows:
@@ -228,7 +491,7 @@ This personalized approach ensures that the content matches your learning style
             }
         
         elif content_type == "exercise" and exercise_type == "multiple_choice":
-            return {
+            mock_exercise = {
                 "question": f"Which of the following best describes {concept} in the context of {niche.replace('_', ' ')}?",
                 "options": [
                     "A) A fundamental concept that forms the foundation for advanced learning",
@@ -239,6 +502,10 @@ This personalized approach ensures that the content matches your learning style
                 "correct_answer": "A",
                 "explanation": f"{concept} is indeed a fundamental concept that forms the basis for more advanced learning in {niche.replace('_', ' ')}. Understanding it well is crucial for career progression."
             }
+            mock_exercise["option_feedback"] = self._template_option_feedback(
+                concept, mock_exercise["options"], mock_exercise["correct_answer"], mock_exercise["explanation"]
+            )
+            return mock_exercise
         
         return {"content": f"Content about {concept} for {learning_style} learners"}
     
@@ -266,7 +533,8 @@ Provide encouraging, constructive feedback that:
 
 Keep it supportive and educational."""
 
-                response = self.client.chat.completions.create(
+                response = self.llm.chat_completion(
+                    'feedback',
                     model="gpt-3.5-turbo",
                     messages=[
                         {"role": "system", "content": "You are a supportive, personalized tutor."},
@@ -283,19 +551,95 @@ Keep it supportive and educational."""
         
         # Fallback feedback
         if learner_answer == correct_answer:
-            return f"Excellent work! You correctly understood {concept}. Your {learning_style} learning approach is paying off. Keep practicing to reinforce this knowledge!"
+            return self.correct_answer_feedback(concept, learning_style)
         else:
             return f"Good attempt! While your answer shows you're thinking about {concept}, let me help clarify. The key point is... Try visualizing this concept as... Keep practicing - you're on the right track!"
+    
+    def correct_answer_feedback(self, concept: str, learning_style: str) -> str:
+        """
+        Deterministic feedback for a correct answer
+        """
+        return f"Excellent work! You correctly understood {concept}. Your {learning_style} learning approach is paying off. Keep practicing to reinforce this knowledge!"
+    
+    def generate_option_feedback(self, concept: str, question: str, options: List[str], correct_answer: str,
+                                 explanation: str = "", experience_level: str = 'beginner') -> Dict[str, Dict[str, str]]:
+        """
+        Generate feedback for every incorrect option of a multiple choice exercise, for every
+        learning style, in a single call. Returns {learning_style: {option_letter: feedback}}.
+        """
+        correct_letter = answer_letter(correct_answer, options)
+        incorrect_letters = [letter for letter in OPTION_LETTERS[:len(options)] if letter != correct_letter]
+        if not incorrect_letters:
+            return {}
+        
+        if self.openai_available:
+            try:
+                prompt = f"""A {experience_level} learner answered a multiple choice question about {concept} incorrectly.
+
+Question: {question}
+{chr(10).join(options)}
+Correct answer: {correct_letter}
+Explanation: {explanation}
+
+For each learning style ({', '.join(LEARNING_STYLES)}) and each incorrect option ({', '.join(incorrect_letters)}), write 2-3 sentences of encouraging feedback that explain why that option is wrong and guide the learner to the correct answer using techniques suited to the learning style.
+
+Respond with a JSON object shaped {{"<learning_style>": {{"<option letter>": "<feedback>"}}}}."""
+
+                response = self.llm.chat_completion(
+                    'feedback',
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {"role": "system", "content": "You are a supportive, personalized tutor. Always respond with a single JSON object."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=1200,
+                    temperature=0.7,
+                    response_format={"type": "json_object"}
+                )
+                
+                feedback = parse_option_feedback(response.choices[0].message.content, incorrect_letters, LEARNING_STYLES)
+                if feedback is not None:
+                    return feedback
+                print("Option feedback response was incomplete, using templates")
+                
+            except Exception as e:
+                print(f"Error generating option feedback with OpenAI: {e}")
+        
+        return self._template_option_feedback(concept, options, correct_letter, explanation, incorrect_letters)
+    
+    def _template_option_feedback(self, concept: str, options: List[str], correct_answer: str,
+                                  explanation: str = "", incorrect_letters: List[str] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Template feedback for incorrect options, used offline or when generation fails
+        """
+        correct_letter = answer_letter(correct_answer, options)
+        if incorrect_letters is None:
+            incorrect_letters = [letter for letter in OPTION_LETTERS[:len(options)] if letter != correct_letter]
+        
+        style_tips = {
+            'visual': f"Try sketching a quick diagram of how {concept} fits together.",
+            'auditory': f"Try explaining {concept} out loud in your own words.",
+            'kinesthetic': f"Try working through a small hands-on example of {concept}.",
+            'reading_writing': f"Try writing a short summary of {concept} in your notes."
+        }
+        
+        return {
+            style: {
+                letter: f"Good attempt! You chose {letter}, but the correct answer is {correct_letter}. {explanation} {tip}".replace('  ', ' ').strip()
+                for letter in incorrect_letters
+            }
+            for style, tip in style_tips.items()
+        }
 
     def analyze_knowledge_gaps(self, learner_responses: List[Dict[str, Any]], 
                               learner_profile: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Advanced knowledge gap analysis with scoring and prioritization
         """
-        from collections import defaultdict
+        from collections import defaultdict, Counter
         import math
         
-        gaps = defaultdict(lambda: {'incorrect_count': 0, 'total_count': 0, 'difficulty_levels': []})
+        gaps = defaultdict(lambda: {'incorrect_count': 0, 'total_count': 0, 'difficulty_levels': Counter()})
         
         # Analyze response patterns
         for response in learner_responses:
@@ -304,7 +648,7 @@ Keep it supportive and educational."""
             difficulty = response.get('difficulty_level', 'beginner')
             
             gaps[concept]['total_count'] += 1
-            gaps[concept]['difficulty_levels'].append(difficulty)
+            gaps[concept]['difficulty_levels'][difficulty] += 1
             
             if not is_correct:
                 gaps[concept]['incorrect_count'] += 1
@@ -314,13 +658,14 @@ Keep it supportive and educational."""
         for concept, data in gaps.items():
             if data['total_count'] > 0:
                 error_rate = data['incorrect_count'] / data['total_count']
+                modal_difficulty = data['difficulty_levels'].most_common(1)[0][0]
                 
                 # Weight by difficulty level
                 difficulty_weight = {
                     'beginner': 1.0,
                     'intermediate': 1.5,
                     'advanced': 2.0
-                }.get(max(set(data['difficulty_levels']), key=data['difficulty_levels'].count), 1.0)
+                }.get(modal_difficulty, 1.0)
                 
                 # Calculate priority score
                 priority_score = error_rate * difficulty_weight * math.log(data['total_count'] + 1)
@@ -330,7 +675,7 @@ Keep it supportive and educational."""
                     'error_rate': round(error_rate, 2),
                     'priority_score': round(priority_score, 2),
                     'attempts': data['total_count'],
-                    'difficulty_level': max(set(data['difficulty_levels']), key=data['difficulty_levels'].count),
+                    'difficulty_level': modal_difficulty,
                     'severity': 'high' if error_rate > 0.7 else 'medium' if error_rate > 0.4 else 'low'
                 })
         
@@ -357,6 +702,13 @@ Keep it supportive and educational."""
         
         return prioritized_gaps[:5]  # Return top 5 gaps
     
+    def analyze_cohort_knowledge_gaps(self, cohort_responses, top_n: int = 5) -> Dict[str, Any]:
+        """
+        Knowledge gap analysis for a whole cohort, vectorized with NumPy.
+        Scores match analyze_knowledge_gaps; niche-predicted gaps are not added.
+        """
+        return analyze_cohort_gaps(cohort_responses, top_n=top_n)
+    
     def recommend_learning_path(self, learner_profile: Dict[str, Any], 
                               knowledge_gaps: List[Dict[str, Any]], 
                               current_performance: Dict[str, Any] = None) -> List[Dict[str, Any]]:
@@ -434,8 +786,16 @@ Keep it supportive and educational."""
         # Sort by priority and estimated impact
         priority_order = {'high': 3, 'medium': 2, 'low': 1}
         recommendations.sort(key=lambda x: priority_order.get(x['priority'], 0), reverse=True)
+        recommendations = recommendations[:5]  # Keep top 5 recommendations
         
-        return recommendations[:5]  # Return top 5 recommendations
+        # Attach unmet transitive prerequisites and put prerequisites before the concepts that need them
+        graph = knowledge_graphs.for_niche(niche)
+        knowledge_state = learner_profile.get('knowledge_state') or {}
+        mastered = [concept for concept, mastery in knowledge_state.items() if mastery >= 0.7]
+        for recommendation in recommendations:
+            recommendation['unmet_prerequisites'] = graph.unmet_prerequisites([recommendation['concept']], mastered)
+        
+        return graph.order_items(recommendations, lambda recommendation: [recommendation['concept']])
     
     def adjust_difficulty(self, current_difficulty: str, performance_score: float) -> str:
         """
@@ -535,24 +895,9 @@ Keep it supportive and educational."""
     
     def _get_prerequisites(self, concept: str, niche: str) -> List[str]:
         """
-        Get prerequisites for a concept
+        Get direct prerequisites for a concept from the niche's knowledge graph
         """
-        prerequisites_map = {
-            'tech_career': {
-                'Algorithm Optimization': ['Python Basics', 'Data Structures'],
-                'System Design Principles': ['Programming Fundamentals', 'Database Basics'],
-                'Testing Strategies': ['Code Writing', 'Debugging'],
-                'Performance Tuning': ['Algorithm Optimization', 'System Design Principles']
-            },
-            'creator_business': {
-                'Email Marketing': ['Content Planning', 'Audience Research'],
-                'SEO Optimization': ['Content Creation', 'Basic Analytics'],
-                'Monetization Strategies': ['Audience Building', 'Brand Development'],
-                'Advanced Analytics': ['Basic Analytics', 'Data Interpretation']
-            }
-        }
-        
-        return prerequisites_map.get(niche, {}).get(concept, [])
+        return knowledge_graphs.for_niche(niche).prerequisites_of(concept, transitive=False)
     
     def _generate_learning_objectives(self, concept: str, experience_level: str) -> List[str]:
         """
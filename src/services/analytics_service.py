@@ -1,12 +1,76 @@
-import json
 import math
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Tuple
+from datetime import datetime, timedelta, time
+from typing import Dict, List, Any, Tuple, Callable, Optional
 from collections import defaultdict
-from src.models.learner import Learner, LearningSession
+from flask import has_request_context, request
+from src.models.learner import (
+    Learner, LearningSession, LearnerAnalyticsSnapshot, LearnerDailyActivity, LearnerConceptMastery, db
+)
 from src.models.content import Content, Exercise
 from sqlalchemy import func, and_
 
+# WSGI environ key holding the current request's contexts (g is shared by batch sub-requests)
+_CONTEXTS_ENVIRON_KEY = 'learning_analytics.contexts'
+
+
+class AnalyticsContext:
+    """
+    One learner's analytics inputs and results for the duration of a request. The learner and
+    their session aggregates are loaded once, and each derived metric is computed at most once
+    however many reports include it. generated_at is fixed when the context is created.
+    """
+    
+    def __init__(self, learner_id: int):
+        self.learner_id = learner_id
+        self.generated_at = datetime.utcnow()
+        self._memo: Dict[Any, Any] = {}
+    
+    def memoize(self, key: Any, compute: Callable[[], Any]) -> Any:
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+    
+    @property
+    def learner(self) -> Optional[Learner]:
+        return self.memoize('learner', lambda: db.session.get(Learner, self.learner_id))
+    
+    @property
+    def snapshot(self) -> Optional[LearnerAnalyticsSnapshot]:
+        """Running session aggregates (None until the learner has a session)"""
+        return self.memoize('snapshot', lambda: db.session.get(LearnerAnalyticsSnapshot, self.learner_id))
+    
+    def activity_since(self, first_day) -> Dict[str, Any]:
+        """Session totals for the days from first_day on"""
+        return self.memoize(('activity', first_day), lambda: LearnerDailyActivity.totals_since(self.learner_id, first_day))
+    
+    def edge_completion_averages(self, since: datetime, count: int = 2) -> Tuple[float, float]:
+        """Mean completion_rate of the first and of the last `count` sessions started since `since`"""
+        def average(*order):
+            window = db.session.query(
+                db.func.coalesce(LearningSession.completion_rate, 0).label('rate')
+            ).filter(
+                LearningSession.learner_id == self.learner_id, LearningSession.session_start >= since
+            ).order_by(*order).limit(count).subquery()
+            return db.select(db.func.avg(window.c.rate)).scalar_subquery()
+        
+        # Both window splits in one statement, each an index range scan of `count` rows
+        first, last = db.session.query(
+            average(LearningSession.session_start, LearningSession.id),
+            average(LearningSession.session_start.desc(), LearningSession.id.desc())
+        ).one()
+        return float(first or 0.0), float(last or 0.0)
+    
+    @property
+    def mastery_summary(self) -> Dict[str, Any]:
+        """Concept count, mean mastery and band counts, aggregated in the database"""
+        return self.memoize('mastery_summary', lambda: LearnerConceptMastery.mastery_summary(self.learner_id))
+    
+    @property
+    def profile(self) -> Dict[str, Any]:
+        """learner.to_dict(), for the AI generator calls that take a learner profile"""
+        return self.memoize('profile', lambda: self.learner.to_dict() if self.learner else {})
+
+
 class LearningAnalyticsService:
     """
     Advanced learning analytics service for tracking progress, 
@@ -16,22 +80,29 @@ class LearningAnalyticsService:
     def __init__(self):
         pass
     
-    def calculate_learning_velocity(self, learner_id: int, days: int = 30) -> Dict[str, Any]:
+    def context(self, learner_id: int) -> AnalyticsContext:
+        """The current request's analytics context for a learner (a new one outside a request)"""
+        if not has_request_context():
+            return AnalyticsContext(learner_id)
+        contexts = request.environ.setdefault(_CONTEXTS_ENVIRON_KEY, {})
+        if learner_id not in contexts:
+            contexts[learner_id] = AnalyticsContext(learner_id)
+        return contexts[learner_id]
+    
+    def calculate_learning_velocity(self, learner_id: int, days: int = 30,
+                                    context: AnalyticsContext = None) -> Dict[str, Any]:
         """
         Calculate how quickly a learner is progressing through content
         """
-        from src.models.learner import db
-        
-        # Get recent learning sessions
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        sessions = LearningSession.query.filter(
-            and_(
-                LearningSession.learner_id == learner_id,
-                LearningSession.session_start >= cutoff_date
-            )
-        ).all()
-        
-        if not sessions:
+        context = context or self.context(learner_id)
+        return context.memoize(('velocity', days), lambda: self._learning_velocity(context, days))
+    
+    def _learning_velocity(self, context: AnalyticsContext, days: int) -> Dict[str, Any]:
+        # Totals for the last `days` UTC days, today included
+        first_day = (context.generated_at - timedelta(days=days - 1)).date()
+        totals = context.activity_since(first_day)
+        
+        if not totals['session_count']:
             return {
                 'velocity_score': 0.0,
                 'sessions_per_week': 0.0,
@@ -41,15 +112,15 @@ class LearningAnalyticsService:
             }
         
         # Calculate metrics
-        total_sessions = len(sessions)
-        total_duration = sum(s.duration_minutes or 0 for s in sessions)
-        total_content_accessed = sum(len(json.loads(s.content_accessed or '[]')) for s in sessions)
-        total_exercises_completed = sum(len(json.loads(s.exercises_completed or '[]')) for s in sessions)
+        total_sessions = totals['session_count']
+        total_duration = totals['duration_total']
+        total_content_accessed = totals['content_accessed_total']
+        total_exercises_completed = totals['exercises_completed_total']
         
         # Calculate velocity metrics
         sessions_per_week = (total_sessions / days) * 7
         avg_session_duration = total_duration / total_sessions if total_sessions > 0 else 0
-        avg_completion_rate = sum(s.completion_rate or 0 for s in sessions) / total_sessions if total_sessions > 0 else 0
+        avg_completion_rate = totals['completion_total'] / total_sessions if total_sessions > 0 else 0
         
         # Calculate velocity score (composite metric)
         velocity_score = (
@@ -59,12 +130,9 @@ class LearningAnalyticsService:
             (total_exercises_completed / max(total_sessions, 1) * 0.2)
         )
         
-        # Determine trend
-        if len(sessions) >= 4:
-            recent_sessions = sessions[-2:]
-            older_sessions = sessions[:2]
-            recent_avg = sum(s.completion_rate or 0 for s in recent_sessions) / len(recent_sessions)
-            older_avg = sum(s.completion_rate or 0 for s in older_sessions) / len(older_sessions)
+        # Determine trend from the first and last two sessions in the window
+        if total_sessions >= 4:
+            older_avg, recent_avg = context.edge_completion_averages(datetime.combine(first_day, time.min))
             
             if recent_avg > older_avg * 1.1:
                 trend = 'improving'
@@ -85,19 +153,21 @@ class LearningAnalyticsService:
             'trend': trend
         }
     
-    def analyze_learning_patterns(self, learner_id: int) -> Dict[str, Any]:
+    def analyze_learning_patterns(self, learner_id: int, context: AnalyticsContext = None) -> Dict[str, Any]:
         """
         Analyze learner's behavioral patterns and preferences
         """
-        from src.models.learner import db
-        
-        learner = Learner.query.get(learner_id)
+        context = context or self.context(learner_id)
+        return context.memoize('patterns', lambda: self._learning_patterns(context))
+    
+    def _learning_patterns(self, context: AnalyticsContext) -> Dict[str, Any]:
+        learner = context.learner
         if not learner:
             return {'error': 'Learner not found'}
         
-        sessions = LearningSession.query.filter_by(learner_id=learner_id).all()
+        snapshot = context.snapshot
         
-        if not sessions:
+        if not snapshot or not snapshot.session_count:
             return {
                 'preferred_session_length': 'unknown',
                 'peak_performance_time': 'unknown',
@@ -107,9 +177,8 @@ class LearningAnalyticsService:
             }
         
         # Analyze session lengths
-        session_durations = [s.duration_minutes for s in sessions if s.duration_minutes]
-        if session_durations:
-            avg_duration = sum(session_durations) / len(session_durations)
+        if snapshot.timed_session_count:
+            avg_duration = snapshot.duration_total / snapshot.timed_session_count
             if avg_duration < 20:
                 preferred_length = 'short'
             elif avg_duration < 45:
@@ -124,72 +193,54 @@ class LearningAnalyticsService:
         peak_time = 'morning'  # Placeholder
         
         # Calculate learning consistency
-        if len(sessions) >= 7:
-            # Calculate variance in session frequency
-            session_dates = [s.session_start.date() for s in sessions if s.session_start]
-            date_counts = defaultdict(int)
-            for date in session_dates:
-                date_counts[date] += 1
-            
-            if len(date_counts) > 1:
-                frequencies = list(date_counts.values())
-                mean_freq = sum(frequencies) / len(frequencies)
-                variance = sum((f - mean_freq) ** 2 for f in frequencies) / len(frequencies)
+        if snapshot.session_count >= 7:
+            # Calculate variance in session frequency (sessions per active day)
+            if snapshot.active_days > 1:
+                mean_freq = snapshot.dated_session_count / snapshot.active_days
+                variance = snapshot.daily_count_variance()
                 consistency = max(0, 1 - (variance / (mean_freq + 1)))
             else:
-                consistency = 1.0 if len(sessions) > 0 else 0.0
+                consistency = 1.0
         else:
             consistency = 0.5  # Insufficient data
         
-        # Analyze content preferences
-        content_types = defaultdict(int)
-        for session in sessions:
-            content_accessed = json.loads(session.content_accessed or '[]')
-            for content in content_accessed:
-                content_type = content.get('type', 'unknown')
-                content_types[content_type] += 1
-        
         return {
             'preferred_session_length': preferred_length,
             'peak_performance_time': peak_time,
             'learning_consistency': round(consistency, 2),
-            'content_preferences': dict(content_types),
+            'content_preferences': dict(snapshot.content_type_counts or {}),
             'difficulty_progression': 'steady',  # Placeholder
-            'total_sessions': len(sessions)
+            'total_sessions': snapshot.session_count
         }
     
-    def generate_progress_report(self, learner_id: int) -> Dict[str, Any]:
+    def generate_progress_report(self, learner_id: int, context: AnalyticsContext = None) -> Dict[str, Any]:
         """
         Generate comprehensive progress report for a learner
         """
-        learner = Learner.query.get(learner_id)
+        context = context or self.context(learner_id)
+        return context.memoize('progress_report', lambda: self._progress_report(context))
+    
+    def _progress_report(self, context: AnalyticsContext) -> Dict[str, Any]:
+        learner_id = context.learner_id
+        learner = context.learner
         if not learner:
             return {'error': 'Learner not found'}
         
         # Get learning velocity
-        velocity = self.calculate_learning_velocity(learner_id)
+        velocity = self.calculate_learning_velocity(learner_id, context=context)
         
         # Get learning patterns
-        patterns = self.analyze_learning_patterns(learner_id)
-        
-        # Get knowledge state
-        knowledge_state = json.loads(learner.knowledge_state or '{}')
-        
-        # Calculate overall progress
-        if knowledge_state:
-            mastery_scores = list(knowledge_state.values())
-            overall_mastery = sum(mastery_scores) / len(mastery_scores)
-            concepts_mastered = sum(1 for score in mastery_scores if score >= 0.8)
-            concepts_in_progress = sum(1 for score in mastery_scores if 0.3 <= score < 0.8)
-            concepts_struggling = sum(1 for score in mastery_scores if score < 0.3)
-        else:
-            overall_mastery = 0.0
-            concepts_mastered = 0
-            concepts_in_progress = 0
-            concepts_struggling = 0
+        patterns = self.analyze_learning_patterns(learner_id, context=context)
+        
+        # Calculate overall progress (aggregated over the learner's mastery rows)
+        mastery = context.mastery_summary
+        overall_mastery = mastery['mean']
+        concepts_mastered = mastery['mastered']
+        concepts_in_progress = mastery['in_progress']
+        concepts_struggling = mastery['struggling']
         
         # Generate learning goals progress
-        learning_goals = json.loads(learner.learning_goals or '[]')
+        learning_goals = learner.learning_goals or []
         goals_progress = []
         for goal in learning_goals:
             # Mock progress calculation - in real system, would track specific goal metrics
@@ -207,13 +258,13 @@ class LearningAnalyticsService:
                 'concepts_mastered': concepts_mastered,
                 'concepts_in_progress': concepts_in_progress,
                 'concepts_struggling': concepts_struggling,
-                'total_concepts': len(knowledge_state)
+                'total_concepts': mastery['total']
             },
             'learning_velocity': velocity,
             'learning_patterns': patterns,
             'goals_progress': goals_progress,
             'recommendations': self._generate_recommendations(learner, velocity, patterns, overall_mastery),
-            'generated_at': datetime.utcnow().isoformat()
+            'generated_at': context.generated_at.isoformat()
         }
     
     def _generate_recommendations(self, learner: Learner, velocity: Dict, patterns: Dict, mastery: float) -> List[Dict[str, Any]]:
@@ -281,17 +332,19 @@ class LearningAnalyticsService:
         
         return recommendations[:5]  # Return top 5 recommendations
     
-    def calculate_knowledge_retention(self, learner_id: int, concept: str) -> Dict[str, Any]:
+    def calculate_knowledge_retention(self, learner_id: int, concept: str,
+                                      context: AnalyticsContext = None) -> Dict[str, Any]:
         """
         Calculate knowledge retention for a specific concept over time
         """
         # Mock implementation - in a real system, this would track performance over time
-        learner = Learner.query.get(learner_id)
-        if not learner:
+        context = context or self.context(learner_id)
+        if not context.learner:
             return {'error': 'Learner not found'}
         
-        knowledge_state = json.loads(learner.knowledge_state or '{}')
-        current_mastery = knowledge_state.get(concept, 0.0)
+        current_mastery = context.memoize(
+            ('mastery', concept), lambda: LearnerConceptMastery.mastery_of(learner_id, concept)
+        ) or 0.0
         
         # Simulate retention curve (Ebbinghaus forgetting curve)
         days_since_last_review = 7  # Mock value
@@ -304,20 +357,22 @@ class LearningAnalyticsService:
             'estimated_retention': round(estimated_retention, 2),
             'days_since_review': days_since_last_review,
             'needs_review': estimated_retention < 0.6,
-            'recommended_review_date': (datetime.utcnow() + timedelta(days=max(1, int(30 * math.log(0.6 / current_mastery))))).isoformat() if current_mastery > 0 else None
+            'recommended_review_date': (context.generated_at + timedelta(days=max(1, int(30 * math.log(0.6 / current_mastery))))).isoformat() if current_mastery > 0 else None
         }
     
-    def predict_learning_outcome(self, learner_id: int, target_concept: str) -> Dict[str, Any]:
+    def predict_learning_outcome(self, learner_id: int, target_concept: str,
+                                 context: AnalyticsContext = None) -> Dict[str, Any]:
         """
         Predict learning outcomes for a target concept based on current progress
         """
-        learner = Learner.query.get(learner_id)
+        context = context or self.context(learner_id)
+        learner = context.learner
         if not learner:
             return {'error': 'Learner not found'}
         
         # Get current analytics
-        velocity = self.calculate_learning_velocity(learner_id)
-        patterns = self.analyze_learning_patterns(learner_id)
+        velocity = self.calculate_learning_velocity(learner_id, context=context)
+        patterns = self.analyze_learning_patterns(learner_id, context=context)
         
         # Mock prediction algorithm
         base_time = 120  # Base minutes to learn a concept
@@ -350,7 +405,7 @@ class LearningAnalyticsService:
             'estimated_learning_time_minutes': round(estimated_time),
             'estimated_sessions_needed': math.ceil(estimated_time / (patterns.get('preferred_session_length', 30))),
             'success_probability': round(success_probability, 2),
-            'confidence_level': 'high' if len(LearningSession.query.filter_by(learner_id=learner_id).all()) >= 10 else 'medium',
+            'confidence_level': 'high' if context.snapshot and context.snapshot.session_count >= 10 else 'medium',
             'key_factors': {
                 'experience_level': learner.experience_level,
                 'learning_velocity': velocity['velocity_score'],
@@ -0,0 +1,149 @@
+import numpy as np
+from typing import Dict, Any, List, Union
+
+DIFFICULTY_WEIGHTS = {
+    'beginner': 1.0,
+    'intermediate': 1.5,
+    'advanced': 2.0
+}
+
+
+def _severity(error_rates: np.ndarray) -> np.ndarray:
+    return np.select([error_rates > 0.7, error_rates > 0.4], ['high', 'medium'], default='low')
+
+
+def _modal_codes(group_codes: np.ndarray, value_codes: np.ndarray, group_count: int, value_count: int) -> np.ndarray:
+    """Most frequent value per group; ties go to the value seen first within the group"""
+    keys = group_codes * value_count + value_codes
+    counts = np.bincount(keys, minlength=group_count * value_count)
+    present, first_seen = np.unique(keys, return_index=True)
+    first_position = np.full(group_count * value_count, len(keys), dtype=np.int64)
+    first_position[present] = first_seen
+    score = counts * (len(keys) + 1) + (len(keys) - first_position)
+    return score.reshape(group_count, value_count).argmax(axis=1)
+
+
+def analyze_cohort_gaps(cohort_responses: Union[Dict[Any, List[Dict[str, Any]]], List[Dict[str, Any]]],
+                        top_n: int = 5) -> Dict[str, Any]:
+    """
+    Knowledge gap analysis for many learners at once.
+
+    Accepts {learner_id: [response, ...]} or a flat list of responses carrying learner_id.
+    Responses are encoded once into integer-indexed arrays; error rates, modal difficulty and
+    priority scores (error_rate * difficulty_weight * log(attempts + 1), as in the single-learner
+    analysis) are then computed per (learner, concept) pair with NumPy. Returns the top_n gaps
+    per learner and a cohort-level concept ranking.
+    """
+    if isinstance(cohort_responses, dict):
+        grouped = cohort_responses.items()
+    else:
+        grouped = {}
+        for response in cohort_responses:
+            grouped.setdefault(response.get('learner_id'), []).append(response)
+        grouped = grouped.items()
+
+    learners = []
+    response_counts = []
+    all_responses = []
+    for learner_id, responses in grouped:
+        learners.append(learner_id)
+        response_counts.append(len(responses))
+        all_responses.extend(responses)
+
+    concept_index = {}
+    difficulty_index = {}
+    concept_codes = [
+        concept_index.setdefault(response.get('concept', 'Unknown'), len(concept_index))
+        for response in all_responses
+    ]
+    difficulty_codes = [
+        difficulty_index.setdefault(response.get('difficulty_level', 'beginner'), len(difficulty_index))
+        for response in all_responses
+    ]
+    incorrect = [not response.get('is_correct', False) for response in all_responses]
+
+    if not all_responses:
+        return {
+            'learner_count': len(learners),
+            'concept_count': 0,
+            'response_count': 0,
+            'learner_gaps': {str(learner_id): [] for learner_id in learners},
+            'cohort_gaps': []
+        }
+
+    concepts = np.array(list(concept_index), dtype=object)
+    difficulties = np.array(list(difficulty_index), dtype=object)
+    difficulty_weights = np.array([DIFFICULTY_WEIGHTS.get(level, 1.0) for level in difficulty_index])
+    concept_count = len(concept_index)
+    difficulty_count = len(difficulty_index)
+
+    learner_codes = np.repeat(np.arange(len(learners), dtype=np.int64), response_counts)
+    concept_codes = np.asarray(concept_codes, dtype=np.int64)
+    difficulty_codes = np.asarray(difficulty_codes, dtype=np.int64)
+    incorrect = np.asarray(incorrect, dtype=np.float64)
+
+    # Per (learner, concept) pair aggregates; only pairs that actually occur are materialized
+    pair_codes, pair_of_response = np.unique(learner_codes * concept_count + concept_codes, return_inverse=True)
+    pair_count = len(pair_codes)
+    attempts = np.bincount(pair_of_response, minlength=pair_count)
+    errors = np.bincount(pair_of_response, weights=incorrect, minlength=pair_count)
+    modal_difficulty = _modal_codes(pair_of_response, difficulty_codes, pair_count, difficulty_count)
+
+    error_rates = errors / attempts
+    priorities = error_rates * difficulty_weights[modal_difficulty] * np.log(attempts + 1)
+    pair_learners = pair_codes // concept_count
+    pair_concepts = pair_codes % concept_count
+
+    # Top-n per learner: order by learner, then priority descending, and keep the first n of each run
+    order = np.lexsort((-priorities, pair_learners))
+    sorted_learners = pair_learners[order]
+    rank_in_learner = np.arange(pair_count) - np.searchsorted(sorted_learners, sorted_learners, side='left')
+    selected = order[rank_in_learner < top_n]
+
+    rounded_error_rates = np.round(error_rates, 2)
+    rounded_priorities = np.round(priorities, 2)
+    severities = _severity(error_rates)
+
+    learner_gaps = {str(learner_id): [] for learner_id in learners}
+    for pair in selected.tolist():
+        learner_gaps[str(learners[pair_learners[pair]])].append({
+            'concept': concepts[pair_concepts[pair]],
+            'error_rate': float(rounded_error_rates[pair]),
+            'priority_score': float(rounded_priorities[pair]),
+            'attempts': int(attempts[pair]),
+            'difficulty_level': difficulties[modal_difficulty[pair]],
+            'severity': str(severities[pair])
+        })
+
+    # Cohort-level ranking over pooled responses per concept
+    concept_attempts = np.bincount(concept_codes, minlength=concept_count)
+    concept_errors = np.bincount(concept_codes, weights=incorrect, minlength=concept_count)
+    concept_difficulty = _modal_codes(concept_codes, difficulty_codes, concept_count, difficulty_count)
+    concept_error_rates = concept_errors / concept_attempts
+    concept_priorities = concept_error_rates * difficulty_weights[concept_difficulty] * np.log(concept_attempts + 1)
+    learners_attempted = np.bincount(pair_concepts, minlength=concept_count)
+    learners_struggling = np.bincount(pair_concepts[error_rates > 0.4], minlength=concept_count)
+    mean_learner_priority = np.bincount(pair_concepts, weights=priorities, minlength=concept_count) / learners_attempted
+
+    concept_severities = _severity(concept_error_rates)
+    cohort_gaps = []
+    for code in np.argsort(-concept_priorities, kind='stable').tolist():
+        cohort_gaps.append({
+            'concept': concepts[code],
+            'error_rate': round(float(concept_error_rates[code]), 2),
+            'priority_score': round(float(concept_priorities[code]), 2),
+            'attempts': int(concept_attempts[code]),
+            'difficulty_level': difficulties[concept_difficulty[code]],
+            'severity': str(concept_severities[code]),
+            'learners_attempted': int(learners_attempted[code]),
+            'learners_struggling': int(learners_struggling[code]),
+            'mean_learner_priority': round(float(mean_learner_priority[code]), 2)
+        })
+
+    return {
+        'learner_count': len(learners),
+        'concept_count': concept_count,
+        'response_count': int(len(learner_codes)),
+        'learner_gaps': learner_gaps,
+        'cohort_gaps': cohort_gaps
+    }
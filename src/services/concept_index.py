@@ -0,0 +1,304 @@
+import os
+import re
+import json
+import zlib
+import threading
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+from flask import has_app_context
+from src.models.user import db
+from src.models.content import Content
+from src.services import content_events
+
+STOPWORDS = {
+    'a', 'an', 'the', 'in', 'of', 'to', 'for', 'and', 'with', 'on', 'using', 'into', 'about',
+    'intro', 'introduction', 'understanding'
+}
+
+# Token-level aliases applied before stemming
+TOKEN_ALIASES = {
+    'js': 'javascript',
+    'ts': 'typescript',
+    'py': 'python',
+    'ml': 'machine learning',
+    'ai': 'artificial intelligence',
+    'oop': 'object oriented programming',
+    'db': 'database',
+    'k8s': 'kubernetes',
+    'seo': 'search engine optimization',
+    'apis': 'api',
+    'func': 'function',
+    'funcs': 'function',
+    'algo': 'algorithm',
+    'algos': 'algorithm'
+}
+
+# Words whose trailing "s" is not a plural; folding would merge them with a different concept
+UNSTEMMED_TOKENS = {'news', 'pandas', 'windows', 'rails', 'canvas', 'atlas'}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9+#]+")
+_VOWEL_PATTERN = re.compile(r"[aeiouy]")
+
+
+def _stem(token: str) -> str:
+    """Cheap plural folding: functions -> function, libraries -> library; https and dns stay as they are"""
+    if token in UNSTEMMED_TOKENS:
+        return token
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    # Acronyms such as https, dns or tls have no vowel to fold a plural onto
+    if len(token) > 3 and token.endswith('s') and not token.endswith(('ss', 'us', 'is')) and _VOWEL_PATTERN.search(token[:-1]):
+        return token[:-1]
+    return token
+
+
+def _feature_hash(feature: str) -> int:
+    return zlib.crc32(feature.encode('utf-8'))
+
+
+class ConceptCanonicalizer:
+    """
+    Maps free-text concept names to a canonical key and a local embedding.
+
+    The key lower-cases, strips punctuation and stopwords, expands aliases,
+    folds plurals and sorts the tokens, so "Python Functions", "python
+    functions" and "Functions in Python" share one key. The embedding is a
+    signed hashing vectorizer over words and character trigrams, which needs
+    no model download and keeps working offline.
+    """
+
+    def __init__(self, dims: int = 512, aliases: Dict[str, str] = None):
+        self.dims = dims
+        self.token_aliases = dict(TOKEN_ALIASES)
+        self.phrase_aliases = {}
+        for alias, canonical in (aliases or self._load_aliases()).items():
+            self.add_alias(alias, canonical)
+
+    @staticmethod
+    def _load_aliases() -> Dict[str, str]:
+        path = os.getenv('CONCEPT_ALIASES_PATH')
+        if not path:
+            return {}
+        try:
+            with open(path) as alias_file:
+                return json.load(alias_file)
+        except (OSError, ValueError) as e:
+            print(f"Could not load concept aliases from {path}: {e}")
+            return {}
+
+    def add_alias(self, alias: str, canonical: str) -> None:
+        """Treat the phrase `alias` as the concept `canonical`"""
+        self.phrase_aliases[self._token_key(alias)] = self._token_key(canonical)
+
+    def tokens(self, concept: str) -> List[str]:
+        tokens = []
+        for token in _TOKEN_PATTERN.findall(str(concept).lower()):
+            for expanded in self.token_aliases.get(token, token).split():
+                if expanded not in STOPWORDS:
+                    tokens.append(_stem(expanded))
+        return sorted(set(tokens))
+
+    def _token_key(self, concept: str) -> str:
+        return ' '.join(self.tokens(concept))
+
+    def key(self, concept: str) -> str:
+        """Canonical key for a concept name"""
+        key = self._token_key(concept)
+        return self.phrase_aliases.get(key, key)
+
+    def embed(self, concept: str) -> np.ndarray:
+        """Unit-length hashed bag of words and character trigrams"""
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for token in self.key(concept).split():
+            features = [('w:' + token, 1.0)]
+            padded = f'<{token}>'
+            features.extend(('c:' + padded[i:i + 3], 0.5) for i in range(len(padded) - 2))
+            for feature, weight in features:
+                hashed = _feature_hash(feature)
+                vector[hashed % self.dims] += weight if hashed & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class ConceptIndex:
+    """
+    Approximate nearest-neighbour index over the concepts of existing content.
+
+    Entries are keyed by profile (content type, learning style, experience
+    level, niche) so only content generated for the same kind of learner is
+    reused. Exact canonical-key matches are a dict lookup; otherwise random
+    hyperplane LSH (bands x rows sign bits) narrows the candidates and exact
+    cosine similarity decides against the threshold. Loaded lazily from
+    Content; this process's commits arrive through content_events and other
+    processes' through a ContentChangeFeed polled before each lookup.
+    """
+
+    INDEXED_CONTENT_TYPES = ('lesson',)
+
+    def __init__(self, canonicalizer: ConceptCanonicalizer = None, threshold: float = None,
+                 bands: int = 20, rows: int = 12, seed: int = 7):
+        self.canonicalizer = canonicalizer or ConceptCanonicalizer()
+        self.threshold = threshold if threshold is not None else float(os.getenv('CONCEPT_REUSE_THRESHOLD', 0.9))
+        self.enabled = os.getenv('CONCEPT_REUSE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+        self.bands = bands
+        self.rows = rows
+        self._planes = np.random.default_rng(seed).standard_normal(
+            (bands * rows, self.canonicalizer.dims)
+        ).astype(np.float32)
+        self._weights = 1 << np.arange(rows, dtype=np.int64)
+
+        self._lock = threading.RLock()
+        self._entries = {}  # entry_id -> (content_id, profile, key, vector)
+        self._entries_by_content = {}  # content_id -> [entry_id]
+        self._by_key = {}  # (profile, key) -> {content_id}
+        self._buckets = {}  # (band, code) -> {entry_id}
+        self._next_entry_id = 0
+        self._feed = content_events.ContentChangeFeed()
+        self._stats = {'lookups': 0, 'exact_hits': 0, 'approximate_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def profile_key(content_type: str, personalization_params: Dict[str, Any]) -> Optional[Tuple]:
+        """Profile an item was generated for, or None if it was not personalized"""
+        params = personalization_params or {}
+        if not params.get('learning_style') or not params.get('experience_level'):
+            return None
+        return (content_type, params.get('learning_style'), params.get('experience_level'), params.get('niche'))
+
+    def _band_codes(self, vector: np.ndarray) -> List[int]:
+        bits = (self._planes @ vector > 0).reshape(self.bands, self.rows)
+        return (bits @ self._weights).tolist()
+
+    def add(self, content_id: int, concepts: List[str], profile: Tuple) -> None:
+        """Index a content row's concepts under a profile, replacing any previous entries"""
+        with self._lock:
+            self.remove(content_id)
+            entry_ids = []
+            for concept in concepts:
+                if not isinstance(concept, str) or not concept.strip():
+                    continue
+                key = self.canonicalizer.key(concept)
+                vector = self.canonicalizer.embed(concept)
+                entry_id = self._next_entry_id
+                self._next_entry_id += 1
+                self._entries[entry_id] = (content_id, profile, key, vector)
+                self._by_key.setdefault((profile, key), set()).add(content_id)
+                for band, code in enumerate(self._band_codes(vector)):
+                    self._buckets.setdefault((band, code), set()).add(entry_id)
+                entry_ids.append(entry_id)
+            if entry_ids:
+                self._entries_by_content[content_id] = entry_ids
+
+    def remove(self, content_id: int) -> None:
+        """Drop a content row from the index"""
+        with self._lock:
+            for entry_id in self._entries_by_content.pop(content_id, []):
+                _, profile, key, vector = self._entries.pop(entry_id)
+                owners = self._by_key.get((profile, key))
+                if owners is not None:
+                    owners.discard(content_id)
+                    if not owners:
+                        del self._by_key[(profile, key)]
+                for band, code in enumerate(self._band_codes(vector)):
+                    bucket = self._buckets.get((band, code))
+                    if bucket is not None:
+                        bucket.discard(entry_id)
+                        if not bucket:
+                            del self._buckets[(band, code)]
+
+    def nearest(self, concept: str, profile: Tuple) -> Optional[Dict[str, Any]]:
+        """Most similar indexed content for the profile at or above the threshold, or None"""
+        with self._lock:
+            self._stats['lookups'] += 1
+            key = self.canonicalizer.key(concept)
+            exact = self._by_key.get((profile, key))
+            if exact:
+                self._stats['exact_hits'] += 1
+                return {'content_id': max(exact), 'similarity': 1.0, 'canonical_key': key}
+
+            vector = self.canonicalizer.embed(concept)
+            candidates = set()
+            for band, code in enumerate(self._band_codes(vector)):
+                candidates.update(self._buckets.get((band, code), ()))
+
+            candidates = [self._entries[entry_id] for entry_id in candidates if self._entries[entry_id][1] == profile]
+            best = None
+            if candidates:
+                similarities = np.stack([entry[3] for entry in candidates]) @ vector
+                top = int(similarities.argmax())
+                if similarities[top] >= self.threshold:
+                    content_id, _, entry_key, _ = candidates[top]
+                    best = {'content_id': content_id, 'similarity': round(float(similarities[top]), 4), 'canonical_key': entry_key}
+
+            self._stats['approximate_hits' if best else 'misses'] += 1
+            return best
+
+    def reusable_lesson(self, concept: str, personalization_params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        An existing lesson for a near-identical concept and the same profile, shaped like generated
+        lesson content with reused_content_id set. None outside an app context or when nothing matches.
+        """
+        profile = self.profile_key('lesson', personalization_params)
+        if not self.enabled or profile is None or not has_app_context():
+            return None
+        self._refresh()
+
+        match = self.nearest(concept, profile)
+        if match is None:
+            return None
+        content = db.session.get(Content, match['content_id'])
+        if content is None:
+            self.remove(match['content_id'])
+            return None
+
+        return {
+            'title': content.title,
+            'learning_objectives': list(content.learning_objectives or []),
+            'content': content.content_body or '',
+            'examples': [],
+            'key_takeaways': [],
+            'next_steps': '',
+            'reused_content_id': content.id,
+            'similarity': match['similarity']
+        }
+
+    def sync_content(self, content_id: int, snapshot: Optional[Dict[str, Any]]) -> None:
+        """Apply a committed Content change"""
+        if snapshot is None or snapshot.get('content_type') not in self.INDEXED_CONTENT_TYPES:
+            self.remove(content_id)
+            return
+        params = snapshot.get('personalization_params') or {}
+        profile = self.profile_key(snapshot['content_type'], params)
+        concepts = snapshot.get('concepts_covered') or []
+        if profile is None or not concepts:
+            self.remove(content_id)
+            return
+        self.add(content_id, concepts, profile)
+
+    def _refresh(self) -> None:
+        """Apply Content changes committed by any process since the last lookup"""
+        try:
+            changes = self._feed.poll()
+        except Exception as e:
+            print(f"Could not load content into the concept index: {e}")
+            return
+        with self._lock:
+            for content_id, snapshot in changes:
+                self.sync_content(content_id, snapshot)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index size and lookup counters"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'loaded': self._feed.loaded,
+                'threshold': self.threshold,
+                'content_rows': len(self._entries_by_content),
+                'entries': len(self._entries),
+                'buckets': len(self._buckets),
+                **self._stats
+            }
+
+
+# Process-wide index shared by the AI service and the content routes
+concept_index = ConceptIndex()
+content_events.subscribe(concept_index.sync_content)
@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+from datetime import timedelta
+from typing import Dict, Any, Callable, Optional, List, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from src.models.user import db
+from src.models.content import Content
+
+# Callbacks receive (content_id, snapshot); snapshot is None when the row was deleted
+ContentListener = Callable[[int, Optional[Dict[str, Any]]], None]
+
+_listeners: List[ContentListener] = []
+_PENDING_KEY = 'content_changes'
+_SNAPSHOT_FIELDS = (
+    'niche', 'content_type', 'difficulty_level', 'concepts_covered', 'prerequisites', 'personalization_params'
+)
+
+
+def subscribe(listener: ContentListener) -> None:
+    """Call listener for every Content insert, update and delete once its transaction commits in this process"""
+    _listeners.append(listener)
+
+
+class ContentChangeFeed:
+    """
+    Content changes committed by any process, for in-memory indexes that subscribe() alone would
+    leave stale: other gunicorn workers and the job worker write Content too.
+
+    poll() returns (content_id, snapshot) pairs for rows whose updated_at moved past a watermark,
+    re-reading an overlap window so transactions that committed late (or on a skewed clock) are
+    not missed. When the row count disagrees with the ids seen so far it reconciles ids, which
+    picks up deletes. The first poll returns every row. Reads use their own connection, so only
+    committed rows are seen.
+    """
+
+    def __init__(self, overlap_seconds: float = None, interval_seconds: float = None):
+        self.overlap = timedelta(seconds=overlap_seconds if overlap_seconds is not None
+                                 else float(os.getenv('CONTENT_SYNC_OVERLAP_SECONDS', 30)))
+        self.interval = interval_seconds if interval_seconds is not None else float(os.getenv('CONTENT_SYNC_INTERVAL_SECONDS', 1))
+        self._lock = threading.Lock()
+        self._versions = {}  # content_id -> updated_at last returned
+        self._watermark = None
+        self._last_poll = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._last_poll is not None
+
+    def poll(self) -> List[Tuple[int, Optional[Dict[str, Any]]]]:
+        """Changes since the previous poll; empty if it ran less than interval seconds ago"""
+        with self._lock:
+            if self._last_poll is not None and time.monotonic() - self._last_poll < self.interval:
+                return []
+
+            table = Content.__table__
+            columns = [table.c.id, table.c.updated_at] + [table.c[field] for field in _SNAPSHOT_FIELDS]
+            with db.engine.connect() as connection:
+                statement = db.select(*columns)
+                if self._watermark is not None:
+                    statement = statement.where(table.c.updated_at >= self._watermark - self.overlap)
+                changes = self._changed(connection.execute(statement))
+
+                count = connection.execute(db.select(db.func.count()).select_from(table)).scalar()
+                if count != len(self._versions):
+                    ids = set(connection.execute(db.select(table.c.id)).scalars())
+                    for content_id in set(self._versions) - ids:
+                        del self._versions[content_id]
+                        changes.append((content_id, None))
+                    missing = ids - set(self._versions)
+                    if missing:
+                        changes.extend(self._changed(connection.execute(
+                            db.select(*columns).where(table.c.id.in_(missing))
+                        )))
+
+            self._last_poll = time.monotonic()
+            return changes
+
+    def _changed(self, rows) -> List[Tuple[int, Dict[str, Any]]]:
+        changes = []
+        for row in rows:
+            if row.id in self._versions and self._versions[row.id] == row.updated_at:
+                continue
+            self._versions[row.id] = row.updated_at
+            if row.updated_at is not None and (self._watermark is None or row.updated_at > self._watermark):
+                self._watermark = row.updated_at
+            changes.append((row.id, {field: row._mapping[field] for field in _SNAPSHOT_FIELDS}))
+        return changes
+
+
+def _record_change(target, deleted: bool) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    snapshot = None if deleted else {field: getattr(target, field) for field in _SNAPSHOT_FIELDS}
+    session.info.setdefault(_PENDING_KEY, []).append((target.id, snapshot))
+
+
+@event.listens_for(Content, 'after_insert')
+@event.listens_for(Content, 'after_update')
+def _content_saved(mapper, connection, target):
+    _record_change(target, deleted=False)
+
+
+@event.listens_for(Content, 'after_delete')
+def _content_deleted(mapper, connection, target):
+    _record_change(target, deleted=True)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_committed_changes(session):
+    for content_id, snapshot in session.info.pop(_PENDING_KEY, []):
+        for listener in _listeners:
+            try:
+                listener(content_id, snapshot)
+            except Exception as e:
+                print(f"Error applying change to content {content_id}: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,248 @@
+import os
+import json
+import copy
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'generation_cache.db')
+
+
+class GenerationCache:
+    """
+    Two-tier, content-addressed cache for AI generated content.
+
+    The first tier is an in-process LRU. The second tier is a SQLite file
+    shared by every worker process on the host, so a lesson generated by one
+    gunicorn worker is served from disk by all the others.
+    """
+
+    def __init__(self, path: str = None, ttl_seconds: int = None,
+                 memory_size: int = None, disk_size: int = None, enabled: bool = None):
+        self.path = path or os.getenv('GENERATION_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('GENERATION_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+        self.memory_size = memory_size if memory_size is not None else int(os.getenv('GENERATION_CACHE_MEMORY_SIZE', 256))
+        self.disk_size = disk_size if disk_size is not None else int(os.getenv('GENERATION_CACHE_DISK_SIZE', 10000))
+        if enabled is None:
+            enabled = os.getenv('GENERATION_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+        # After a failure to open the disk tier, wait this long (doubling up to the max) before trying again
+        self.disk_retry_seconds = float(os.getenv('GENERATION_CACHE_DISK_RETRY_SECONDS', 1))
+        self.disk_retry_max_seconds = float(os.getenv('GENERATION_CACHE_DISK_RETRY_MAX_SECONDS', 300))
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_ready = False
+        self._disk_retry_at = 0.0
+        self._disk_backoff = 0.0
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+            'expired': 0,
+            'disk_errors': 0
+        }
+
+    @staticmethod
+    def make_key(concept: str, content_type: str, personalization_params: Dict[str, Any],
+                 exercise_type: str = None) -> str:
+        """
+        Build a content-addressed key from everything that shapes the generated output
+        """
+        key_material = {
+            'concept': (concept or '').strip(),
+            'content_type': content_type,
+            'exercise_type': exercise_type,
+            'learning_style': personalization_params.get('learning_style', 'visual'),
+            'experience_level': personalization_params.get('experience_level', 'beginner'),
+            'niche': personalization_params.get('niche', 'tech_career')
+        }
+        encoded = json.dumps(key_material, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a key in memory first, then on disk
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return copy.deepcopy(value)
+                del self._memory[key]
+                self._stats['expired'] += 1
+
+        disk_entry = self._disk_get(key, now)
+        if disk_entry is not None:
+            stored_at, value = disk_entry
+            self._memory_set(key, value, stored_at)
+            with self._lock:
+                self._stats['disk_hits'] += 1
+            return copy.deepcopy(value)
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store a generated result in both tiers
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        value = copy.deepcopy(value)
+        self._memory_set(key, value, now)
+        self._disk_set(key, value, now)
+        with self._lock:
+            self._stats['sets'] += 1
+
+    def clear(self) -> None:
+        """Drop every cached entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            with conn:
+                conn.execute('DELETE FROM generation_cache')
+        except sqlite3.Error as e:
+            self._record_disk_error(e)
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        stats['enabled'] = self.enabled
+        stats['ttl_seconds'] = self.ttl_seconds
+        stats['memory_size'] = self.memory_size
+        stats['disk_size'] = self.disk_size
+        return stats
+
+    def _memory_set(self, key: str, value: Dict[str, Any], stored_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+                self._stats['memory_evictions'] += 1
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """
+        Open a short-lived connection to the shared disk tier.
+        SQLite connections are not shared between threads, so every operation gets its own.
+        Failures (e.g. "database is locked" while workers start together) skip the disk tier
+        for a backoff period rather than for the life of the process.
+        """
+        if time.monotonic() < self._disk_retry_at:
+            return None
+        conn = None
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            if not self._disk_ready:
+                with conn:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS generation_cache ('
+                        'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                        'created_at REAL NOT NULL, last_access REAL NOT NULL)'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS ix_generation_cache_last_access ON generation_cache (last_access)')
+                self._disk_ready = True
+            with self._lock:
+                self._disk_backoff = 0.0
+            return conn
+        except (sqlite3.Error, OSError) as e:
+            if conn is not None:
+                conn.close()
+            with self._lock:
+                self._disk_backoff = min(self.disk_retry_max_seconds, max(self.disk_retry_seconds, self._disk_backoff * 2))
+                self._disk_retry_at = time.monotonic() + self._disk_backoff
+                self._stats['disk_errors'] += 1
+            print(f"Generation cache disk tier unavailable, retrying in {self._disk_backoff:.1f}s: {e}")
+            return None
+
+    def _disk_get(self, key: str, now: float):
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute('SELECT value, created_at FROM generation_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            with conn:
+                if now - created_at > self.ttl_seconds:
+                    conn.execute('DELETE FROM generation_cache WHERE key = ?', (key,))
+                    with self._lock:
+                        self._stats['expired'] += 1
+                    return None
+                conn.execute('UPDATE generation_cache SET last_access = ? WHERE key = ?', (now, key))
+            return created_at, json.loads(value)
+        except (sqlite3.Error, ValueError) as e:
+            self._record_disk_error(e)
+            return None
+        finally:
+            conn.close()
+
+    def _disk_set(self, key: str, value: Dict[str, Any], now: float) -> None:
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO generation_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(value), now, now)
+                )
+                conn.execute('DELETE FROM generation_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+
+                # Size-based eviction: drop least recently used rows above the limit
+                count = conn.execute('SELECT COUNT(*) FROM generation_cache').fetchone()[0]
+                overflow = count - self.disk_size
+                if overflow > 0:
+                    conn.execute(
+                        'DELETE FROM generation_cache WHERE key IN ('
+                        'SELECT key FROM generation_cache ORDER BY last_access ASC LIMIT ?)',
+                        (overflow,)
+                    )
+                    with self._lock:
+                        self._stats['disk_evictions'] += overflow
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self._record_disk_error(e)
+        finally:
+            conn.close()
+
+    def _record_disk_error(self, error: Exception) -> None:
+        print(f"Generation cache disk error: {error}")
+        with self._lock:
+            self._stats['disk_errors'] += 1
+
+
+# Process-wide cache shared by every AIContentGenerator instance
+generation_cache = GenerationCache()
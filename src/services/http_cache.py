@@ -0,0 +1,68 @@
+import os
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Tuple
+from flask import Response, request
+from werkzeug.http import http_date, is_resource_modified
+from src.models.user import db
+
+# Clients may keep responses but must revalidate them; 304s make that cheap
+PUBLIC_CACHE_CONTROL = os.getenv('HTTP_PUBLIC_CACHE_CONTROL', 'public, no-cache')
+PRIVATE_CACHE_CONTROL = os.getenv('HTTP_PRIVATE_CACHE_CONTROL', 'private, no-cache')
+
+Validators = Tuple[str, Optional[datetime]]
+
+
+def _etag(*parts) -> str:
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def resource_validators(model, resource_id: int) -> Optional[Validators]:
+    """ETag and updated_at for one row from its updated_at alone, or None if it does not exist"""
+    row = db.session.query(model.id, model.updated_at).filter(model.id == resource_id).first()
+    if row is None:
+        return None
+    updated_at = row.updated_at
+    return _etag(model.__tablename__, resource_id, updated_at, request.query_string), updated_at
+
+
+def collection_validators(model, *criteria) -> Validators:
+    """
+    ETag for a filtered collection: any insert, update or delete in the set changes its row
+    count, id sum, newest updated_at or highest id. The query string is part of the tag, so
+    each page and field selection validates separately. No Last-Modified: the newest
+    updated_at does not move when a row is deleted.
+    """
+    count, id_sum, last_updated, last_id = db.session.query(
+        db.func.count(model.id), db.func.sum(model.id), db.func.max(model.updated_at), db.func.max(model.id)
+    ).filter(*criteria).one()
+    return _etag(model.__tablename__, count, id_sum, last_updated, last_id, request.query_string), None
+
+
+def conditional_response(validators: Validators, build: Callable[[], Response],
+                         cache_control: str = PRIVATE_CACHE_CONTROL) -> Response:
+    """
+    Answer If-None-Match with 304 before building the body; otherwise call build() and attach
+    the validators and Cache-Control. If-Modified-Since alone is never trusted: HTTP dates have
+    one second resolution, so a second update within the same second would look unmodified.
+    """
+    etag, updated_at = validators
+    last_modified = None
+    if updated_at:
+        # Rounded up, so the header is never earlier than the change it describes
+        last_modified = updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+        if updated_at.microsecond:
+            last_modified += timedelta(seconds=1)
+
+    if not is_resource_modified(request.environ, etag=etag):
+        response = Response(status=304)
+    else:
+        response = build()
+        if isinstance(response, tuple) or response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    if last_modified:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,353 @@
+import os
+import time
+import random
+import socket
+import ipaddress
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, Optional
+from urllib.parse import urlparse
+from sqlalchemy import func
+from src.models.user import db
+from src.models.job import GenerationJob
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+
+class JobPartiallyFailed(Exception):
+    """
+    Raised by a handler that committed part of its work. The job is retried (or dead-lettered)
+    like any failure, but with the given payload for the remaining work and result so far.
+    """
+
+    def __init__(self, message: str, payload: Dict[str, Any], result: Dict[str, Any] = None):
+        super().__init__(message)
+        self.payload = payload
+        self.result = result
+
+
+class JobQueue:
+    """
+    Durable job queue stored in the application database (SQLite or Postgres).
+
+    Web requests enqueue GenerationJob rows; worker processes claim due jobs
+    with a compare-and-set UPDATE (status queued -> running), so any number of
+    workers can poll the same table without a broker. Failed jobs are retried
+    with exponential backoff and jitter until max_attempts, then dead-lettered
+    (status "dead") for inspection and manual retry. A running job's worker
+    renews its lease with a heartbeat; jobs whose worker died mid-run are
+    requeued once the lease expires, and a worker that lost its lease cannot
+    overwrite the requeued row.
+    """
+
+    def __init__(self):
+        self.max_attempts = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+        self.backoff_base = float(os.getenv('JOB_BACKOFF_BASE_SECONDS', 5))
+        self.backoff_max = float(os.getenv('JOB_BACKOFF_MAX_SECONDS', 600))
+        self.lease_seconds = float(os.getenv('JOB_LEASE_SECONDS', 300))
+        self.heartbeat_seconds = float(os.getenv('JOB_HEARTBEAT_SECONDS', self.lease_seconds / 3))
+        self.webhook_timeout = float(os.getenv('JOB_WEBHOOK_TIMEOUT_SECONDS', 5))
+        self.webhook_attempts = int(os.getenv('JOB_WEBHOOK_ATTEMPTS', 3))
+        # Comma separated hosts callbacks may target; empty allows any host with only public addresses
+        self.callback_allowed_hosts = {
+            host.strip().lower() for host in os.getenv('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip()
+        }
+
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._last_reclaim = 0.0
+
+    def register(self, job_type: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]]) -> None:
+        """Register the function that runs jobs of a type; it receives the payload and returns a JSON result"""
+        self._handlers[job_type] = handler
+
+    def valid_callback_url(self, url: str) -> bool:
+        """
+        True for an http(s) URL whose host is allow-listed or resolves only to public addresses,
+        so job results are never POSTed to loopback, link-local (cloud metadata) or private networks
+        """
+        parsed = urlparse(url or '')
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            return False
+        host = parsed.hostname.lower()
+        if self.callback_allowed_hosts:
+            return host in self.callback_allowed_hosts
+
+        try:
+            port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+        except (OSError, ValueError):
+            return False
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split('%', 1)[0])
+            if getattr(ip, 'ipv4_mapped', None):
+                ip = ip.ipv4_mapped
+            if not ip.is_global or ip.is_multicast:
+                return False
+        return bool(addresses)
+
+    def enqueue(self, job_type: str, payload: Dict[str, Any], learner_id: int = None,
+                callback_url: str = None, max_attempts: int = None) -> GenerationJob:
+        """Add a job to the current session and commit it"""
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if callback_url and not self.valid_callback_url(callback_url):
+            raise ValueError(f"Invalid callback_url: {callback_url}")
+
+        job = GenerationJob(
+            job_type=job_type,
+            learner_id=learner_id,
+            payload=payload,
+            status='queued',
+            attempts=0,
+            max_attempts=max_attempts or self.max_attempts,
+            run_after=datetime.utcnow(),
+            callback_url=callback_url
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def claim(self, worker_id: str) -> Optional[GenerationJob]:
+        """Atomically take the oldest due job, or return None if there is nothing to do"""
+        now = datetime.utcnow()
+        self._reclaim_expired(now)
+
+        candidates = db.session.query(GenerationJob.id).filter(
+            GenerationJob.status == 'queued',
+            GenerationJob.run_after <= now
+        ).order_by(GenerationJob.run_after, GenerationJob.id).limit(5).all()
+
+        for (job_id,) in candidates:
+            claimed = GenerationJob.query.filter(
+                GenerationJob.id == job_id,
+                GenerationJob.status == 'queued'
+            ).update({
+                'status': 'running',
+                'locked_by': worker_id,
+                'locked_at': now,
+                'attempts': GenerationJob.attempts + 1,
+                'updated_at': now
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return db.session.get(GenerationJob, job_id)
+        return None
+
+    def _reclaim_expired(self, now: datetime) -> None:
+        """Requeue (or dead-letter) running jobs whose worker stopped renewing the lease"""
+        with self._lock:
+            if time.monotonic() - self._last_reclaim < self.lease_seconds / 4:
+                return
+            self._last_reclaim = time.monotonic()
+
+        cutoff = now - timedelta(seconds=self.lease_seconds)
+        expired = db.session.query(GenerationJob).filter(
+            GenerationJob.status == 'running',
+            GenerationJob.locked_at < cutoff
+        ).all()
+        for job in expired:
+            # Skipped if a heartbeat renewed the lease since the query above
+            self._update_if_running(
+                job.id, self._failure_values(job, f"Lease expired while running on {job.locked_by}"),
+                GenerationJob.locked_at < cutoff
+            )
+        if expired:
+            db.session.commit()
+
+    def backoff_seconds(self, attempts: int) -> float:
+        """Exponential backoff with full jitter for the retry after `attempts` attempts"""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def _failure_values(self, job: GenerationJob, error: str) -> Dict[str, Any]:
+        """Column values that retry a failed job after backoff, or dead-letter it once out of attempts"""
+        now = datetime.utcnow()
+        values = {'last_error': error, 'locked_by': None, 'locked_at': None, 'updated_at': now}
+        if job.attempts >= job.max_attempts:
+            values.update({'status': 'dead', 'completed_at': now})
+        else:
+            values.update({'status': 'queued', 'run_after': now + timedelta(seconds=self.backoff_seconds(job.attempts))})
+        return values
+
+    @staticmethod
+    def _update_if_running(job_id: int, values: Dict[str, Any], *criteria) -> bool:
+        """Compare-and-set a running job's row; False if it is no longer running under the given criteria"""
+        updated = GenerationJob.query.filter(
+            GenerationJob.id == job_id,
+            GenerationJob.status == 'running',
+            *criteria
+        ).update(values, synchronize_session=False)
+        return bool(updated)
+
+    @contextmanager
+    def _lease_heartbeat(self, job_id: int, worker_id: str):
+        """Renew the job's lease every heartbeat_seconds on a separate connection while the block runs"""
+        engine = db.engine
+        table = GenerationJob.__table__
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat_seconds):
+                try:
+                    with engine.begin() as connection:
+                        renewed = connection.execute(table.update().where(
+                            table.c.id == job_id,
+                            table.c.status == 'running',
+                            table.c.locked_by == worker_id
+                        ).values(locked_at=datetime.utcnow())).rowcount
+                except Exception as e:
+                    print(f"Heartbeat for job {job_id} failed: {e}")
+                    continue
+                if not renewed:
+                    return
+
+        thread = threading.Thread(target=beat, name=f'job-heartbeat-{job_id}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def execute(self, job: GenerationJob) -> None:
+        """Run a claimed job's handler and record success, retry or dead-lettering"""
+        job_id, worker_id = job.id, job.locked_by
+        handler = self._handlers.get(job.job_type)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job type {job.job_type}")
+            with self._lease_heartbeat(job_id, worker_id):
+                result = handler(dict(job.payload or {}))
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(GenerationJob, job_id)
+            print(f"Job {job.id} ({job.job_type}) attempt {job.attempts} failed: {e}")
+            values = self._failure_values(job, str(e))
+            if isinstance(e, JobPartiallyFailed):
+                values.update({'payload': e.payload, 'result': e.result})
+        else:
+            values = {
+                'status': 'succeeded',
+                'result': result,
+                'last_error': None,
+                'locked_by': None,
+                'locked_at': None,
+                'completed_at': datetime.utcnow(),
+                'updated_at': datetime.utcnow()
+            }
+
+        # Only the worker still holding the lease may record the outcome
+        if not self._update_if_running(job_id, values, GenerationJob.locked_by == worker_id):
+            db.session.rollback()
+            print(f"Job {job_id} lost its lease on {worker_id}; outcome not recorded")
+            return
+        db.session.commit()
+        job = db.session.get(GenerationJob, job_id, populate_existing=True)
+
+        if job.status in ('succeeded', 'dead') and job.callback_url:
+            job.callback_status = self._deliver_webhook(job)
+            db.session.commit()
+
+    def _deliver_webhook(self, job: GenerationJob) -> str:
+        """POST the finished job to its callback URL, retrying briefly"""
+        if not HTTPX_AVAILABLE:
+            return 'failed: httpx not installed'
+        # Checked again at delivery, since DNS may have changed since the job was enqueued
+        if not self.valid_callback_url(job.callback_url):
+            return 'failed: callback_url does not resolve to an allowed host'
+
+        error = None
+        for attempt in range(self.webhook_attempts):
+            try:
+                response = httpx.post(job.callback_url, json=job.to_dict(), timeout=self.webhook_timeout)
+                if response.status_code < 300:
+                    return f'delivered ({response.status_code})'
+                error = f'HTTP {response.status_code}'
+            except Exception as e:
+                error = str(e)
+            if attempt < self.webhook_attempts - 1:
+                time.sleep(2 ** attempt)
+        print(f"Webhook for job {job.id} to {job.callback_url} failed: {error}")
+        return f'failed: {error}'[:200]
+
+    def run_once(self, worker_id: str) -> bool:
+        """Claim and run one job; returns False if the queue had nothing due"""
+        job = self.claim(worker_id)
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def retry(self, job: GenerationJob) -> GenerationJob:
+        """Put a dead job back on the queue with a fresh attempt budget"""
+        if job.status != 'dead':
+            raise ValueError(f"Only dead jobs can be retried (job is {job.status})")
+        job.status = 'queued'
+        job.attempts = 0
+        job.run_after = datetime.utcnow()
+        job.completed_at = None
+        job.callback_status = None
+        db.session.commit()
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """Return job counts by status and queue configuration"""
+        counts = dict(
+            db.session.query(GenerationJob.status, func.count(GenerationJob.id)).group_by(GenerationJob.status).all()
+        )
+        oldest_due = db.session.query(func.min(GenerationJob.run_after)).filter(
+            GenerationJob.status == 'queued',
+            GenerationJob.run_after <= datetime.utcnow()
+        ).scalar()
+        return {
+            'counts': {status: counts.get(status, 0) for status in ('queued', 'running', 'succeeded', 'dead')},
+            'oldest_due_seconds': round((datetime.utcnow() - oldest_due).total_seconds(), 1) if oldest_due else 0,
+            'job_types': sorted(self._handlers),
+            'max_attempts': self.max_attempts,
+            'backoff_base_seconds': self.backoff_base,
+            'backoff_max_seconds': self.backoff_max,
+            'lease_seconds': self.lease_seconds
+        }
+
+
+def default_worker_id(index: int = 0) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def run_worker_pool(app, concurrency: int = None, poll_interval: float = None,
+                    stop_event: threading.Event = None) -> None:
+    """
+    Run `concurrency` worker threads against the queue until stop_event is set.
+    Each thread claims and runs one job at a time inside its own app context.
+    """
+    concurrency = concurrency or int(os.getenv('JOB_WORKER_CONCURRENCY', 4))
+    poll_interval = poll_interval if poll_interval is not None else float(os.getenv('JOB_POLL_INTERVAL_SECONDS', 1))
+    stop_event = stop_event or threading.Event()
+
+    def work(index):
+        worker_id = default_worker_id(index)
+        while not stop_event.is_set():
+            try:
+                with app.app_context():
+                    ran = job_queue.run_once(worker_id)
+            except Exception as e:
+                print(f"Worker {worker_id} error: {e}")
+                ran = False
+            if not ran:
+                stop_event.wait(poll_interval)
+
+    threads = [threading.Thread(target=work, args=(index,), name=f'job-worker-{index}') for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+# Process-wide queue; job handlers register themselves on import
+job_queue = JobQueue()
@@ -0,0 +1,467 @@
+import heapq
+import threading
+from typing import Dict, Any, List, Iterable, Callable, Optional
+from flask import has_app_context
+from src.services import content_events
+
+# Curated prerequisite edges per niche: concept -> direct prerequisites
+CURRICULUM_PREREQUISITES = {
+    'tech_career': {
+        'Algorithm Optimization': ['Python Basics', 'Data Structures'],
+        'System Design Principles': ['Programming Fundamentals', 'Database Basics'],
+        'Testing Strategies': ['Code Writing', 'Debugging'],
+        'Performance Tuning': ['Algorithm Optimization', 'System Design Principles']
+    },
+    'creator_business': {
+        'Email Marketing': ['Content Planning', 'Audience Research'],
+        'SEO Optimization': ['Content Creation', 'Basic Analytics'],
+        'Monetization Strategies': ['Audience Building', 'Brand Development'],
+        'Advanced Analytics': ['Basic Analytics', 'Data Interpretation']
+    }
+}
+
+
+class PrerequisiteCycleError(ValueError):
+    """Raised when prerequisite edges would make the concept graph cyclic"""
+
+    def __init__(self, concepts: List[str]):
+        self.concepts = concepts
+        super().__init__(f"Prerequisite cycle involving: {', '.join(concepts)}")
+
+
+def _bits(mask: int) -> Iterable[int]:
+    """Yield the indexes of set bits, lowest first"""
+    digits = bin(mask)[:1:-1]
+    index = digits.find('1')
+    while index != -1:
+        yield index
+        index = digits.find('1', index + 1)
+
+
+class KnowledgeGraph:
+    """
+    Concepts and prerequisite edges compiled into an integer-indexed DAG.
+
+    Each concept gets a stable integer id. The graph keeps a topological order
+    and, per concept, the transitive closure of its prerequisites as a Python
+    int bitset, so "everything these targets depend on" is an OR over a few
+    ints. Edges are reference counted by source (curriculum, content rows) so
+    the same edge contributed twice survives one removal. Adding an edge
+    updates closures in place; removals mark the graph stale and it recompiles
+    on the next query.
+    """
+
+    def __init__(self, name: str = 'default', preference_limit: int = 256):
+        self.name = name
+        self.preference_limit = preference_limit
+        self.version = 0
+        self._lock = threading.RLock()
+        self._index = {}
+        self._concepts = []
+        self._prerequisites = []  # id -> set of direct prerequisite ids
+        self._edge_refs = {}  # (concept_id, prerequisite_id) -> reference count
+        self._closure = []  # id -> bitset of transitive prerequisite ids
+        self._order = []  # ids in topological order
+        self._position = []  # id -> index in _order
+        self._closure_stale = False
+        self._order_stale = False
+        self._stats = {'compiles': 0, 'incremental_updates': 0}
+
+    def _node(self, concept: str) -> int:
+        node_id = self._index.get(concept)
+        if node_id is None:
+            node_id = len(self._concepts)
+            self._index[concept] = node_id
+            self._concepts.append(concept)
+            self._prerequisites.append(set())
+            self._closure.append(0)
+            # An isolated node can go anywhere in a topological order
+            self._position.append(len(self._order))
+            self._order.append(node_id)
+        return node_id
+
+    def add_prerequisite(self, concept: str, prerequisite: str) -> None:
+        """
+        Record that `concept` requires `prerequisite`.
+        Raises PrerequisiteCycleError if the edge would close a cycle.
+        """
+        with self._lock:
+            self._compile_if_stale()
+            if concept == prerequisite:
+                raise PrerequisiteCycleError([concept])
+
+            concept_id = self._node(concept)
+            prerequisite_id = self._node(prerequisite)
+            edge = (concept_id, prerequisite_id)
+            if edge in self._edge_refs:
+                self._edge_refs[edge] += 1
+                return
+            if self._closure[prerequisite_id] >> concept_id & 1:
+                raise PrerequisiteCycleError([concept, prerequisite])
+
+            self._edge_refs[edge] = 1
+            self._prerequisites[concept_id].add(prerequisite_id)
+
+            added = self._closure[prerequisite_id] | (1 << prerequisite_id)
+            if self._closure[concept_id] & added != added:
+                concept_bit = 1 << concept_id
+                for node_id, closure in enumerate(self._closure):
+                    if node_id == concept_id or closure & concept_bit:
+                        self._closure[node_id] = closure | added
+            if self._position[prerequisite_id] > self._position[concept_id]:
+                self._order_stale = True
+
+            self.version += 1
+            self._stats['incremental_updates'] += 1
+
+    def remove_prerequisite(self, concept: str, prerequisite: str) -> None:
+        """Drop one reference to an edge; the edge goes away with its last reference"""
+        with self._lock:
+            edge = (self._index.get(concept), self._index.get(prerequisite))
+            if edge not in self._edge_refs:
+                return
+            self._edge_refs[edge] -= 1
+            if self._edge_refs[edge] > 0:
+                return
+
+            del self._edge_refs[edge]
+            self._prerequisites[edge[0]].discard(edge[1])
+            self._closure_stale = True
+            self.version += 1
+
+    def load(self, edges: Iterable[tuple]) -> None:
+        """
+        Bulk-add (concept, prerequisite) edges and compile once.
+        Raises PrerequisiteCycleError, leaving the graph unchanged, if the edges contain a cycle.
+        """
+        with self._lock:
+            added = []
+            for concept, prerequisite in edges:
+                if concept == prerequisite:
+                    self._rollback_edges(added)
+                    raise PrerequisiteCycleError([concept])
+                edge = (self._node(concept), self._node(prerequisite))
+                self._edge_refs[edge] = self._edge_refs.get(edge, 0) + 1
+                self._prerequisites[edge[0]].add(edge[1])
+                added.append(edge)
+
+            self._closure_stale = True
+            try:
+                self._compile_if_stale()
+            except PrerequisiteCycleError:
+                self._rollback_edges(added)
+                raise
+            self.version += 1
+
+    def _rollback_edges(self, edges: List[tuple]) -> None:
+        for edge in edges:
+            self._edge_refs[edge] -= 1
+            if not self._edge_refs[edge]:
+                del self._edge_refs[edge]
+                self._prerequisites[edge[0]].discard(edge[1])
+        self._closure_stale = True
+        self._compile_if_stale()
+
+    def _compile_if_stale(self) -> None:
+        """Recompute the topological order (Kahn) and, if needed, the closures"""
+        if not (self._closure_stale or self._order_stale):
+            return
+
+        node_count = len(self._concepts)
+        dependents = [[] for _ in range(node_count)]
+        remaining = [len(prerequisites) for prerequisites in self._prerequisites]
+        for concept_id, prerequisites in enumerate(self._prerequisites):
+            for prerequisite_id in prerequisites:
+                dependents[prerequisite_id].append(concept_id)
+
+        order = [node_id for node_id in range(node_count) if not remaining[node_id]]
+        for node_id in order:
+            for dependent_id in dependents[node_id]:
+                remaining[dependent_id] -= 1
+                if not remaining[dependent_id]:
+                    order.append(dependent_id)
+
+        if len(order) < node_count:
+            raise PrerequisiteCycleError(sorted(self._concepts[i] for i in range(node_count) if remaining[i]))
+
+        if self._closure_stale:
+            closure = [0] * node_count
+            for node_id in order:
+                bits = 0
+                for prerequisite_id in self._prerequisites[node_id]:
+                    bits |= closure[prerequisite_id] | (1 << prerequisite_id)
+                closure[node_id] = bits
+            self._closure = closure
+
+        position = [0] * node_count
+        for index, node_id in enumerate(order):
+            position[node_id] = index
+        self._order = order
+        self._position = position
+        self._closure_stale = False
+        self._order_stale = False
+        self._stats['compiles'] += 1
+
+    def _mask(self, concepts: Iterable[str]) -> int:
+        mask = 0
+        for concept in concepts:
+            node_id = self._index.get(concept)
+            if node_id is not None:
+                mask |= 1 << node_id
+        return mask
+
+    def _names_in_order(self, mask: int) -> List[str]:
+        return [self._concepts[node_id] for node_id in sorted(_bits(mask), key=self._position.__getitem__)]
+
+    def prerequisites_of(self, concept: str, transitive: bool = True) -> List[str]:
+        """Prerequisites of a concept in topological order (direct ones only unless transitive)"""
+        with self._lock:
+            self._compile_if_stale()
+            node_id = self._index.get(concept)
+            if node_id is None:
+                return []
+            if transitive:
+                return self._names_in_order(self._closure[node_id])
+            return self._names_in_order(self._mask(self._concepts[i] for i in self._prerequisites[node_id]))
+
+    def unmet_prerequisites(self, targets: Iterable[str], mastered: Iterable[str] = ()) -> List[str]:
+        """All transitive prerequisites of the targets not yet mastered, in topological order"""
+        with self._lock:
+            self._compile_if_stale()
+            needed = 0
+            for concept in targets:
+                node_id = self._index.get(concept)
+                if node_id is not None:
+                    needed |= self._closure[node_id]
+            return self._names_in_order(needed & ~self._mask(mastered))
+
+    def depends_on(self, concept: str, prerequisite: str) -> bool:
+        """True if `prerequisite` is a direct or transitive prerequisite of `concept`"""
+        with self._lock:
+            self._compile_if_stale()
+            concept_id = self._index.get(concept)
+            prerequisite_id = self._index.get(prerequisite)
+            if concept_id is None or prerequisite_id is None:
+                return False
+            return bool(self._closure[concept_id] >> prerequisite_id & 1)
+
+    def order_items(self, items: List[Any], concepts_of: Callable[[Any], Iterable[str]]) -> List[Any]:
+        """
+        Reorder items so each one comes after the items covering its prerequisites.
+        Otherwise the input order is kept, so callers can pass items sorted by priority.
+        Lists longer than preference_limit are simply sorted by topological position.
+        """
+        with self._lock:
+            self._compile_if_stale()
+            if len(items) > self.preference_limit:
+                def position(item):
+                    node_ids = [self._index[concept] for concept in concepts_of(item) if concept in self._index]
+                    return max((self._position[node_id] for node_id in node_ids), default=-1)
+                return sorted(items, key=position)
+
+            covered = [self._mask(concepts_of(item)) for item in items]
+            owners = {}
+            for index, mask in enumerate(covered):
+                for node_id in _bits(mask):
+                    owners.setdefault(node_id, []).append(index)
+            # Only prerequisites covered by some item can constrain the order
+            owned = self._mask(self._concepts[node_id] for node_id in owners)
+            required = []
+            for mask in covered:
+                requires = 0
+                for node_id in _bits(mask):
+                    requires |= self._closure[node_id]
+                required.append(requires & owned & ~mask)
+
+        dependents = [[] for _ in items]
+        remaining = [0] * len(items)
+        for index, requires in enumerate(required):
+            blockers = {owner for node_id in _bits(requires) for owner in owners.get(node_id, ()) if owner != index}
+            remaining[index] = len(blockers)
+            for blocker in blockers:
+                dependents[blocker].append(index)
+
+        ready = [index for index in range(len(items)) if not remaining[index]]
+        heapq.heapify(ready)
+        placed = [False] * len(items)
+        ordered = []
+        while len(ordered) < len(items):
+            if not ready:
+                # Items can depend on each other when they cover several concepts; keep input order then
+                heapq.heappush(ready, next(index for index in range(len(items)) if not placed[index]))
+            index = heapq.heappop(ready)
+            if placed[index]:
+                continue
+            placed[index] = True
+            ordered.append(items[index])
+            for dependent in dependents[index]:
+                remaining[dependent] -= 1
+                if not remaining[dependent] and not placed[dependent]:
+                    heapq.heappush(ready, dependent)
+        return ordered
+
+    def stats(self) -> Dict[str, Any]:
+        """Return graph size and compile counters"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'version': self.version,
+                'concepts': len(self._concepts),
+                'edges': len(self._edge_refs),
+                'stale': self._closure_stale or self._order_stale,
+                **self._stats
+            }
+
+
+class KnowledgeGraphRegistry:
+    """
+    One KnowledgeGraph per niche, seeded from the curated curriculum and kept
+    in sync with Content.prerequisites / Content.concepts_covered. Content
+    rows are loaded lazily on first use inside an app context; afterwards
+    this process's commits are applied through session events and other
+    processes' through a ContentChangeFeed polled whenever a graph is used.
+    """
+
+    def __init__(self, curriculum: Dict[str, Dict[str, List[str]]] = None):
+        self.curriculum = curriculum if curriculum is not None else CURRICULUM_PREREQUISITES
+        self._lock = threading.RLock()
+        self._graphs = {}
+        self._content_edges = {}  # content_id -> (niche, frozenset of edges)
+        self._content_loaded = False
+        self._feed = content_events.ContentChangeFeed()
+        self._rejected_edges = 0
+
+    def for_niche(self, niche: str) -> KnowledgeGraph:
+        """Return the compiled graph for a niche"""
+        self._refresh_content()
+        return self._graph(niche)
+
+    def _graph(self, niche: str) -> KnowledgeGraph:
+        with self._lock:
+            graph = self._graphs.get(niche)
+            if graph is None:
+                graph = KnowledgeGraph(niche)
+                graph.load(
+                    (concept, prerequisite)
+                    for concept, prerequisites in self.curriculum.get(niche, {}).items()
+                    for prerequisite in prerequisites
+                )
+                self._graphs[niche] = graph
+            return graph
+
+    def _refresh_content(self) -> None:
+        """Apply Content changes committed by any process since the last refresh"""
+        if not has_app_context():
+            return
+        with self._lock:
+            try:
+                changes = self._feed.poll()
+            except Exception as e:
+                print(f"Could not load content prerequisites into the knowledge graph: {e}")
+                return
+            if self._content_loaded:
+                for content_id, snapshot in changes:
+                    if snapshot is None:
+                        self.remove_content(content_id)
+                    else:
+                        self.sync_content(content_id, snapshot['niche'], snapshot['concepts_covered'], snapshot['prerequisites'])
+                return
+
+            # First load: compile each niche's content edges in one pass
+            by_niche = {}
+            for content_id, snapshot in changes:
+                if snapshot is None or content_id in self._content_edges:
+                    # Already applied from a commit event
+                    continue
+                edges = self._edges_for(snapshot['concepts_covered'], snapshot['prerequisites'])
+                if edges:
+                    by_niche.setdefault(snapshot['niche'], []).append((content_id, edges))
+
+            for niche, entries in by_niche.items():
+                graph = self._graph(niche)
+                try:
+                    graph.load(edge for _, edges in entries for edge in edges)
+                    for content_id, edges in entries:
+                        self._content_edges[content_id] = (niche, edges)
+                except PrerequisiteCycleError:
+                    # Fall back to edge-by-edge so only the offending edges are rejected
+                    for content_id, edges in entries:
+                        self._apply(content_id, niche, edges)
+            self._content_loaded = True
+
+    @staticmethod
+    def _edges_for(concepts_covered, prerequisites) -> frozenset:
+        return frozenset(
+            (concept, prerequisite)
+            for concept in concepts_covered or [] if isinstance(concept, str)
+            for prerequisite in prerequisites or [] if isinstance(prerequisite, str)
+        )
+
+    def check_content(self, niche: str, concepts_covered: List[str], prerequisites: List[str]) -> None:
+        """Raise PrerequisiteCycleError if content with these concepts and prerequisites would create a cycle"""
+        graph = self.for_niche(niche)
+        for concept in concepts_covered or []:
+            for prerequisite in prerequisites or []:
+                if concept == prerequisite:
+                    raise PrerequisiteCycleError([concept])
+                if graph.depends_on(prerequisite, concept):
+                    raise PrerequisiteCycleError([concept, prerequisite])
+
+    def sync_content(self, content_id: int, niche: str, concepts_covered, prerequisites) -> None:
+        """Replace the edges contributed by a content row"""
+        self._apply(content_id, niche, self._edges_for(concepts_covered, prerequisites))
+
+    def remove_content(self, content_id: int) -> None:
+        """Drop the edges contributed by a deleted content row"""
+        self._apply(content_id, None, frozenset())
+
+    def _apply(self, content_id: int, niche: Optional[str], edges: frozenset) -> None:
+        with self._lock:
+            old_niche, old_edges = self._content_edges.pop(content_id, (None, frozenset()))
+            if old_niche == niche:
+                removed, added = old_edges - edges, edges - old_edges
+            else:
+                removed, added = old_edges, edges
+
+            if removed:
+                old_graph = self._graph(old_niche)
+                for concept, prerequisite in removed:
+                    old_graph.remove_prerequisite(concept, prerequisite)
+
+            kept = set(old_edges & edges) if old_niche == niche else set()
+            if added:
+                graph = self._graph(niche)
+                for concept, prerequisite in added:
+                    try:
+                        graph.add_prerequisite(concept, prerequisite)
+                        kept.add((concept, prerequisite))
+                    except PrerequisiteCycleError as e:
+                        self._rejected_edges += 1
+                        print(f"Ignoring prerequisite edge from content {content_id}: {e}")
+
+            if kept:
+                self._content_edges[content_id] = (niche, frozenset(kept))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-niche graph stats"""
+        with self._lock:
+            return {
+                'content_loaded': self._content_loaded,
+                'content_rows': len(self._content_edges),
+                'rejected_edges': self._rejected_edges,
+                'graphs': {niche: graph.stats() for niche, graph in self._graphs.items()}
+            }
+
+
+# Process-wide registry shared by the AI service and the content routes
+knowledge_graphs = KnowledgeGraphRegistry()
+
+
+def _on_content_change(content_id: int, snapshot) -> None:
+    if snapshot is None:
+        knowledge_graphs.remove_content(content_id)
+    else:
+        knowledge_graphs.sync_content(content_id, snapshot['niche'], snapshot['concepts_covered'], snapshot['prerequisites'])
+
+
+content_events.subscribe(_on_content_change)
@@ -0,0 +1,268 @@
+import os
+import time
+import threading
+from typing import Dict, Any, Iterator
+
+try:
+    import httpx
+    from openai import OpenAI, APIConnectionError, APIStatusError
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker rejects a call without contacting the provider"""
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """
+    True for errors that say the provider is unhealthy: timeouts, connection errors, 429 and 5xx.
+    Other 4xx responses (bad request, bad key, unknown model) are the caller's problem.
+    """
+    if not OPENAI_AVAILABLE:
+        return False
+    if isinstance(error, (APIConnectionError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls flow normally. After failure_threshold consecutive failures
+    (slow calls above latency_threshold count as failures) the breaker opens
+    and rejects calls immediately. After recovery_timeout it goes half-open
+    and lets a single probe through; the probe's outcome closes or re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, latency_threshold: float = 20.0,
+                 recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._last_failure = None
+        self._stats = {'successes': 0, 'failures': 0, 'slow_calls': 0, 'rejected': 0, 'opened': 0}
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go to the provider now"""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self, latency: float) -> None:
+        """Record a completed call; calls slower than latency_threshold count as failures"""
+        if latency > self.latency_threshold:
+            with self._lock:
+                self._stats['slow_calls'] += 1
+            self.record_failure(f'slow call ({latency:.1f}s)')
+            return
+
+        with self._lock:
+            self._stats['successes'] += 1
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            self._state = self.CLOSED
+            self._opened_at = None
+
+    def release_probe(self) -> None:
+        """Give up a call without an outcome; a half-open breaker lets the next call probe instead"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self, reason: str) -> None:
+        """Record a failed call, opening the breaker if the threshold is reached"""
+        with self._lock:
+            self._stats['failures'] += 1
+            self._consecutive_failures += 1
+            self._last_failure = {'reason': reason, 'at': time.time()}
+
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._stats['opened'] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return breaker state for monitoring"""
+        with self._lock:
+            retry_in = None
+            if self._state == self.OPEN:
+                retry_in = round(max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at)), 1)
+            return {
+                'name': self.name,
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'latency_threshold_seconds': self.latency_threshold,
+                'recovery_timeout_seconds': self.recovery_timeout,
+                'retry_in_seconds': retry_in,
+                'last_failure': self._last_failure,
+                **self._stats
+            }
+
+
+class LLMClientRegistry:
+    """
+    Process-wide OpenAI client with a shared HTTP connection pool,
+    per-call-type timeouts and a circuit breaker in front of every call.
+    """
+
+    DEFAULT_TIMEOUTS = {
+        'lesson': 30.0,
+        'exercise': 20.0,
+        'feedback': 10.0
+    }
+
+    def __init__(self):
+        self.api_key = os.getenv('OPENAI_API_KEY')
+        self.base_url = os.getenv('OPENAI_BASE_URL') or None
+        self.max_connections = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+        self.max_keepalive_connections = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', 10))
+        self.connect_timeout = float(os.getenv('LLM_CONNECT_TIMEOUT_SECONDS', 5))
+        self.max_retries = int(os.getenv('LLM_MAX_RETRIES', 1))
+        self.timeouts = {
+            call_type: float(os.getenv(f'LLM_TIMEOUT_{call_type.upper()}_SECONDS', default))
+            for call_type, default in self.DEFAULT_TIMEOUTS.items()
+        }
+        self.breaker = CircuitBreaker(
+            'openai',
+            failure_threshold=int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', 5)),
+            latency_threshold=float(os.getenv('LLM_BREAKER_LATENCY_THRESHOLD_SECONDS', 20)),
+            recovery_timeout=float(os.getenv('LLM_BREAKER_RECOVERY_SECONDS', 30))
+        )
+
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """True when the OpenAI library is installed and an API key is configured"""
+        return bool(OPENAI_AVAILABLE and self.api_key)
+
+    def get_client(self):
+        """Return the shared OpenAI client, creating it on first use"""
+        if not self.available:
+            return None
+        with self._lock:
+            if self._client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections
+                    ),
+                    timeout=httpx.Timeout(max(self.timeouts.values()), connect=self.connect_timeout)
+                )
+                self._client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=http_client,
+                    max_retries=self.max_retries
+                )
+            return self._client
+
+    def timeout_for(self, call_type: str):
+        """Request timeout for a call type (lesson, exercise, feedback)"""
+        seconds = self.timeouts.get(call_type, self.timeouts['lesson'])
+        return httpx.Timeout(seconds, connect=min(self.connect_timeout, seconds))
+
+    def chat_completion(self, call_type: str, **kwargs):
+        """
+        Create a chat completion through the circuit breaker.
+        Raises CircuitOpenError immediately while the breaker is open.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Circuit breaker '{self.breaker.name}' is open")
+
+        start = time.monotonic()
+        try:
+            response = self.get_client().chat.completions.create(timeout=self.timeout_for(call_type), **kwargs)
+        except Exception as e:
+            self._record_error(e)
+            raise
+
+        self.breaker.record_success(time.monotonic() - start)
+        return response
+
+    def stream_chat_completion(self, call_type: str, **kwargs) -> Iterator[Any]:
+        """
+        Stream chat completion chunks through the circuit breaker.
+        The call is judged on time to first chunk and on whether the stream completes.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Circuit breaker '{self.breaker.name}' is open")
+
+        start = time.monotonic()
+        first_chunk_latency = None
+        try:
+            response = self.get_client().chat.completions.create(
+                timeout=self.timeout_for(call_type), stream=True, **kwargs
+            )
+            for chunk in response:
+                if first_chunk_latency is None:
+                    first_chunk_latency = time.monotonic() - start
+                yield chunk
+        except GeneratorExit:
+            # Client went away; not a provider failure. Before the first chunk there is no outcome to record.
+            if first_chunk_latency is None:
+                self.breaker.release_probe()
+            else:
+                self.breaker.record_success(first_chunk_latency)
+            raise
+        except Exception as e:
+            self._record_error(e)
+            raise
+
+        self.breaker.record_success(first_chunk_latency if first_chunk_latency is not None else time.monotonic() - start)
+
+    def _record_error(self, error: Exception) -> None:
+        """Count provider failures against the breaker; other errors only free a half-open probe"""
+        if is_provider_failure(error):
+            self.breaker.record_failure(str(error))
+        else:
+            self.breaker.release_probe()
+
+    def status(self) -> Dict[str, Any]:
+        """Return client configuration and breaker state for monitoring"""
+        return {
+            'available': self.available,
+            'base_url': self.base_url,
+            'client_initialized': self._client is not None,
+            'pool': {
+                'max_connections': self.max_connections,
+                'max_keepalive_connections': self.max_keepalive_connections
+            },
+            'timeouts_seconds': dict(self.timeouts),
+            'connect_timeout_seconds': self.connect_timeout,
+            'max_retries': self.max_retries,
+            'circuit_breaker': self.breaker.snapshot()
+        }
+
+
+# Process-wide registry shared by every AIContentGenerator instance
+llm_registry = LLMClientRegistry()
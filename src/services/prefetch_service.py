@@ -0,0 +1,208 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+from flask import current_app
+from src.models.user import db
+from src.models.learner import Learner
+from src.models.content import Content, LearningPath, Exercise
+
+
+class ContentPrefetcher:
+    """
+    Background pre-generation of the next items in a learning path.
+
+    When a learner reaches a position, the prefetcher looks ahead `lookahead`
+    positions in the path's content_sequence plus the top recommendations for
+    the learner and generates what is missing before it is requested:
+    exercises for upcoming lessons that have none, and cached lessons and
+    exercises for the concepts involved. LLM work runs on a bounded pool so
+    prefetching never uses more than `max_workers` concurrent generations.
+    """
+
+    def __init__(self, ai_generator, lookahead: int = None, max_workers: int = None,
+                 recommendation_count: int = None):
+        self.ai_generator = ai_generator
+        self.lookahead = lookahead if lookahead is not None else int(os.getenv('PREFETCH_LOOKAHEAD', 3))
+        self.max_workers = max_workers if max_workers is not None else int(os.getenv('PREFETCH_MAX_WORKERS', 2))
+        self.recommendation_count = recommendation_count if recommendation_count is not None else int(os.getenv('PREFETCH_RECOMMENDATIONS', 2))
+        self.enabled = os.getenv('PREFETCH_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
+        self._planner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch-planner')
+        self._workers = ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._pending_paths = set()
+        self._pending_items = set()
+        self._stats = {'paths_scheduled': 0, 'items_generated': 0, 'exercises_created': 0, 'errors': 0}
+
+    def schedule_for_path(self, path: LearningPath, depth: int = None) -> bool:
+        """
+        Queue look-ahead generation for a path. Returns False if disabled or already queued.
+        """
+        if not self.enabled:
+            return False
+
+        with self._lock:
+            if path.id in self._pending_paths:
+                return False
+            self._pending_paths.add(path.id)
+            self._stats['paths_scheduled'] += 1
+
+        app = current_app._get_current_object()
+        self._planner.submit(self._plan_path, app, path.id, depth or self.lookahead)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Return prefetch counters and configuration"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_paths'] = len(self._pending_paths)
+            stats['pending_items'] = len(self._pending_items)
+        stats.update({
+            'enabled': self.enabled,
+            'lookahead': self.lookahead,
+            'max_workers': self.max_workers,
+            'recommendation_count': self.recommendation_count
+        })
+        return stats
+
+    def _plan_path(self, app, path_id: int, depth: int) -> None:
+        """Work out which items are missing and hand them to the generation pool"""
+        try:
+            with app.app_context():
+                path = LearningPath.query.get(path_id)
+                if not path:
+                    return
+                learner = Learner.query.get(path.learner_id)
+                if not learner:
+                    return
+
+                personalization_params = {
+                    'learning_style': learner.preferred_learning_style,
+                    'experience_level': learner.experience_level,
+                    'niche': learner.target_niche
+                }
+
+                sequence = path.content_sequence or []
+                upcoming_ids = sequence[path.current_position:path.current_position + depth]
+                items = self._items_for_upcoming_content(upcoming_ids)
+                items.extend(self._items_for_recommendations(learner))
+
+                # Mock content is never cached, so only items that persist something are worth it offline
+                if not self.ai_generator.openai_available:
+                    items = [item for item in items if item.get('content_id')]
+        except Exception as e:
+            print(f"Error planning prefetch for path {path_id}: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+            return
+        finally:
+            with self._lock:
+                self._pending_paths.discard(path_id)
+
+        for item in items:
+            item_key = (
+                item['concept'], item['content_type'], item.get('content_id'),
+                tuple(sorted(personalization_params.items()))
+            )
+            with self._lock:
+                if item_key in self._pending_items:
+                    continue
+                self._pending_items.add(item_key)
+            self._workers.submit(self._generate_item, app, item, personalization_params, item_key)
+
+    def _items_for_upcoming_content(self, content_ids: List[int]) -> List[Dict[str, Any]]:
+        """Lessons and exercises needed for the next content items in the path"""
+        if not content_ids:
+            return []
+
+        contents = Content.query.filter(Content.id.in_(content_ids)).all()
+        content_ids_with_exercises = {
+            row.content_id for row in
+            db.session.query(Exercise.content_id).filter(Exercise.content_id.in_(content_ids)).distinct()
+        }
+
+        items = []
+        for content in contents:
+            concepts = content.concepts_covered or []
+            if not concepts:
+                continue
+            concept = concepts[0]
+            if content.content_type == 'lesson' and content.id not in content_ids_with_exercises:
+                # Attach a practice exercise so the learner never waits for one
+                items.append({
+                    'concept': concept,
+                    'content_type': 'exercise',
+                    'exercise_type': 'multiple_choice',
+                    'content_id': content.id
+                })
+            else:
+                items.append({'concept': concept, 'content_type': 'exercise', 'exercise_type': 'multiple_choice'})
+        return items
+
+    def _items_for_recommendations(self, learner: Learner) -> List[Dict[str, Any]]:
+        """Lessons and exercises for the learner's top recommended concepts"""
+        if self.recommendation_count <= 0:
+            return []
+
+        recommendations = self.ai_generator.recommend_learning_path(
+            learner.to_dict(), learner.get_knowledge_gaps()
+        )
+        items = []
+        for recommendation in recommendations[:self.recommendation_count]:
+            concept = recommendation['concept']
+            items.append({'concept': concept, 'content_type': 'lesson'})
+            items.append({'concept': concept, 'content_type': 'exercise', 'exercise_type': 'multiple_choice'})
+        return items
+
+    def _generate_item(self, app, item: Dict[str, Any], personalization_params: Dict[str, Any], item_key) -> None:
+        """Generate one item (filling the generation cache) and persist missing exercises"""
+        try:
+            generated_data = self.ai_generator.generate_personalized_content(
+                concept=item['concept'],
+                content_type=item['content_type'],
+                personalization_params=personalization_params,
+                exercise_type=item.get('exercise_type'),
+                # A mock placeholder would be attached to the lesson for good; skip the item instead
+                fallback=False
+            )
+            with self._lock:
+                self._stats['items_generated'] += 1
+
+            if item.get('content_id'):
+                with app.app_context():
+                    self._attach_exercise(item['content_id'], item.get('exercise_type'), generated_data)
+        except Exception as e:
+            print(f"Error prefetching {item['content_type']} for {item['concept']}: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+        finally:
+            with self._lock:
+                self._pending_items.discard(item_key)
+
+    def _attach_exercise(self, content_id: int, exercise_type: str, generated_data: Dict[str, Any]) -> None:
+        """Save a generated exercise for a lesson unless one appeared in the meantime"""
+        try:
+            if Exercise.query.filter_by(content_id=content_id).first():
+                return
+
+            exercise = Exercise(
+                content_id=content_id,
+                question=generated_data.get('question', ''),
+                exercise_type=exercise_type,
+                correct_answer=generated_data.get('correct_answer', ''),
+                explanation=generated_data.get('explanation', ''),
+                options=generated_data.get('options', []),
+                starter_code=generated_data.get('starter_code', ''),
+                test_cases=generated_data.get('test_cases', []),
+                difficulty_score=generated_data.get('difficulty_score', 0.5),
+                estimated_time_minutes=generated_data.get('estimated_time_minutes', 5),
+                option_feedback=generated_data.get('option_feedback', {})
+            )
+            db.session.add(exercise)
+            db.session.commit()
+            with self._lock:
+                self._stats['exercises_created'] += 1
+        except Exception:
+            db.session.rollback()
+            raise
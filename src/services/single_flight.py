@@ -0,0 +1,154 @@
+import os
+import copy
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight calls.
+
+    Within a process, callers with the same key share one execution and all
+    receive its result. Across processes, the leader for a key also holds an
+    exclusive lock file, so leaders in other gunicorn workers queue behind it
+    and can pick the result up from a shared cache instead of calling again.
+    """
+
+    def __init__(self, lock_dir: str = None, lock_timeout: float = None):
+        self.lock_dir = lock_dir or os.getenv(
+            'GENERATION_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'ai-learning-platform-locks')
+        )
+        self.lock_timeout = lock_timeout if lock_timeout is not None else float(os.getenv('GENERATION_LOCK_TIMEOUT_SECONDS', 60))
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'executions': 0, 'coalesced': 0, 'lock_waits': 0, 'lock_timeouts': 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn once per key at a time; concurrent callers with the same key wait for and share its result
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            with self._process_lock(key):
+                call.result = fn()
+            # The leader gets its own copy too, so no caller can mutate what the waiters are copying
+            return copy.deepcopy(call.result)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return coalescing counters and the number of keys currently in flight"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        stats['cross_process_locking'] = FCNTL_AVAILABLE
+        return stats
+
+    @contextmanager
+    def _process_lock(self, key: str):
+        """
+        Hold an exclusive lock file for the key, waiting at most lock_timeout seconds.
+        On timeout or without fcntl the call proceeds unlocked rather than failing.
+        The holder unlinks the file before unlocking it, so lock files do not pile up.
+        """
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+
+        lock_path = os.path.join(self.lock_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.lock')
+        try:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            lock_file = open(lock_path, 'a')
+        except OSError as e:
+            print(f"Single-flight lock unavailable: {e}")
+            yield
+            return
+
+        acquired = False
+        try:
+            deadline = time.monotonic() + self.lock_timeout
+            waited = False
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        break
+                    waited = True
+                    time.sleep(0.05)
+                    continue
+
+                if self._is_current(lock_file, lock_path):
+                    acquired = True
+                    break
+                # The previous holder unlinked this file after we opened it; lock the new one instead
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+                lock_file = open(lock_path, 'a')
+
+            with self._lock:
+                if waited:
+                    self._stats['lock_waits'] += 1
+                if not acquired:
+                    self._stats['lock_timeouts'] += 1
+            yield
+        finally:
+            if acquired:
+                try:
+                    os.unlink(lock_path)
+                except OSError:
+                    pass
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    @staticmethod
+    def _is_current(lock_file, lock_path: str) -> bool:
+        """True if lock_path still names the open lock file"""
+        try:
+            return os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path))
+        except FileNotFoundError:
+            return False
+
+
+# Process-wide coalescer shared by every AIContentGenerator instance
+generation_single_flight = SingleFlight()
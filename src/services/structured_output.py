@@ -0,0 +1,192 @@
+import re
+import json
+from typing import Dict, Any, List, Optional, Tuple
+
+# Field specs: name -> (type, required). Optional fields fall back to the default for their type.
+LESSON_SCHEMA = {
+    'title': (str, True),
+    'learning_objectives': (list, False),
+    'content': (str, True),
+    'examples': (list, False),
+    'key_takeaways': (list, False),
+    'next_steps': (str, False)
+}
+
+EXERCISE_SCHEMA = {
+    'question': (str, True),
+    'options': (list, True),
+    'correct_answer': (str, True),
+    'explanation': (str, False)
+}
+
+OPTION_LETTERS = ['A', 'B', 'C', 'D']
+
+_FENCE_PATTERN = re.compile(r'^```(?:json)?\s*|\s*```$', re.IGNORECASE)
+_TRAILING_COMMA_PATTERN = re.compile(r',\s*([}\]])')
+_OPTION_PREFIX_PATTERN = re.compile(r'^\(?([A-Da-d])[\).:]\s*')
+_SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '‘': "'", '’': "'"})
+
+
+def schema_prompt(schema: Dict[str, Tuple[type, bool]]) -> str:
+    """
+    Describe a schema as the JSON shape the model should return
+    """
+    fields = []
+    for name, (field_type, required) in schema.items():
+        type_name = 'array of strings' if field_type is list else 'string'
+        fields.append(f'  "{name}": {type_name}{"" if required else " (optional)"}')
+    return '{\n' + ',\n'.join(fields) + '\n}'
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Decode JSON, applying cheap repairs for common near-misses:
+    code fences, prose around the object, smart quotes and trailing commas
+    """
+    if not text:
+        return None
+
+    candidates = [text]
+    stripped = _FENCE_PATTERN.sub('', text.strip())
+    candidates.append(stripped)
+
+    start, end = stripped.find('{'), stripped.rfind('}')
+    if start != -1 and end > start:
+        candidates.append(stripped[start:end + 1])
+
+    repaired = _TRAILING_COMMA_PATTERN.sub(r'\1', candidates[-1].translate(_SMART_QUOTES))
+    candidates.append(repaired)
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+def validate(data: Any, schema: Dict[str, Tuple[type, bool]]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Validate and normalize decoded JSON against a schema.
+    Returns (normalized, errors); normalized is None when a required field is missing or unusable.
+    """
+    if not isinstance(data, dict):
+        return None, ['response is not a JSON object']
+
+    normalized = {}
+    errors = []
+    for name, (field_type, required) in schema.items():
+        value = data.get(name)
+
+        if field_type is str:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            value = value.strip() if isinstance(value, str) else None
+        elif field_type is list:
+            if isinstance(value, str):
+                value = [value]
+            if isinstance(value, list):
+                value = [str(item).strip() for item in value if isinstance(item, (str, int, float)) and str(item).strip()]
+            else:
+                value = None
+
+        if not value:
+            if required:
+                errors.append(f'missing or empty field: {name}')
+            value = field_type()
+        normalized[name] = value
+
+    if errors:
+        return None, errors
+    return normalized, []
+
+
+def validate_exercise(data: Any) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Validate a multiple choice exercise: four options labelled A-D and a correct answer resolved to its letter
+    """
+    normalized, errors = validate(data, EXERCISE_SCHEMA)
+    if normalized is None:
+        return None, errors
+
+    options = normalized['options']
+    if len(options) != len(OPTION_LETTERS):
+        return None, [f'expected {len(OPTION_LETTERS)} options, got {len(options)}']
+    normalized['options'] = [
+        f"{letter}) {_OPTION_PREFIX_PATTERN.sub('', option)}"
+        for letter, option in zip(OPTION_LETTERS, options)
+    ]
+
+    answer = normalized['correct_answer']
+    # A letter, a labelled option or the option text; never guess from the first character
+    letter = answer_letter(answer, normalized['options'])
+    if letter is None:
+        return None, [f'correct_answer is not one of {", ".join(OPTION_LETTERS)} or an option: {answer}']
+    normalized['correct_answer'] = letter
+    return normalized, []
+
+
+def parse_structured_content(text: str, content_type: str) -> Optional[Dict[str, Any]]:
+    """
+    Decode, repair and validate a structured generation. Returns None if the response is unusable.
+    """
+    data = repair_json(text)
+    if data is None:
+        print(f"Structured {content_type} response is not valid JSON")
+        return None
+
+    if content_type == 'lesson':
+        normalized, errors = validate(data, LESSON_SCHEMA)
+    else:
+        normalized, errors = validate_exercise(data)
+
+    if normalized is None:
+        print(f"Structured {content_type} response failed validation: {'; '.join(errors)}")
+    return normalized
+
+
+def answer_letter(answer: str, options: List[str] = None) -> Optional[str]:
+    """
+    Resolve an answer given as a letter ("b"), a labelled option ("B) ...") or the option text to its letter
+    """
+    if answer is None:
+        return None
+    answer = str(answer).strip()
+    if not answer:
+        return None
+
+    match = _OPTION_PREFIX_PATTERN.match(answer)
+    if match:
+        return match.group(1).upper()
+    if len(answer) == 1 and answer.upper() in OPTION_LETTERS:
+        return answer.upper()
+
+    for letter, option in zip(OPTION_LETTERS, options or []):
+        if _OPTION_PREFIX_PATTERN.sub('', option).strip().lower() == answer.lower():
+            return letter
+    return None
+
+
+def parse_option_feedback(text: str, letters: List[str], learning_styles: List[str]) -> Optional[Dict[str, Dict[str, str]]]:
+    """
+    Decode per-option feedback shaped {learning_style: {letter: feedback}}.
+    Returns None unless every style has feedback for every requested letter.
+    """
+    data = repair_json(text)
+    if not isinstance(data, dict):
+        return None
+
+    feedback = {}
+    for style in learning_styles:
+        entries = data.get(style)
+        if not isinstance(entries, dict):
+            return None
+        entries = {str(key).strip().upper()[:1]: value for key, value in entries.items()}
+        style_feedback = {}
+        for letter in letters:
+            value = entries.get(letter)
+            if not isinstance(value, str) or not value.strip():
+                return None
+            style_feedback[letter] = value.strip()
+        feedback[style] = style_feedback
+    return feedback
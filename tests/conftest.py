@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the generation cache and single-flight locks out of the source tree
+_scratch = tempfile.mkdtemp(prefix='ai-learning-platform-tests-')
+os.environ.setdefault('GENERATION_CACHE_PATH', os.path.join(_scratch, 'generation_cache.db'))
+os.environ.setdefault('GENERATION_LOCK_DIR', os.path.join(_scratch, 'locks'))
+
+from app import create_app
+from src.models.user import db, User
+from src.models.learner import Learner
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App bound to a fresh SQLite file, inside an app context"""
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def learners(app):
+    """Three learners with their users"""
+    result = []
+    for index in range(3):
+        user = User(username=f'user{index}', email=f'user{index}@example.com')
+        db.session.add(user)
+        db.session.flush()
+        learner = Learner(user_id=user.id, target_niche='tech_career')
+        db.session.add(learner)
+        result.append(learner)
+    db.session.commit()
+    return result
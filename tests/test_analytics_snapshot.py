@@ -0,0 +1,117 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.user import db
+from src.models.learner import LearningSession, LearnerAnalyticsSnapshot, LearnerDailyActivity
+
+CONTENT_TYPES = ['text', 'video', 'visual', 'quiz', None]
+
+
+def _content_accessed(rng):
+    if rng.random() < 0.1:
+        return None
+    return [{'type': rng.choice(CONTENT_TYPES)} for _ in range(rng.randint(0, 4))]
+
+
+def _new_session(rng, learner_ids, now):
+    return LearningSession(
+        learner_id=rng.choice(learner_ids),
+        session_start=now - timedelta(days=rng.randint(0, 20), hours=rng.randint(0, 23)) if rng.random() < 0.9 else None,
+        duration_minutes=rng.choice([None, 0, 5, 25, 60]),
+        completion_rate=rng.choice([None, 0.0, 0.5, 1.0, round(rng.random(), 3)]),
+        content_accessed=_content_accessed(rng),
+        exercises_completed=[{'id': index} for index in range(rng.randint(0, 3))]
+    )
+
+
+def _state():
+    """Snapshot and daily rows, ignoring snapshots that no longer count any session"""
+    snapshots = {}
+    for row in LearnerAnalyticsSnapshot.query.all():
+        if not row.session_count:
+            continue
+        snapshots[row.learner_id] = {
+            'session_count': row.session_count,
+            'timed_session_count': row.timed_session_count,
+            'duration_total': row.duration_total,
+            'completion_total': round(row.completion_total, 9),
+            'content_accessed_total': row.content_accessed_total,
+            'exercises_completed_total': row.exercises_completed_total,
+            'active_days': row.active_days,
+            'dated_session_count': row.dated_session_count,
+            'daily_count_squares': row.daily_count_squares,
+            'content_type_counts': dict(row.content_type_counts or {})
+        }
+    days = {
+        (row.learner_id, row.day): (
+            row.session_count, row.duration_total, round(row.completion_total, 9),
+            row.content_accessed_total, row.exercises_completed_total
+        )
+        for row in LearnerDailyActivity.query.all()
+    }
+    return snapshots, days
+
+
+def _assert_matches_rebuild():
+    db.session.expire_all()
+    incremental = _state()
+    LearnerAnalyticsSnapshot.rebuild()
+    db.session.commit()
+    db.session.expire_all()
+    assert incremental == _state()
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_incremental_snapshots_match_rebuild(learners, seed):
+    rng = random.Random(seed)
+    learner_ids = [learner.id for learner in learners]
+    now = datetime.utcnow()
+
+    for _ in range(30):
+        db.session.add(_new_session(rng, learner_ids, now))
+    db.session.commit()
+
+    for round_number in range(40):
+        sessions = LearningSession.query.order_by(LearningSession.id).all()
+        session = rng.choice(sessions)
+        operation = rng.choice(['insert', 'update', 'append', 'move', 'delete'])
+        if operation == 'insert':
+            db.session.add(_new_session(rng, learner_ids, now))
+        elif operation == 'update':
+            session.duration_minutes = rng.choice([None, 0, 10, 45])
+            session.completion_rate = rng.choice([None, 0.25, 0.9])
+            session.session_start = now - timedelta(days=rng.randint(0, 20)) if rng.random() < 0.9 else None
+            session.content_accessed = _content_accessed(rng)
+        elif operation == 'append':
+            # In-place JSON edits are tracked by the mutable column types
+            if session.content_accessed is None:
+                session.content_accessed = []
+            session.content_accessed.append({'type': rng.choice(CONTENT_TYPES)})
+            session.exercises_completed.append({'id': round_number})
+        elif operation == 'move':
+            session.learner_id = rng.choice([learner_id for learner_id in learner_ids if learner_id != session.learner_id])
+        else:
+            db.session.delete(session)
+        db.session.commit()
+
+        if round_number % 10 == 9:
+            _assert_matches_rebuild()
+
+
+def test_delete_all_sessions_clears_daily_rows(learners):
+    now = datetime.utcnow()
+    for index in range(5):
+        db.session.add(LearningSession(learner_id=learners[0].id, session_start=now - timedelta(days=index), duration_minutes=10))
+    db.session.commit()
+
+    for session in LearningSession.query.all():
+        db.session.delete(session)
+    db.session.commit()
+
+    snapshot = db.session.get(LearnerAnalyticsSnapshot, learners[0].id)
+    assert snapshot.session_count == 0
+    assert snapshot.active_days == 0
+    assert snapshot.daily_count_squares == 0
+    assert LearnerDailyActivity.query.count() == 0
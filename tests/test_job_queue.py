@@ -0,0 +1,160 @@
+import time
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.user import db
+from src.models.job import GenerationJob
+from src.services.job_queue import JobQueue, JobPartiallyFailed
+
+
+@pytest.fixture
+def queue(app):
+    queue = JobQueue()
+    queue.max_attempts = 3
+    queue.backoff_base = 10
+    queue.backoff_max = 60
+    return queue
+
+
+def _job(job_id):
+    return db.session.get(GenerationJob, job_id, populate_existing=True)
+
+
+def _make_due(job_id):
+    GenerationJob.query.filter_by(id=job_id).update({'run_after': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def test_claim_runs_job_and_records_result(queue):
+    queue.register('echo', lambda payload: {'echo': payload['value']})
+    job_id = queue.enqueue('echo', {'value': 42}).id
+
+    assert queue.run_once('worker-1')
+    job = _job(job_id)
+    assert job.status == 'succeeded'
+    assert job.result == {'echo': 42}
+    assert job.attempts == 1
+    assert job.locked_by is None
+    assert not queue.run_once('worker-1')
+
+
+def test_claim_is_exclusive(queue):
+    queue.register('noop', lambda payload: {})
+    job_id = queue.enqueue('noop', {}).id
+
+    first = queue.claim('worker-1')
+    assert first.id == job_id
+    assert queue.claim('worker-2') is None
+
+
+def test_failures_back_off_then_dead_letter_and_retry(queue):
+    calls = []
+
+    def failing(payload):
+        calls.append(payload)
+        raise RuntimeError('provider down')
+
+    queue.register('failing', failing)
+    job_id = queue.enqueue('failing', {}).id
+
+    before = datetime.utcnow()
+    queue.run_once('worker-1')
+    job = _job(job_id)
+    assert job.status == 'queued'
+    assert job.attempts == 1
+    assert job.last_error == 'provider down'
+    assert job.run_after >= before + timedelta(seconds=queue.backoff_base / 2)
+    # Not due until the backoff passes
+    assert not queue.run_once('worker-1')
+
+    for attempt in (2, 3):
+        _make_due(job_id)
+        queue.run_once('worker-1')
+        assert _job(job_id).attempts == attempt
+    job = _job(job_id)
+    assert job.status == 'dead'
+    assert job.completed_at is not None
+    assert len(calls) == 3
+
+    queue.retry(job)
+    job = _job(job_id)
+    assert job.status == 'queued'
+    assert job.attempts == 0
+    with pytest.raises(ValueError):
+        queue.retry(job)
+
+
+def test_partial_failure_retries_with_remaining_payload(queue):
+    payloads = []
+
+    def partial(payload):
+        payloads.append(payload)
+        if len(payloads) == 1:
+            raise JobPartiallyFailed('1 of 2 items failed', {'items': ['b']}, {'done': ['a']})
+        return {'done': ['a'] + payload['items']}
+
+    queue.register('partial', partial)
+    job_id = queue.enqueue('partial', {'items': ['a', 'b']}).id
+
+    queue.run_once('worker-1')
+    job = _job(job_id)
+    assert job.status == 'queued'
+    assert job.payload == {'items': ['b']}
+    assert job.result == {'done': ['a']}
+
+    _make_due(job_id)
+    queue.run_once('worker-1')
+    job = _job(job_id)
+    assert job.status == 'succeeded'
+    assert job.result == {'done': ['a', 'b']}
+    assert payloads == [{'items': ['a', 'b']}, {'items': ['b']}]
+
+
+def test_expired_lease_is_requeued_and_old_worker_cannot_overwrite(queue):
+    queue.register('noop', lambda payload: {'ran': True})
+    job_id = queue.enqueue('noop', {}).id
+    job = queue.claim('worker-1')
+
+    # worker-1 stalls past its lease; another worker reclaims the job
+    GenerationJob.query.filter_by(id=job_id).update({'locked_at': datetime.utcnow() - timedelta(seconds=queue.lease_seconds + 1)})
+    db.session.commit()
+    queue._last_reclaim = 0.0
+    assert queue.claim('worker-2') is None  # requeued with backoff, not yet due
+    reclaimed = _job(job_id)
+    assert reclaimed.status == 'queued'
+    assert 'Lease expired' in reclaimed.last_error
+
+    queue.execute(job)
+    job = _job(job_id)
+    assert job.status == 'queued'
+    assert job.result is None
+
+
+def test_heartbeat_keeps_long_jobs_leased(app, queue):
+    queue.lease_seconds = 1.0
+    queue.heartbeat_seconds = 0.2
+    reclaimed = []
+
+    def slow(payload):
+        time.sleep(1.6)
+        return {'done': True}
+
+    def other_worker():
+        time.sleep(1.3)
+        with app.app_context():
+            queue._last_reclaim = 0.0
+            reclaimed.append(queue.claim('worker-2'))
+
+    queue.register('slow', slow)
+    job_id = queue.enqueue('slow', {}).id
+    thread = threading.Thread(target=other_worker)
+    thread.start()
+    queue.run_once('worker-1')
+    thread.join()
+
+    assert reclaimed == [None]
+    job = _job(job_id)
+    assert job.status == 'succeeded'
+    assert job.attempts == 1
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from src.services.knowledge_graph import KnowledgeGraph, PrerequisiteCycleError
+
+CONCEPTS = [f'c{index}' for index in range(12)]
+
+
+def _reachable(edges, concept):
+    """Transitive prerequisites by depth-first search over the live edges"""
+    seen = set()
+    stack = [prerequisite for (source, prerequisite) in edges if source == concept]
+    while stack:
+        node = stack.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        stack.extend(prerequisite for (source, prerequisite) in edges if source == node)
+    return seen
+
+
+def _assert_consistent(graph, refs):
+    edges = {edge for edge, count in refs.items() if count > 0}
+    for concept in CONCEPTS:
+        expected = _reachable(edges, concept)
+        assert set(graph.prerequisites_of(concept)) == expected, concept
+        for prerequisite in CONCEPTS:
+            assert graph.depends_on(concept, prerequisite) == (prerequisite in expected)
+
+    # Every prerequisite comes before the concepts that need it
+    order = {name: position for position, name in enumerate(graph.unmet_prerequisites(CONCEPTS))}
+    for concept, prerequisite in edges:
+        if concept in order and prerequisite in order:
+            assert order[prerequisite] < order[concept]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_closures_match_brute_force_after_adds_and_removes(seed):
+    rng = random.Random(seed)
+    graph = KnowledgeGraph('test')
+    refs = {}
+
+    for step in range(300):
+        concept, prerequisite = rng.sample(CONCEPTS, 2)
+        live = [edge for edge, count in refs.items() if count > 0]
+        if live and rng.random() < 0.35:
+            edge = rng.choice(live)
+            graph.remove_prerequisite(*edge)
+            refs[edge] -= 1
+        else:
+            edges = {edge for edge, count in refs.items() if count > 0}
+            creates_cycle = concept in _reachable(edges, prerequisite)
+            if creates_cycle:
+                with pytest.raises(PrerequisiteCycleError):
+                    graph.add_prerequisite(concept, prerequisite)
+            else:
+                graph.add_prerequisite(concept, prerequisite)
+                refs[(concept, prerequisite)] = refs.get((concept, prerequisite), 0) + 1
+
+        if step % 25 == 24:
+            _assert_consistent(graph, refs)
+    _assert_consistent(graph, refs)
+
+
+def test_edge_survives_until_its_last_reference_is_removed():
+    graph = KnowledgeGraph('test')
+    graph.add_prerequisite('b', 'a')
+    graph.add_prerequisite('b', 'a')
+    graph.add_prerequisite('c', 'b')
+
+    graph.remove_prerequisite('b', 'a')
+    assert graph.prerequisites_of('c') == ['a', 'b']
+
+    graph.remove_prerequisite('b', 'a')
+    assert graph.prerequisites_of('c') == ['b']
+    assert not graph.depends_on('c', 'a')
+
+
+def test_load_rejects_cycles_and_leaves_graph_unchanged():
+    graph = KnowledgeGraph('test')
+    graph.load([('b', 'a'), ('c', 'b')])
+
+    with pytest.raises(PrerequisiteCycleError):
+        graph.load([('a', 'c')])
+    with pytest.raises(PrerequisiteCycleError):
+        graph.add_prerequisite('a', 'a')
+
+    assert graph.prerequisites_of('c') == ['a', 'b']
+    assert graph.prerequisites_of('a') == []